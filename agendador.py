@@ -0,0 +1,349 @@
+"""
+Agendador residente da automação (Windows e Linux, sem o Agendador de Tarefas)
+
+Fica rodando em segundo plano e dispara o automacao_completa.main() no próprio
+processo, conforme agendas no formato do cron ("minuto hora dia mês
+dia_da_semana"):
+
+    diaria        0 5 * * *           atualização completa às 5h
+    intradiaria   */30 8-18 * * 1-6   atualização rápida a cada 30 min no
+                                      expediente, sem usar a tela do desktop
+                                      (só com LUBRIMAX_HEADLESS=1: sem a
+                                      extração headless não há o que extrair)
+
+O interpretador fica quente: pandas e os módulos das etapas são importados uma
+vez, na subida, e cada atualização paga só o trabalho em si.
+
+- Uma instância só: logs/agendador.lock fica travado enquanto o agendador
+  roda; uma segunda cópia desiste na hora. Cada execução ainda trava
+  logs/execucao.lock, o mesmo que o `python automacao_completa.py` manual usa,
+  então as duas nunca gravam o banco ao mesmo tempo.
+- Execuções perdidas (computador desligado, execução anterior demorada): a
+  última execução de cada agenda fica em logs/agendador_estado.json; na volta,
+  os horários que passaram viram uma execução só, na hora.
+
+Agendas por variável de ambiente (vazio desativa):
+    LUBRIMAX_AGENDA_DIARIA, LUBRIMAX_AGENDA_INTRADIARIA
+
+Uso:
+    python agendador.py              # fica rodando
+    python agendador.py --proximas   # mostra as próximas execuções e sai
+"""
+
+import importlib
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent
+LOGS_DIR = PROJECT_DIR / 'logs'
+TRAVA_AGENDADOR = LOGS_DIR / 'agendador.lock'
+TRAVA_EXECUCAO = LOGS_DIR / 'execucao.lock'
+ESTADO_PATH = LOGS_DIR / 'agendador_estado.json'
+
+AGENDA_DIARIA = os.environ.get('LUBRIMAX_AGENDA_DIARIA', '0 5 * * *')
+AGENDA_INTRADIARIA = os.environ.get(
+    'LUBRIMAX_AGENDA_INTRADIARIA', '*/30 8-18 * * 1-6' if os.environ.get('LUBRIMAX_HEADLESS') == '1' else ''
+)
+
+ESPERA_MAXIMA = 60         # segundos entre conferências do relógio (suspensão, troca de horário)
+ESPERA_EXECUCAO_OCUPADA = 60
+
+# (mínimo, máximo) de cada campo da expressão
+_CAMPOS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+def _ler_campo(texto, minimo, maximo):
+    """Valores de um campo do cron: *, */n, a, a-b, a-b/n e listas com vírgula"""
+    valores = set()
+    for parte in texto.split(','):
+        faixa, _, passo = parte.partition('/')
+        passo = int(passo) if passo else 1
+        if faixa == '*':
+            inicio, fim = minimo, maximo
+        elif '-' in faixa:
+            inicio, fim = (int(v) for v in faixa.split('-'))
+        else:
+            inicio = int(faixa)
+            fim = maximo if passo > 1 else inicio
+        if not (minimo <= inicio <= fim <= maximo) or passo < 1:
+            raise ValueError(f"Campo fora da faixa {minimo}-{maximo}: {parte}")
+        valores.update(range(inicio, fim + 1, passo))
+    return valores
+
+class Agenda:
+    """Agenda no formato do cron, com resolução de minutos"""
+
+    def __init__(self, nome, expressao, intradiaria=False):
+        campos = expressao.split()
+        if len(campos) != 5:
+            raise ValueError(f"Agenda {nome}: esperado 'minuto hora dia mês dia_da_semana', veio {expressao!r}")
+        self.nome = nome
+        self.expressao = expressao
+        self.intradiaria = intradiaria
+        self.minutos, self.horas, self.dias, self.meses, dias_semana = (
+            _ler_campo(campo, minimo, maximo) for campo, (minimo, maximo) in zip(campos, _CAMPOS)
+        )
+        self.dias_semana = {d % 7 for d in dias_semana}   # 0 e 7 são domingo
+        # Como no cron: com dia do mês e dia da semana restritos, basta um dos dois
+        self._dia_e_semana = not campos[2].startswith('*') and not campos[4].startswith('*')
+
+    def __repr__(self):
+        return f'Agenda({self.nome!r}, {self.expressao!r})'
+
+    def _dia_confere(self, momento):
+        no_mes = momento.day in self.dias
+        na_semana = (momento.weekday() + 1) % 7 in self.dias_semana
+        return (no_mes or na_semana) if self._dia_e_semana else (no_mes and na_semana)
+
+    def proxima(self, depois):
+        """Primeiro horário da agenda estritamente depois de `depois`"""
+        momento = depois.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                ano, mes = divmod(momento.month, 12)
+                momento = momento.replace(year=momento.year + ano, month=mes + 1, day=1, hour=0, minute=0)
+            elif not self._dia_confere(momento):
+                momento = (momento + timedelta(days=1)).replace(hour=0, minute=0)
+            elif momento.hour not in self.horas:
+                momento = (momento + timedelta(hours=1)).replace(minute=0)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return momento
+        raise ValueError(f"Agenda {self.nome} nunca dispara: {self.expressao}")
+
+class TravaProcesso:
+    """
+    Trava exclusiva entre processos num arquivo (msvcrt no Windows, flock no
+    Linux); o sistema solta a trava sozinho se o processo morrer
+    """
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._arquivo = None
+
+    def adquirir(self):
+        """True se conseguiu a trava (não espera)"""
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        arquivo = open(self.caminho, 'a+')
+        try:
+            arquivo.seek(0)
+            if os.name == 'nt':
+                import msvcrt
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        arquivo.truncate()
+        arquivo.write(f'{os.getpid()}\n')
+        arquivo.flush()
+        self._arquivo = arquivo
+        return True
+
+    def liberar(self):
+        if self._arquivo is None:
+            return
+        if os.name == 'nt':
+            import msvcrt
+            self._arquivo.seek(0)
+            msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        self._arquivo.close()
+        self._arquivo = None
+
+    def __enter__(self):
+        if not self.adquirir():
+            raise RuntimeError(f"Outra instância em execução ({self.caminho})")
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+def agendas_padrao():
+    """Agendas configuradas (LUBRIMAX_AGENDA_DIARIA / LUBRIMAX_AGENDA_INTRADIARIA)"""
+    agendas = []
+    if AGENDA_DIARIA.strip():
+        agendas.append(Agenda('diaria', AGENDA_DIARIA))
+    if AGENDA_INTRADIARIA.strip():
+        agendas.append(Agenda('intradiaria', AGENDA_INTRADIARIA, intradiaria=True))
+    return agendas
+
+class Agendador:
+    """
+    Dispara `executar(intradiaria)` nos horários das agendas, uma execução por vez
+
+    Args:
+        agendas: lista de Agenda
+        executar: função(intradiaria) -> bool; None se não pôde rodar agora
+                  (execução manual em andamento): os horários continuam pendentes
+        estado: JSON com a última execução de cada agenda
+        relogio: função que devolve o datetime atual (testes)
+    """
+
+    def __init__(self, agendas, executar, estado=ESTADO_PATH, relogio=datetime.now):
+        self.agendas = list(agendas)
+        self.executar = executar
+        self.estado_path = Path(estado)
+        self.relogio = relogio
+        self.parar = threading.Event()
+        self.ultimas = self._ler_estado()
+        agora = self.relogio()
+        for agenda in self.agendas:
+            # Agenda nova: começa a contar de agora (sem recuperar o passado)
+            self.ultimas.setdefault(agenda.nome, agora)
+        self._gravar_estado()
+
+    def _ler_estado(self):
+        try:
+            dados = json.loads(self.estado_path.read_text(encoding='utf-8'))
+            return {nome: datetime.fromisoformat(valor) for nome, valor in dados.items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar_estado(self):
+        self.estado_path.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.estado_path.with_name(self.estado_path.name + '.tmp')
+        temporario.write_text(json.dumps(
+            {nome: momento.isoformat(timespec='seconds') for nome, momento in self.ultimas.items()}
+        ), encoding='utf-8')
+        os.replace(temporario, self.estado_path)
+
+    def proximas(self):
+        """{nome da agenda: próximo horário} (no passado = atrasada)"""
+        return {a.nome: a.proxima(self.ultimas[a.nome]) for a in self.agendas}
+
+    def vencidas(self, agora):
+        """Agendas com pelo menos um horário entre a última execução e agora"""
+        return [a for a in self.agendas if a.proxima(self.ultimas[a.nome]) <= agora]
+
+    def passo(self):
+        """
+        Roda uma vez se alguma agenda venceu (vários horários perdidos viram
+        uma execução só; a completa prevalece sobre a intradiária)
+
+        Returns:
+            bool | None: resultado da execução; None se nada venceu ou não
+                         pôde rodar agora
+        """
+        agora = self.relogio()
+        vencidas = self.vencidas(agora)
+        if not vencidas:
+            return None
+        intradiaria = all(a.intradiaria for a in vencidas)
+        atrasadas = [a.nome for a in vencidas
+                     if a.proxima(self.ultimas[a.nome]) < agora - timedelta(minutes=1)]
+        if atrasadas:
+            logging.info(f"[AGENDA] Recuperando execução perdida: {', '.join(atrasadas)}")
+        logging.info(f"[AGENDA] ▶️  {', '.join(a.nome for a in vencidas)} "
+                     f"({'intradiária' if intradiaria else 'completa'})")
+        try:
+            resultado = self.executar(intradiaria)
+        except Exception as e:
+            # Conta como executada: não repete a cada minuto um erro que vai se repetir
+            logging.error(f"[ERRO] Execução agendada: {e}")
+            logging.exception("Traceback completo:")
+            resultado = False
+        if resultado is None:
+            return None
+        # Horários que venceram durante a execução continuam pendentes
+        for agenda in vencidas:
+            self.ultimas[agenda.nome] = agora
+        self._gravar_estado()
+        return resultado
+
+    def segundos_ate_proxima(self):
+        proxima = min(self.proximas().values(), default=None)
+        if proxima is None:
+            return ESPERA_MAXIMA
+        return max(0.0, (proxima - self.relogio()).total_seconds())
+
+    def rodar(self):
+        """Laço principal: até self.parar ser sinalizado"""
+        for nome, momento in self.proximas().items():
+            logging.info(f"[AGENDA] {nome}: próxima execução {momento:%d/%m/%Y %H:%M}")
+        while not self.parar.is_set():
+            try:
+                if self.passo() is None and self.vencidas(self.relogio()):
+                    # Não rodou (execução manual em andamento): tenta de novo daqui a pouco
+                    self.parar.wait(ESPERA_EXECUCAO_OCUPADA)
+                    continue
+            except Exception as e:
+                logging.error(f"[ERRO] Agendador: {e}")
+                self.parar.wait(ESPERA_MAXIMA)
+                continue
+            self.parar.wait(min(ESPERA_MAXIMA, self.segundos_ate_proxima()))
+
+def aquecer():
+    """
+    Importa a automação e os módulos das etapas que rodam no processo
+
+    Returns:
+        module: automacao_completa
+    """
+    inicio = time.perf_counter()
+    automacao = importlib.import_module('automacao_completa')
+    for etapa in automacao.montar_pipeline().etapas.values():
+        if isinstance(etapa.funcao, str) and not etapa.isolada:
+            importlib.import_module(etapa.funcao.split(':')[0])
+    logging.info(f"[OK] Interpretador aquecido em {time.perf_counter() - inicio:.1f}s")
+    return automacao
+
+def executar_automacao(automacao, intradiaria):
+    """Uma execução da automação, travando logs/execucao.lock"""
+    trava = TravaProcesso(TRAVA_EXECUCAO)
+    if not trava.adquirir():
+        logging.warning("⚠️ Automação já em execução (manual?), execução agendada adiada")
+        return None
+    try:
+        return automacao.main(intradiaria=intradiaria)
+    finally:
+        trava.liberar()
+
+def main():
+    trava = TravaProcesso(TRAVA_AGENDADOR)
+    if not trava.adquirir():
+        logging.error(f"❌ Agendador já em execução ({TRAVA_AGENDADOR})")
+        return False
+    try:
+        automacao = aquecer()
+        if not automacao.verificar_credenciais_git():
+            return False
+        agendador = Agendador(agendas_padrao(), lambda intradiaria: executar_automacao(automacao, intradiaria))
+
+        def encerrar(sinal, quadro):
+            logging.info("[AGENDA] Encerrando agendador (termina a execução em andamento)")
+            agendador.parar.set()
+
+        signal.signal(signal.SIGINT, encerrar)
+        signal.signal(signal.SIGTERM, encerrar)
+        logging.info(f"🕒 Agendador iniciado (PID {os.getpid()}): "
+                     + ', '.join(f'{a.nome} "{a.expressao}"' for a in agendador.agendas))
+        agendador.rodar()
+        return True
+    finally:
+        trava.liberar()
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Agendador residente da automação Lubrimax")
+    parser.add_argument('--proximas', action='store_true', help="Mostra as próximas execuções e sai")
+    args = parser.parse_args()
+
+    if args.proximas:
+        agora = datetime.now()
+        for agenda in agendas_padrao():
+            momento = agenda.proxima(agora)
+            print(f"{agenda.nome:<12} {agenda.expressao:<20} {momento:%d/%m/%Y %H:%M}")
+        sys.exit(0)
+    # O automacao_completa configura o log (logs/automacao_completa.log) ao ser importado
+    sys.exit(0 if main() else 1)
@@ -1,6 +1,9 @@
 """
 Script para criar tarefa agendada no Windows
 Executa a automação diariamente às 5h da manhã
+
+Com --residente, cria no lugar uma tarefa que sobe o agendador.py no logon
+(atualizações durante o expediente, interpretador sempre carregado)
 """
 
 import subprocess
@@ -102,7 +105,43 @@ def criar_tarefa_agendada():
         print()
         return False
 
+def criar_tarefa_residente():
+    """Tarefa que inicia o agendador residente (agendador.py) no logon do usuário"""
+    script_dir = Path(__file__).parent.resolve()
+    agendador_path = script_dir / "agendador.py"
+    # pythonw: sem janela de console aberta o dia inteiro
+    pythonw = Path(sys.executable).with_name("pythonw.exe")
+    interpretador = pythonw if pythonw.exists() else Path(sys.executable)
+    task_name = "Lubrimax_Agendador"
+    
+    # A tarefa diária fica redundante (o agendador já roda a completa às 5h)
+    subprocess.run('schtasks /Delete /TN "Lubrimax_Atualizacao_Diaria" /F 2>nul', shell=True, capture_output=True)
+    
+    print("📅 Criando tarefa do agendador residente...")
+    print(f"   Nome: {task_name}")
+    print(f"   Início: no logon do usuário")
+    print(f"   Script: {agendador_path}")
+    print()
+    
+    create_cmd = (f'schtasks /Create /TN "{task_name}" '
+                  f'/TR "\\"{interpretador}\\" \\"{agendador_path}\\"" /SC ONLOGON /RL HIGHEST /F')
+    resultado = subprocess.run(create_cmd, shell=True, capture_output=True, text=True)
+    if resultado.returncode != 0:
+        print("❌ Erro ao criar tarefa!")
+        print(resultado.stderr)
+        return False
+    
+    print("✅ Tarefa criada! Para iniciar agora sem novo logon:")
+    print(f"      schtasks /Run /TN \"{task_name}\"")
+    print("   Próximas execuções:")
+    print(f"      python agendador.py --proximas")
+    print()
+    return True
+
 def main():
+    if '--residente' in sys.argv[1:]:
+        return 0 if criar_tarefa_residente() else 1
+    
     print()
     print("Este script vai configurar a automação para executar")
     print("automaticamente TODO DIA às 5:00 da manhã.")
@@ -1,7 +1,13 @@
 import streamlit as st
-from database import buscar_por_placa
+from database import (
+    buscar_por_placa, contar_vendas_arquivadas, conferir_prontidao, iniciar_recarga, BancoDesatualizado
+)
 from PIL import Image
+import logging
 import re
+import sqlite3
+import publicar_delta
+import snapshots_dataset
 
 # Configurações iniciais
 st.set_page_config(
@@ -11,6 +17,41 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+@st.cache_resource
+def carregar_dados_publicados():
+    """
+    Monta data/db.sqlite (uma vez por processo) e liga a recarga a quente:
+    dados novos entram em segundos, sem reiniciar o app
+
+    Com LUBRIMAX_SNAPSHOTS configurado, o banco vem do snapshot do manifesto
+    (pasta ou S3, independente do deploy); senão, da base + changesets
+    publicados no repositório (data/publicado).
+    """
+    if snapshots_dataset.SNAPSHOTS_URL:
+        atualizar = snapshots_dataset.atualizar_dataset
+    else:
+        atualizar = publicar_delta.carregar_dataset
+    try:
+        atualizar()
+    except Exception as e:
+        # Segue com o banco local; a próxima verificação do vigia tenta de novo
+        logging.warning(f"[AVISO] Erro ao carregar os dados publicados: {e}")
+    iniciar_recarga(antes=atualizar)
+    return True
+
+carregar_dados_publicados()
+
+# Prontidão: banco aberto e busca de uma placa de amostra. A versão servida
+# que a sondagem (sondagem.py --versao) confere é gravada pela recarga a cada
+# versão nova; sem banco legível ela não é gravada e a sondagem segue
+# esperando, enquanto o visitante vê o aviso de dados indisponíveis
+try:
+    conferir_prontidao()
+except BancoDesatualizado:
+    pass   # migração pendente: o app mostra o aviso de atualização
+except (sqlite3.Error, FileNotFoundError) as e:
+    logging.warning(f"[AVISO] Dados indisponíveis: {e}")
+
 # CSS customizado com as cores da Lubrimax
 st.markdown("""
     <style>
@@ -206,17 +247,21 @@ def validar_placa(placa):
     placa = placa.upper()
     return bool(re.match(r'^[A-Z]{3}[0-9][A-Z0-9][0-9]{2}$', placa))
 
-def formatar_km(km):
-    """Formata KM para exibição"""
-    if not km or km == '' or km == 'None':
+def formatar_km(km, suspeito=False):
+    """Formata KM para exibição (leituras inconsistentes ficam marcadas)"""
+    if km is None or km == '' or km == 'None':
         return "KM não disponível"
     
     try:
         # Formatar com separador de milhares
         km_int = int(km)
-        return f"{km_int:,} km".replace(',', '.')
+        texto = f"{km_int:,} km".replace(',', '.')
     except:
-        return str(km) + " km"
+        texto = str(km) + " km"
+    
+    if suspeito:
+        texto += " ⚠️ a conferir"
+    return texto
 
 # Campo de entrada
 placa = st.text_input(
@@ -227,6 +272,12 @@ placa = st.text_input(
     label_visibility="visible"
 ).strip().upper()
 
+# Histórico antigo fica no arquivo Parquet: só é lido quando pedido
+historico_completo = st.checkbox(
+    "📚 Incluir histórico completo (vendas antigas arquivadas)",
+    value=False
+)
+
 # Botão de consulta
 if st.button("🔍 Consultar Agora", type="primary"):
     if not placa:
@@ -259,9 +310,52 @@ if st.button("🔍 Consultar Agora", type="primary"):
         """, unsafe_allow_html=True)
     elif validar_placa(placa):
         with st.spinner("🔄 Buscando informações..."):
-            resultado = buscar_por_placa(placa)
+            try:
+                resultado = buscar_por_placa(placa, historico_completo=historico_completo)
+                arquivadas = 0 if historico_completo else contar_vendas_arquivadas(placa)
+                banco_atualizando = dados_indisponiveis = False
+            except BancoDesatualizado:
+                resultado = []
+                arquivadas = 0
+                banco_atualizando = True
+                dados_indisponiveis = False
+            except (sqlite3.Error, FileNotFoundError) as e:
+                logging.warning(f"[AVISO] Dados indisponíveis: {e}")
+                resultado = []
+                arquivadas = 0
+                banco_atualizando = False
+                dados_indisponiveis = True
         
-        if resultado:
+        if not banco_atualizando and arquivadas:
+            st.markdown(f"<p style='color: #888; text-align: center;'>🗃️ Há mais {arquivadas} venda(s) antiga(s) desta placa no histórico arquivado. Marque \"Incluir histórico completo\" para vê-las.</p>", unsafe_allow_html=True)
+        
+        if banco_atualizando:
+            # Banco em atualização (migração de estrutura ainda não aplicada)
+            st.markdown("""
+                <div style='background: linear-gradient(135deg, rgba(100, 149, 237, 0.2) 0%, rgba(100, 149, 237, 0.2) 100%);
+                            border-left: 5px solid #6495ED;
+                            border-radius: 10px;
+                            padding: 1.5rem;
+                            margin: 1.5rem 0;
+                            text-align: center;'>
+                    <h3 style='color: #6495ED; margin: 0 0 0.5rem 0;'>🔄 Base de dados em atualização</h3>
+                    <p style='color: #cccccc; margin: 0;'>Tente novamente em alguns instantes</p>
+                </div>
+            """, unsafe_allow_html=True)
+        elif dados_indisponiveis:
+            # Banco ausente ou ilegível (deploy em andamento, arquivo corrompido)
+            st.markdown("""
+                <div style='background: linear-gradient(135deg, rgba(255, 165, 0, 0.2) 0%, rgba(255, 140, 0, 0.2) 100%);
+                            border-left: 5px solid #FFA500;
+                            border-radius: 10px;
+                            padding: 1.5rem;
+                            margin: 1.5rem 0;
+                            text-align: center;'>
+                    <h3 style='color: #FFA500; margin: 0 0 0.5rem 0;'>⚠️ Dados indisponíveis no momento</h3>
+                    <p style='color: #cccccc; margin: 0;'>Tente novamente em alguns instantes</p>
+                </div>
+            """, unsafe_allow_html=True)
+        elif resultado:
             # Mensagem de sucesso estilizada
             st.markdown(f"""
                 <div style='background: linear-gradient(135deg, rgba(0, 255, 136, 0.2) 0%, rgba(0, 204, 111, 0.2) 100%);
@@ -316,8 +410,14 @@ if st.button("🔍 Consultar Agora", type="primary"):
                         st.markdown("<br>", unsafe_allow_html=True)
                         
                         st.markdown("<p class='info-label'>🛣️ Quilometragem</p>", unsafe_allow_html=True)
-                        km_formatado = formatar_km(venda.get('km'))
-                        color = "#888" if km_formatado == "KM não disponível" else "white"
+                        km_suspeito = bool(venda.get('km_suspeito'))
+                        km_formatado = formatar_km(venda.get('km'), km_suspeito)
+                        if km_formatado == "KM não disponível":
+                            color = "#888"
+                        elif km_suspeito:
+                            color = "#FFA500"
+                        else:
+                            color = "white"
                         st.markdown(f"<p class='info-value' style='color: {color};'>{km_formatado}</p>", unsafe_allow_html=True)
                     
                     # Coluna 3
@@ -0,0 +1,179 @@
+"""
+Arquivo frio do histórico de vendas (Parquet particionado por mês)
+
+Vendas mais antigas que a janela configurada saem de data/db.sqlite e vão
+para data/arquivo/ano=AAAA/mes=MM/vendas.parquet (comprimido, ordenado por
+placa). No banco fica só a janela recente e a tabela resumo_placa, que diz
+para cada placa e mês quantas vendas estão arquivadas - é com ela que a
+busca no arquivo lê apenas as partições (meses) em que a placa aparece.
+
+A janela padrão pode ser trocada pela variável de ambiente
+LUBRIMAX_JANELA_DIAS e a pasta do arquivo por LUBRIMAX_ARQUIVO_DIR.
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from migracoes import carimbar_versao_dados
+from normalizacao import COLUNAS_CHAVE_VENDA
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # leitura/escrita do arquivo indisponível
+    pq = None
+
+PROJECT_DIR = Path(__file__).parent
+ARQUIVO_DIR = Path(os.environ.get('LUBRIMAX_ARQUIVO_DIR', PROJECT_DIR / "data" / "arquivo"))
+JANELA_DIAS = int(os.environ.get('LUBRIMAX_JANELA_DIAS', 365))
+
+COLUNAS_ARQUIVO = [
+    'loja', 'data_emissao', 'numero_nf', 'serie', 'nome_cliente', 'total_venda',
+    'nome_vendedor', 'identificacao', 'placa', 'km', 'km_suspeito', 'status'
+]
+
+def _exigir_pyarrow():
+    if pq is None:
+        raise RuntimeError("pyarrow não instalado: execute pip install pyarrow")
+
+def caminho_particao(ano, mes, pasta=ARQUIVO_DIR):
+    return Path(pasta) / f'ano={ano:04d}' / f'mes={mes:02d}' / 'vendas.parquet'
+
+def data_corte(janela_dias=JANELA_DIAS):
+    """Primeiro dia que permanece no banco (texto no formato de data_emissao)"""
+    corte = datetime.now() - timedelta(days=janela_dias)
+    return corte.strftime('%Y-%m-%d 00:00:00')
+
+def _gravar_particao(df, caminho):
+    """Grava a partição se o conteúdo mudou (arquivo temporário + rename)"""
+    df = df.sort_values(['placa', 'data_emissao'], kind='mergesort').reset_index(drop=True)
+    if caminho.exists():
+        atual = pd.read_parquet(caminho)
+        if len(atual) == len(df) and atual[COLUNAS_ARQUIVO].equals(df[COLUNAS_ARQUIVO]):
+            return False
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    df.to_parquet(temporario, index=False, compression='zstd', row_group_size=50_000)
+    os.replace(temporario, caminho)
+    return True
+
+def arquivar_vendas_antigas(caminho_db, pasta=ARQUIVO_DIR, janela_dias=JANELA_DIAS):
+    """
+    Move as vendas anteriores à janela para o arquivo Parquet
+
+    Cada mês afetado é mesclado com a partição existente (sem duplicar pela
+    chave da venda). Só depois das partições gravadas é que, numa única
+    transação, o resumo_placa é refeito e as vendas saem do banco.
+
+    Returns:
+        int: quantidade de vendas arquivadas
+    """
+    _exigir_pyarrow()
+    corte = data_corte(janela_dias)
+
+    conn = sqlite3.connect(caminho_db)
+    try:
+        # Uma linha por placa vinculada à venda: a busca no arquivo filtra
+        # só pela coluna placa (row groups ordenados por placa)
+        colunas = [f'v.{c}' for c in COLUNAS_ARQUIVO if c not in ('placa', 'km', 'km_suspeito')]
+        antigas = pd.read_sql_query(f'''
+            SELECT v.id, {', '.join(colunas)},
+                   COALESCE(vp.placa, v.placa) AS placa,
+                   CASE WHEN vp.placa IS NULL THEN v.km ELSE vp.km END AS km,
+                   CASE WHEN vp.placa IS NULL OR vp.placa = v.placa THEN v.km_suspeito ELSE 0 END AS km_suspeito
+            FROM vendas v
+            LEFT JOIN venda_placa vp ON vp.venda_id = v.id
+            WHERE v.data_emissao < ?
+        ''', conn, params=(corte,))
+        if len(antigas) == 0:
+            logging.info("[INFO] Nenhuma venda para arquivar")
+            return 0
+
+        datas = pd.to_datetime(antigas['data_emissao'], errors='coerce')
+        antigas = antigas[datas.notna()]
+        datas = datas[datas.notna()]
+
+        gravadas = 0
+        for (ano, mes), grupo in antigas.groupby([datas.dt.year, datas.dt.month]):
+            caminho = caminho_particao(ano, mes, pasta)
+            novo = grupo[COLUNAS_ARQUIVO]
+            if caminho.exists():
+                novo = pd.concat([pd.read_parquet(caminho), novo], ignore_index=True)
+            novo = novo.drop_duplicates(subset=COLUNAS_CHAVE_VENDA + ['placa'], keep='last')
+            novo['km'] = novo['km'].astype('Int64')
+            novo['km_suspeito'] = novo['km_suspeito'].fillna(0).astype('int64')
+            if _gravar_particao(novo, caminho):
+                gravadas += 1
+            atualizar_resumo_placa(conn, f'{ano:04d}-{mes:02d}', novo)
+
+        ids = antigas['id'].unique()
+        conn.executemany('DELETE FROM vendas WHERE id = ?', ((int(i),) for i in ids))
+        carimbar_versao_dados(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+    logging.info(
+        f"[OK] {len(ids)} vendas anteriores a {corte[:10]} arquivadas "
+        f"({gravadas} partições gravadas)"
+    )
+    return len(ids)
+
+def atualizar_resumo_placa(conn, mes, particao):
+    """Refaz as linhas do resumo_placa de um mês a partir da partição inteira (sem commit)"""
+    conn.execute('DELETE FROM resumo_placa WHERE mes = ?', (mes,))
+
+    particao = particao[particao['placa'].notna()].sort_values('data_emissao', kind='mergesort')
+    resumo = particao.groupby('placa').agg(
+        vendas=('data_emissao', 'size'),
+        primeira=('data_emissao', 'min'),
+        ultima=('data_emissao', 'max'),
+    )
+    confiaveis = particao[particao['km'].notna() & (particao['km_suspeito'] != 1)]
+    resumo['ultimo_km'] = confiaveis.groupby('placa')['km'].last()
+
+    conn.executemany('''
+        INSERT INTO resumo_placa (
+            placa, mes, vendas, primeira_data, ultima_data, ultimo_km
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        (placa, mes, int(r.vendas), r.primeira, r.ultima,
+         None if pd.isna(r.ultimo_km) else int(r.ultimo_km))
+        for placa, r in zip(resumo.index, resumo.itertuples())
+    ))
+
+def buscar_arquivo(placa, meses, loja=None, pasta=ARQUIVO_DIR):
+    """
+    Busca as vendas arquivadas de uma placa
+
+    Só abre as partições dos meses informados (vindos do resumo_placa) e,
+    dentro delas, o filtro por placa usa as estatísticas dos row groups
+    do Parquet (os arquivos são gravados ordenados por placa).
+
+    Returns:
+        Lista de dicionários no mesmo formato de database.buscar_por_placa
+    """
+    _exigir_pyarrow()
+    filtros = [('placa', '=', placa)]
+    if loja:
+        filtros.append(('loja', '=', loja))
+
+    partes = []
+    for mes in meses:
+        ano, mes = (int(parte) for parte in mes.split('-'))
+        caminho = caminho_particao(ano, mes, pasta)
+        if caminho.exists():
+            partes.append(pq.read_table(caminho, columns=COLUNAS_ARQUIVO, filters=filtros).to_pandas())
+
+    partes = [p for p in partes if len(p)]
+    if not partes:
+        return []
+
+    df = pd.concat(partes, ignore_index=True).sort_values('data_emissao', ascending=False)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
@@ -1,9 +1,19 @@
 import os
 import sqlite3
-import pandas as pd
 import logging
-import re
-from datetime import datetime
+from migracoes import aplicar_migracoes, carimbar_versao_dados
+from esquema_relatorio import ler_relatorio, ler_relatorio_texto
+from extracao_placa import extrair_placas_dataframe, inserir_vinculos_placa
+from carga_incremental import (
+    COLUNAS_VENDA, upsert_vendas, substituir_vendas, recalcular_km_suspeito,
+    atualizar_marca_carga
+)
+import backup_database
+import staging
+import arquivo_historico
+from normalizacao import (
+    LOJAS, remover_duplicatas, converter_km, marcar_km_suspeito
+)
 
 # Configuração de logging
 logging.basicConfig(
@@ -18,169 +28,34 @@ logging.basicConfig(
     ]
 )
 
-def extrair_placa_km(observacao):
-    """
-    Extrai placa e KM do campo observação
-    
-    Formatos aceitos para KM:
-    - "KM 123456"
-    - "KM: 220.878" (com pontos)
-    - "KM  265184" (com espaços extras)
-    - "KM  1207403" (milhões)
-    - "KM: 220,878" (com vírgulas)
-    
-    Formatos aceitos para placa:
-    - "PLACA: ABC1234" ou "PLACA ABC1234"
-    - "PLACAS: ABC1234" (plural)
-    - "ABC1234" (só a placa)
-    - "VW ABC1234" (com modelo)
-    - "DUCATO ABC1234"
-    
-    Returns:
-        tuple: (placa, km) onde km pode ser None
-    """
-    if pd.isna(observacao):
-        return None, None
-    
-    observacao = str(observacao).strip().upper()
-    
-    # Extrair KM se existir - aceita pontos, vírgulas e espaços como separadores
-    km = None
-    # Busca padrão: KM seguido de números com possíveis separadores
-    km_match = re.search(r'KM\s*[:=]?\s*([\d.,\s]+)', observacao, re.IGNORECASE)
-    if km_match:
-        km_str = km_match.group(1)
-        # Remover pontos, vírgulas e espaços (separadores de milhares)
-        km_clean = re.sub(r'[.,\s]', '', km_str)
-        # Pegar apenas os dígitos
-        km_digits = re.search(r'(\d+)', km_clean)
-        if km_digits:
-            km = km_digits.group(1)
-    
-    # Extrair placa
-    placa = None
-    
-    # Padrão 1: "PLACA:" ou "PLACAS:" seguido da placa
-    placa_match = re.search(r'PLACAS?\s*[:=]?\s*([A-Z]{3}[0-9][A-Z0-9][0-9]{2})', observacao)
-    if placa_match:
-        placa = placa_match.group(1)
-        return placa, km
-    
-    # Padrão 2: Buscar qualquer placa no formato brasileiro (antigo ou Mercosul)
-    # Ignorar se for parte de KM ou número
-    placa_match = re.search(r'\b([A-Z]{3}[0-9][A-Z0-9][0-9]{2})\b', observacao)
-    if placa_match:
-        placa = placa_match.group(1)
-        return placa, km
-    
-    # Padrão 3: Buscar placa com hífen ou espaço (ex: ABC-1234 ou ABC 1234)
-    placa_match = re.search(r'([A-Z]{3}[-\s]?[0-9][A-Z0-9][0-9]{2})', observacao)
-    if placa_match:
-        placa = placa_match.group(1).replace('-', '').replace(' ', '')
-        return placa, km
-    
-    return None, km
-
 def criar_tabela_vendas():
-    """Cria a tabela de vendas com estrutura atualizada"""
-    conn = sqlite3.connect(r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite')
-    cursor = conn.cursor()
-    
-    # Apagar tabela antiga se existir
-    cursor.execute('DROP TABLE IF EXISTS vendas')
-    
-    # Criar tabela nova com todos os campos
-    cursor.execute('''
-        CREATE TABLE vendas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data_emissao TEXT,
-            numero_nf INTEGER,
-            serie TEXT,
-            nome_cliente TEXT,
-            total_venda REAL,
-            nome_vendedor TEXT,
-            identificacao TEXT,
-            placa TEXT,
-            km TEXT,
-            status TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Criar índice na coluna placa para buscas mais rápidas
-    cursor.execute('CREATE INDEX idx_placa ON vendas(placa)')
-    
-    conn.commit()
-    conn.close()
-    logging.info("[OK] Tabela vendas criada com sucesso (com campo KM)")
+    """Cria/atualiza a estrutura do banco aplicando as migrações pendentes"""
+    versao = aplicar_migracoes(r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite')
+    logging.info(f"[OK] Estrutura do banco na versão {versao}")
 
-def processar_excel():
-    """Processa o arquivo Excel e retorna um DataFrame limpo com placa e KM extraídos"""
-    caminho_excel = r'C:\Projetos\Lubrimax\Vendas_Lubrimax.xlsx'
-    
+def processar_excel(caminho_excel, loja=None):
+    """
+    Processa um relatório Excel e retorna um DataFrame limpo com placa e KM extraídos
+
+    Args:
+        loja: loja do relatório; obrigatória quando o Excel não tem a coluna
+              LOJA (relatório de uma loja só, como os do iAdmin)
+    """
     if not os.path.exists(caminho_excel):
         logging.error(f"[ERRO] Arquivo não encontrado: {caminho_excel}")
         return None
     
     try:
-        # Ler Excel
-        df = pd.read_excel(caminho_excel, engine='openpyxl')
-        logging.info(f"[OK] Excel carregado com {len(df)} registros")
-        logging.info(f"Colunas encontradas: {df.columns.tolist()}")
-        
-        # Mapear colunas do Excel para estrutura do banco
-        df = df.rename(columns={
-            'EMISSÃO': 'data_emissao',
-            'SÉRIE': 'serie',
-            'NUMERO VENDA': 'numero_nf',
-            'CLIENTE': 'nome_cliente',
-            'TOTAL VENDA': 'total_venda',
-            'VENDEDOR': 'nome_vendedor',
-            'IDENTIFICAÇÃO': 'identificacao',
-            'STATUS': 'status',
-            'OBSERVAÇÃO': 'observacao'
-        })
-        
-        # Extrair placa e KM da observação
-        logging.info("[INFO] Extraindo placa e KM do campo OBSERVAÇÃO...")
-        
-        df[['placa_extraida', 'km']] = df['observacao'].apply(
-            lambda x: pd.Series(extrair_placa_km(x))
-        )
-        
-        # Usar placa extraída ou identificação como fallback
-        df['placa'] = df['placa_extraida'].fillna(df['identificacao'])
-        
-        # Limpar placa (remover espaços, hífens, etc)
-        df['placa'] = df['placa'].apply(
-            lambda x: re.sub(r'[^A-Z0-9]', '', str(x).upper()) if pd.notna(x) else None
-        )
-        
-        # Converter data
-        try:
-            df['data_emissao'] = pd.to_datetime(df['data_emissao'], format='%d/%m/%Y')
-            df['data_emissao'] = df['data_emissao'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        except:
-            logging.warning("[AVISO] Erro ao converter datas, mantendo formato original")
-        
-        # Converter valores (tratar vírgula como decimal)
-        try:
-            if df['total_venda'].dtype == 'object':
-                df['total_venda'] = df['total_venda'].str.replace('.', '', regex=False)
-                df['total_venda'] = df['total_venda'].str.replace(',', '.', regex=False)
-            df['total_venda'] = pd.to_numeric(df['total_venda'], errors='coerce')
-        except:
-            logging.warning("[AVISO] Erro ao converter valores")
-        
-        # Remover linhas sem placa
-        df_limpo = df[df['placa'].notna()]
-        logging.info(f"[OK] Após limpeza: {len(df_limpo)} registros com placa válida")
-        
-        # Estatísticas
-        registros_com_km = df_limpo['km'].notna().sum()
-        logging.info(f"[INFO] Registros com KM: {registros_com_km}/{len(df_limpo)}")
-        
-        return df_limpo
+        # Ler Excel: só as colunas do esquema, já convertidas (datas, valores
+        # em padrão brasileiro, categorias) linha a linha
+        df, rejeitados = ler_relatorio(caminho_excel, loja)
+        logging.info(f"[OK] Excel carregado com {len(df) + len(rejeitados)} registros")
+        sem_loja = int(df['loja'].isna().sum())
+        if sem_loja:
+            # Venda sem loja fica fora da busca por loja e da recarga por loja
+            logging.error(f"[ERRO] {sem_loja} registros sem loja no Excel: informe a loja do relatório (--loja)")
+            return None
+        return preparar_vendas(df, rejeitados)
     
     except Exception as e:
         logging.error(f"[ERRO] Erro ao processar Excel: {e}")
@@ -188,8 +63,54 @@ def processar_excel():
         logging.error(traceback.format_exc())
         return None
 
-def atualizar_database(df):
-    """Atualiza o banco de dados com os dados do DataFrame"""
+def preparar_vendas(df, rejeitados):
+    """Extrai placa e KM, remove linhas sem placa e duplicatas e marca KM suspeito"""
+    if len(rejeitados):
+        logging.warning(f"[AVISO] {len(rejeitados)} registros rejeitados (data ou número da venda inválidos)")
+        logging.warning(f"Exemplos rejeitados:\n{rejeitados.head(5).to_string()}")
+    if df.attrs.get('valores_invalidos'):
+        logging.warning(f"[AVISO] {df.attrs['valores_invalidos']} registros com algum valor inválido (gravado vazio)")
+    
+    # Extrair todas as placas e KMs (OBSERVAÇÃO + IDENTIFICAÇÃO) numa
+    # única passada; a primeira placa vira a placa principal da venda
+    logging.info("[INFO] Extraindo placas e KM dos campos OBSERVAÇÃO e IDENTIFICAÇÃO...")
+    extrair_placas_dataframe(df)
+    
+    # Remover linhas sem placa
+    df_limpo = df[df['placa'].notna()]
+    logging.info(f"[OK] Após limpeza: {len(df_limpo)} registros com placa válida")
+    
+    # Remover vendas duplicadas (re-execuções / janelas sobrepostas)
+    df_limpo, duplicadas = remover_duplicatas(df_limpo)
+    logging.info(f"[INFO] Vendas duplicadas removidas: {duplicadas}")
+    
+    # KM como inteiro + checagem de consistência do hodômetro por veículo
+    converter_km(df_limpo)
+    marcar_km_suspeito(df_limpo)
+    
+    # Estatísticas
+    registros_com_km = df_limpo['km'].notna().sum()
+    logging.info(f"[INFO] Registros com KM: {registros_com_km}/{len(df_limpo)}")
+    logging.info(f"[INFO] KM suspeito (salto/regressão): {int(df_limpo['km_suspeito'].sum())}")
+    
+    return df_limpo
+
+def atualizar_database(df, loja=None, incremental=False, entrada_staging=None):
+    """
+    Atualiza o banco de dados com os dados do DataFrame
+    
+    Args:
+        df: DataFrame processado
+        loja: Se informada, substitui apenas as vendas dessa loja
+              (as vendas das outras lojas não são reescritas)
+        incremental: O df traz só as vendas desde a marca d'água: nada é
+                     removido, cada venda é inserida ou atualizada (upsert)
+        entrada_staging: Arquivo de staging de origem, marcado como
+                         ingerido na mesma transação
+    
+    A remoção dos registros antigos e a inserção dos novos acontecem na
+    mesma transação: o app nunca enxerga a tabela vazia ou pela metade.
+    """
     if df is None or len(df) == 0:
         logging.warning("[AVISO] Nenhum dado para inserir")
         return False
@@ -198,44 +119,39 @@ def atualizar_database(df):
         conn = sqlite3.connect(r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite')
         cursor = conn.cursor()
         
-        # Selecionar colunas para inserção
-        colunas_inserir = [
-            'data_emissao', 'numero_nf', 'serie', 'nome_cliente',
-            'total_venda', 'nome_vendedor', 'identificacao',
-            'placa', 'km', 'status'
-        ]
+        for coluna in COLUNAS_VENDA:
+            if coluna not in df.columns:
+                df[coluna] = None
         
-        # Inserir dados
-        registros_inseridos = 0
-        for _, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT INTO vendas (
-                        data_emissao, numero_nf, serie, nome_cliente,
-                        total_venda, nome_vendedor, identificacao,
-                        placa, km, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    row.get('data_emissao'),
-                    row.get('numero_nf'),
-                    row.get('serie'),
-                    row.get('nome_cliente'),
-                    row.get('total_venda'),
-                    row.get('nome_vendedor'),
-                    row.get('identificacao'),
-                    row.get('placa'),
-                    row.get('km'),
-                    row.get('status')
-                ))
-                registros_inseridos += 1
-            except Exception as e:
-                logging.warning(f"[AVISO] Erro ao inserir registro: {e}")
-                continue
+        if incremental:
+            registros_gravados = upsert_vendas(cursor, df)
+            logging.info(f"[INFO] {registros_gravados} vendas inseridas ou atualizadas (upsert)")
+        else:
+            # Recarga de uma loja mexe só na faixa dessa loja (idx_vendas_loja_placa).
+            # Vendas que continuam no relatório mantêm o id (changeset publicado enxuto)
+            registros_gravados, removidos = substituir_vendas(cursor, df, loja)
+            origem = f"da loja {loja}" if loja else "de todas as lojas"
+            logging.info(f"[INFO] {registros_gravados} vendas gravadas e {removidos} removidas ({origem})")
+        
+        # Vínculos placa/venda (vendas que citam mais de um veículo)
+        vinculos = inserir_vinculos_placa(cursor, df)
+        logging.info(f"[INFO] {vinculos} vínculos placa/venda gravados")
+        
+        if incremental:
+            # Leituras novas comparadas com o histórico das mesmas placas
+            placas = df['placa'].dropna().unique()
+            alterados = recalcular_km_suspeito(cursor, placas)
+            logging.info(f"[INFO] KM suspeito recalculado para {len(placas)} placas ({alterados} alterações)")
+        
+        atualizar_marca_carga(cursor, df)
+        if entrada_staging:
+            staging.marcar_ingerido(cursor, entrada_staging, registros_gravados)
+        carimbar_versao_dados(cursor)
         
         conn.commit()
         conn.close()
         
-        logging.info(f"[OK] {registros_inseridos} registros inseridos no banco de dados")
+        logging.info(f"[OK] {registros_gravados} registros gravados no banco de dados")
         return True
     
     except Exception as e:
@@ -255,7 +171,7 @@ def verificar_dados():
     cursor.execute('SELECT COUNT(DISTINCT placa) FROM vendas WHERE placa IS NOT NULL')
     total_placas = cursor.fetchone()[0]
     
-    cursor.execute('SELECT COUNT(*) FROM vendas WHERE km IS NOT NULL AND km != ""')
+    cursor.execute('SELECT COUNT(*) FROM vendas WHERE km IS NOT NULL')
     total_com_km = cursor.fetchone()[0]
     
     conn.close()
@@ -267,57 +183,125 @@ def verificar_dados():
     return total, total_placas, total_com_km
 
 def fazer_backup():
-    """Faz backup do banco de dados antes de atualizar"""
+    """Faz backup do banco de dados antes de atualizar (snapshot online e incremental)"""
     try:
         origem = r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite'
         destino = r'C:\Projetos\Lubrimax\Site_Consulta\data\backups'
         
-        # Criar pasta de backups se não existir
-        os.makedirs(destino, exist_ok=True)
-        
         if os.path.exists(origem):
-            import shutil
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_file = os.path.join(destino, f'db_backup_{timestamp}.sqlite')
-            shutil.copy2(origem, backup_file)
-            logging.info(f"[OK] Backup criado: {backup_file}")
-            
-            # Manter apenas últimos 7 backups
-            backups = sorted([f for f in os.listdir(destino) if f.startswith('db_backup_')])
-            if len(backups) > 7:
-                for old_backup in backups[:-7]:
-                    os.remove(os.path.join(destino, old_backup))
-                    logging.info(f"[INFO] Backup antigo removido: {old_backup}")
+            backup_database.criar_backup(origem, destino)
+            backup_database.aplicar_retencao(destino)
         
         return True
     except Exception as e:
         logging.warning(f"[AVISO] Erro ao fazer backup: {e}")
         return False
 
-def main():
-    """Função principal"""
+def processar_staging(loja=None):
+    """
+    Grava no banco as extrações do manifesto de staging ainda não ingeridas
+    
+    Cada arquivo é lido sozinho (sem juntar num relatório único) e gravado
+    na ordem do manifesto: extração completa substitui as vendas da loja,
+    incremental faz upsert. Arquivos já ingeridos são pulados pelo sha256.
+    
+    Returns:
+        tuple: (arquivos gravados, sucesso)
+    """
+    conn = sqlite3.connect(r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite')
+    try:
+        entradas = staging.pendentes(conn, loja)
+    finally:
+        conn.close()
+    
+    if not entradas:
+        logging.info("[INFO] Nenhum arquivo novo no staging")
+        return 0, True
+    logging.info(f"[INFO] {len(entradas)} arquivo(s) de staging para gravar")
+    
+    gravados = 0
+    for entrada in entradas:
+        descricao = f"{entrada['arquivo']} ({'incremental' if entrada['incremental'] else 'completo'})"
+        logging.info(f"[INFO] Lendo {descricao}")
+        try:
+            df, rejeitados = ler_relatorio_texto(entrada['caminho'], entrada['loja'])
+            entrada['lidas'] = len(df) + len(rejeitados)
+            df = preparar_vendas(df, rejeitados)
+            entrada['rejeitadas'] = entrada['lidas'] - len(df)
+        except Exception as e:
+            logging.error(f"[ERRO] Erro ao ler {entrada['arquivo']}: {e}")
+            return gravados, False
+        
+        if len(df) == 0:
+            # Nada a gravar (ex.: incremental sem vendas novas); não apaga a loja
+            conn = sqlite3.connect(r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite')
+            staging.marcar_ingerido(conn.cursor(), entrada, 0)
+            conn.commit()
+            conn.close()
+            logging.info(f"[INFO] {entrada['arquivo']} sem vendas com placa")
+        elif not atualizar_database(df, loja=entrada['loja'], incremental=entrada['incremental'],
+                                    entrada_staging=entrada):
+            # Para na primeira falha: as extrações seguintes da loja dependem desta
+            return gravados, False
+        gravados += 1
+    return gravados, True
+
+def main(loja=None, incremental=False, caminho_excel=None, backup=True):
+    """
+    Função principal
+    
+    Args:
+        loja: Se informada (ex: 'ADJ'), grava somente essa loja
+        incremental: O Excel traz só as vendas desde a marca d'água
+                     (upsert, sem remover o restante do histórico)
+        caminho_excel: Carrega um relatório Excel em vez do staging
+                       (importação manual)
+        backup: Faz o backup antes de gravar (a automação faz o backup
+                numa etapa própria, em paralelo com a validação)
+    """
     logging.info("=" * 60)
-    logging.info("🔄 Iniciando atualização do banco de dados Lubrimax")
+    if loja:
+        logging.info(f"🔄 Iniciando atualização do banco de dados Lubrimax (loja {loja})")
+    else:
+        logging.info("🔄 Iniciando atualização do banco de dados Lubrimax")
     logging.info("=" * 60)
     
     # Passo 1: Fazer backup
-    fazer_backup()
+    if backup:
+        fazer_backup()
     
-    # Passo 2: Criar/recriar tabela
+    # Passo 2: Aplicar migrações pendentes (sem DROP TABLE)
     criar_tabela_vendas()
     
-    # Passo 3: Processar Excel
-    df = processar_excel()
-    
-    if df is None:
-        logging.error("❌ Falha ao processar Excel")
-        return False
-    
-    # Passo 4: Atualizar banco de dados
-    sucesso = atualizar_database(df)
+    if caminho_excel:
+        # Passo 3: Processar Excel (sem a coluna LOJA, o relatório é da loja informada)
+        df = processar_excel(caminho_excel, loja)
+        
+        if df is None:
+            logging.error("❌ Falha ao processar Excel")
+            return False
+        
+        if loja:
+            df = df[df['loja'] == loja]
+            logging.info(f"[INFO] {len(df)} registros da loja {loja}")
+        
+        # Passo 4: Atualizar banco de dados
+        sucesso = atualizar_database(df, loja=loja, incremental=incremental)
+    else:
+        # Passos 3 e 4: Gravar as extrações novas do staging
+        gravados, sucesso = processar_staging(loja)
     
     if sucesso:
-        # Passo 5: Verificar dados inseridos
+        # Passo 5: Mover vendas antigas para o arquivo Parquet (banco enxuto)
+        try:
+            arquivo_historico.arquivar_vendas_antigas(
+                r'C:\Projetos\Lubrimax\Site_Consulta\data\db.sqlite',
+                r'C:\Projetos\Lubrimax\Site_Consulta\data\arquivo'
+            )
+        except Exception as e:
+            logging.warning(f"[AVISO] Erro ao arquivar vendas antigas: {e}")
+        
+        # Passo 6: Verificar dados inseridos
         total, placas, com_km = verificar_dados()
         
         logging.info("=" * 60)
@@ -336,8 +320,20 @@ def main():
         return False
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Atualiza o banco de dados de vendas")
+    parser.add_argument('--loja', choices=LOJAS, help="Grava apenas as vendas desta loja")
+    parser.add_argument('--excel', metavar='ARQUIVO',
+                        help="Carrega um relatório Excel em vez das extrações do staging "
+                             "(com --loja quando o Excel não tem a coluna LOJA)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Excel parcial (desde a marca d'água): upsert sem remover vendas")
+    parser.add_argument('--sem-backup', action='store_true',
+                        help="Não faz o backup antes de gravar")
+    args = parser.parse_args()
     try:
-        sucesso = main()
+        sucesso = main(loja=args.loja, incremental=args.incremental, caminho_excel=args.excel,
+                       backup=not args.sem_backup)
         if not sucesso:
             input("\nPressione ENTER para sair...")
     except Exception as e:
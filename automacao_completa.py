@@ -1,21 +1,51 @@
 """
 Script automatizado para execução diária às 5h da manhã
-Fluxo completo:
-1. Baixa relatórios
+(ou várias vezes ao dia pelo agendador residente, agendador.py)
+Fluxo completo (grafo de etapas em pipeline.py, independentes em paralelo):
+1. Acorda o app no Streamlit Cloud enquanto baixa os relatórios
 2. Atualiza banco de dados
-3. Faz commit e push para GitHub
-4. Streamlit Cloud detecta mudança e atualiza automaticamente
+3. Backup do banco junto com a validação
+4. Publica o changeset do dia em data/publicado (publicar_delta.py)
+5. Faz commit e push para GitHub (só quando há dados novos)
+6. Streamlit Cloud detecta mudança e atualiza automaticamente
+
+Tempos de cada etapa e caminho crítico: log e logs/pipeline/pipeline_*.json.
+Métricas de cada execução (etapas, linhas, tamanho do banco, bytes do push,
+tempo até o app acordar) vão para logs/metricas_pipeline.sqlite; tendências
+com: python metricas_pipeline.py
+
+LUBRIMAX_PUBLICACAO=completo volta a enviar o data/db.sqlite inteiro;
+LUBRIMAX_PUBLICACAO=snapshot publica snapshots fora do git (snapshots_dataset.py).
+
+As etapas rodam neste mesmo interpretador (pandas e companhia importados uma
+vez só); só a extração pela tela roda num processo próprio (limite em
+LUBRIMAX_TIMEOUT_ISOLADA, padrão 30 min). LUBRIMAX_ISOLAR escolhe as etapas
+isoladas ("download,ingestao", "todas" ou "nenhuma") para comparar a
+sobrecarga de início/importação no relatório da execução.
+
+A extração entrega as vendas à ingestão pelos arquivos de staging, não por
+DataFrames em memória: o processo isolado da extração não compartilha memória
+com este, e o staging é o registro imutável de cada extração (a ingestão
+retoma pelo manifesto e pula pelo sha256 o que já gravou). Com a extração no
+mesmo processo (LUBRIMAX_ISOLAR=nenhuma) o custo que sobra é só reler o texto
+copiado do relatório.
 """
 
 import subprocess
 import logging
 import os
+import sqlite3
 import sys
 from datetime import datetime
 from pathlib import Path
-import requests
 import time
 
+import backup_database
+import metricas_pipeline
+import sondagem
+from migracoes import versao_dados
+from pipeline import Pipeline
+
 # Garantir que estamos no diretório correto
 SCRIPT_DIR = Path(__file__).parent.resolve()
 os.chdir(SCRIPT_DIR)
@@ -24,6 +54,23 @@ os.chdir(SCRIPT_DIR)
 LOGS_DIR = SCRIPT_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
 
+# 'delta': envia só base semanal + changesets (data/publicado)
+# 'snapshot': publica o snapshot no armazenamento (LUBRIMAX_SNAPSHOTS), sem git
+# 'completo': envia o data/db.sqlite inteiro, como antes
+MODO_PUBLICACAO = os.environ.get('LUBRIMAX_PUBLICACAO', 'delta')
+
+DB_PATH = SCRIPT_DIR / 'data' / 'db.sqlite'
+PIPELINE_DIR = LOGS_DIR / 'pipeline'
+
+# Etapas em processo próprio: a extração usa o desktop (pyautogui/Chrome) e
+# pode travar; um interpretador separado é encerrado pelo timeout sem
+# derrubar a automação
+ETAPAS_ISOLAVEIS = ['download', 'ingestao', 'publicacao']
+ISOLAR = os.environ.get('LUBRIMAX_ISOLAR', 'download')
+
+# Métricas medidas dentro das etapas (gravadas no fim em metricas_pipeline)
+metricas_execucao = {}
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -36,55 +83,12 @@ logging.basicConfig(
     ]
 )
 
-def acordar_streamlit(max_tentativas=5, intervalo=60):
-    """
-    Envia requisições para o app Streamlit para evitar que ele entre em modo de suspensão.
-    O Streamlit Cloud pode demorar até 5 minutos para acordar um app em sleep mode.
-    
-    Args:
-        max_tentativas: Número máximo de tentativas
-        intervalo: Segundos entre tentativas
-    """
-    url_app = "https://lubrimax.streamlit.app"
-    
-    logging.info(f"⏰ Acordando Streamlit App: {url_app}")
-    logging.info(f"   (Até {max_tentativas} tentativas com {intervalo}s de intervalo)")
-    
-    for tentativa in range(1, max_tentativas + 1):
-        try:
-            logging.info(f"   Tentativa {tentativa}/{max_tentativas}...")
-            response = requests.get(url_app, timeout=120)  # Timeout maior para apps dormindo
-            
-            if response.status_code == 200:
-                # Verifica se é a página real ou página de "waking up"
-                if "Please wait" in response.text or "waking up" in response.text.lower():
-                    logging.info(f"   ⏳ App está acordando... aguardando {intervalo}s")
-                    time.sleep(intervalo)
-                    continue
-                else:
-                    logging.info("✅ Streamlit App acordado e respondendo!")
-                    return True
-            else:
-                logging.warning(f"   ⚠️ Status: {response.status_code}")
-                
-        except requests.exceptions.Timeout:
-            logging.info(f"   ⏳ Timeout - app pode estar acordando... aguardando {intervalo}s")
-        except Exception as e:
-            logging.warning(f"   ⚠️ Erro: {e}")
-        
-        if tentativa < max_tentativas:
-            time.sleep(intervalo)
-    
-    logging.warning("⚠️ Não foi possível confirmar que o app acordou completamente")
-    logging.info("   O app deve acordar automaticamente quando acessado manualmente")
-    return False
-
 def executar_comando(comando, descricao, critical=False):
     """
     Executa um comando e retorna True se bem sucedido
     
     Args:
-        comando: Comando a ser executado
+        comando: Comando a ser executado (lista de argumentos roda sem shell)
         descricao: Descrição do comando para log
         critical: Se True, encerra o script em caso de falha
     """
@@ -94,7 +98,7 @@ def executar_comando(comando, descricao, critical=False):
         
         resultado = subprocess.run(
             comando, 
-            shell=True, 
+            shell=isinstance(comando, str), 
             capture_output=True, 
             text=True, 
             cwd=SCRIPT_DIR,
@@ -129,12 +133,11 @@ def executar_comando(comando, descricao, critical=False):
             sys.exit(1)
         return False
 
-def verificar_mudancas_git():
-    """Verifica se há mudanças no repositório"""
+def verificar_mudancas_git(caminhos=()):
+    """Verifica se há mudanças no repositório (ou só nos caminhos informados)"""
     try:
         resultado = subprocess.run(
-            "git status --porcelain",
-            shell=True,
+            ["git", "status", "--porcelain", "--", *caminhos],
             capture_output=True,
             text=True,
             cwd=SCRIPT_DIR
@@ -144,144 +147,291 @@ def verificar_mudancas_git():
         logging.error(f"Erro ao verificar mudanças Git: {e}")
         return False
 
-def main():
-    """Função principal da automação"""
-    inicio = datetime.now()
-    logging.info("=" * 70)
-    logging.info(f"🤖 AUTOMAÇÃO COMPLETA INICIADA - {inicio.strftime('%d/%m/%Y %H:%M:%S')}")
-    logging.info(f"📁 Diretório de trabalho: {SCRIPT_DIR}")
-    logging.info("=" * 70)
-    
-    # Verificar se estamos em um repositório Git
-    if not (SCRIPT_DIR / '.git').exists():
-        logging.critical("❌ Não é um repositório Git! Verifique o diretório.")
-        return False
-    
-    # Etapa 0: Acordar o Streamlit ANTES de tudo (para ganhar tempo)
-    logging.info("\n⏰ ETAPA 0/5: Acordando Streamlit App (processo em paralelo)")
-    logging.info("   Isso evita que o app fique 'travado' quando você acessar de manhã")
-    acordar_streamlit(max_tentativas=3, intervalo=30)  # Primeira tentativa rápida
-    
-    # Etapa 1: Download dos relatórios
-    logging.info("\n📥 ETAPA 1/5: Download dos relatórios")
-    python_cmd = sys.executable  # Usa o mesmo Python que está executando o script
-    sucesso_download = executar_comando(
-        f'"{python_cmd}" download_relatorio.py',
-        "Download e processamento dos relatórios",
-        critical=True  # Crítico - para tudo se falhar
-    )
-    
-    # Etapa 2: Verificar se o arquivo do banco existe
-    logging.info("\n🔍 ETAPA 2/5: Verificando banco de dados")
-    db_path = SCRIPT_DIR / 'data' / 'db.sqlite'
-    if db_path.exists():
-        tamanho = db_path.stat().st_size
-        logging.info(f"✅ Banco de dados encontrado ({tamanho:,} bytes)")
-        
-        # Verificar se tem conteúdo
-        if tamanho == 0:
-            logging.error("❌ Banco de dados vazio!")
-            return False
-    else:
+def versao_publicada():
+    """Carimbo dos dados do banco que acabou de ser publicado (tabela meta)"""
+    conn = sqlite3.connect(DB_PATH.resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        return versao_dados(conn)
+    finally:
+        conn.close()
+
+def etapa_acordar(metrica, versao_esperada=None):
+    """
+    Acorda o app e guarda o tempo até ficar pronto na métrica informada
+
+    Com versao_esperada (após o deploy), só conta como pronto o app que já
+    serve essa versão dos dados, não a instância antiga.
+    """
+    resultado = sondagem.aguardar_app(limite=300, versao_esperada=versao_esperada)
+    metricas_execucao[metrica] = resultado['tempo_ate_pronto']
+    return resultado['pronto']
+
+def etapa_acordar_deploy():
+    """Espera o redeploy servir os dados publicados (só se houve push)"""
+    if not metricas_execucao.get('deploy'):
+        logging.info("ℹ️  Nada enviado: sem redeploy para esperar")
+        return True
+    return etapa_acordar('tempo_acordar_deploy', versao_publicada())
+
+def isolar(etapa):
+    """True se a etapa deve rodar num interpretador próprio (LUBRIMAX_ISOLAR)"""
+    escolhidas = {e.strip() for e in ISOLAR.split(',')}
+    if 'todas' in escolhidas:
+        return etapa in ETAPAS_ISOLAVEIS
+    return etapa in escolhidas
+
+def etapa_backup():
+    """Snapshot incremental do banco atualizado"""
+    backup_database.criar_backup(DB_PATH)
+    backup_database.aplicar_retencao()
+    return True
+
+def etapa_validacao():
+    """Confere se o banco existe, não está vazio e está íntegro"""
+    if not DB_PATH.exists():
         logging.error("❌ Banco de dados não encontrado!")
         return False
-    
-    # Etapa 3: Verificar mudanças
-    logging.info("\n🔎 ETAPA 3/5: Verificando mudanças no repositório")
-    if not verificar_mudancas_git():
-        logging.info("ℹ️  Nenhuma mudança detectada. Nada para commitar.")
-        logging.info("✅ Automação concluída (sem atualizações)")
-        return True
-    
-    # Etapa 4: Git add, commit e push
-    logging.info("\n📤 ETAPA 4/5: Enviando para GitHub")
-    
+    tamanho = DB_PATH.stat().st_size
+    if tamanho == 0:
+        logging.error("❌ Banco de dados vazio!")
+        return False
+    conn = sqlite3.connect(DB_PATH.resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        integridade = conn.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        conn.close()
+    if integridade != 'ok':
+        logging.error(f"❌ Banco de dados corrompido: {integridade}")
+        return False
+    logging.info(f"✅ Banco de dados encontrado e íntegro ({tamanho:,} bytes)")
+    return True
+
+def bytes_para_enviar():
+    """
+    Tamanho (em disco, comprimido) dos objetos que o push vai enviar
+
+    Estimativa do tráfego do push: soma dos objetos alcançáveis pelo HEAD
+    que ainda não estão em origin/main.
+    """
+    objetos = subprocess.run(
+        ['git', 'rev-list', '--objects', 'origin/main..HEAD'],
+        capture_output=True, text=True, cwd=SCRIPT_DIR
+    )
+    if objetos.returncode != 0:
+        return None
+    hashes = '\n'.join(linha.split(' ', 1)[0] for linha in objetos.stdout.splitlines() if linha)
+    if not hashes:
+        return 0
+    tamanhos = subprocess.run(
+        ['git', 'cat-file', '--batch-check=%(objectsize:disk)'],
+        input=hashes + '\n', capture_output=True, text=True, cwd=SCRIPT_DIR
+    )
+    if tamanhos.returncode != 0:
+        return None
+    return sum(int(t) for t in tamanhos.stdout.split() if t.isdigit())
+
+def commits_nao_enviados():
+    """Quantidade de commits locais que ainda não estão em origin/main"""
+    resultado = subprocess.run(
+        ['git', 'rev-list', '--count', 'origin/main..HEAD'],
+        capture_output=True, text=True, cwd=SCRIPT_DIR
+    )
+    if resultado.returncode != 0:
+        return 0
+    return int(resultado.stdout.strip() or 0)
+
+def commitar_dados(arquivos_dados, intradiaria=False):
+    """Commit dos dados publicados (e dos logs, fora da intradiária)"""
     # Git add - adicionar arquivos críticos
-    arquivos_git = [
-        "data/db.sqlite",
-        "Vendas_Lubrimax.xlsx",
-        "logs/*.log"
-    ]
+    arquivos_git = [a for a in arquivos_dados if not (MODO_PUBLICACAO == 'delta' and a == 'data/db.sqlite')]
+    if not intradiaria:
+        arquivos_git.append("logs/*.log")
     
+    existentes = []
     for arquivo in arquivos_git:
-        arquivo_path = SCRIPT_DIR / arquivo.replace('/', '\\')
+        arquivo_path = SCRIPT_DIR / arquivo
         if '*' in arquivo or arquivo_path.exists():
-            executar_comando(
-                f'git add "{arquivo}"',
-                f"Git add - {arquivo}"
-            )
+            existentes.append(arquivo)
         else:
             logging.warning(f"⚠️ Arquivo não encontrado: {arquivo}")
+    if existentes:
+        # Um git add só para todos os caminhos
+        # -A: inclui as bases/changesets antigos removidos da pasta
+        # -f: o db.sqlite fica no .gitignore no modo delta
+        executar_comando(
+            ["git", "add", "-A", "-f", "--", *existentes],
+            f"Git add - {', '.join(existentes)}"
+        )
     
     # Git commit
     data_commit = datetime.now().strftime('%d/%m/%Y %H:%M')
-    sucesso_commit = executar_comando(
-        f'git commit -m "🤖 Atualização automática dos dados - {data_commit}"',
+    return executar_comando(
+        ["git", "commit", "-m", f"🤖 Atualização automática dos dados - {data_commit}"],
         "Git commit"
     )
+
+def etapa_git(intradiaria=False):
+    """
+    Commit e push dos dados para o GitHub
+
+    Sem dados novos (changeset vazio) não há commit nem push: cada push
+    dispara um redeploy do app. Na intradiária os logs ficam de fora do
+    commit e vão junto com o da execução completa.
+    """
+    metricas_execucao['deploy'] = False
+    if MODO_PUBLICACAO == 'delta':
+        # O binário deixa de ir para o repositório (o app monta a partir da publicação)
+        executar_comando(
+            ["git", "rm", "--cached", "--ignore-unmatch", "-q", "data/db.sqlite"],
+            "Git rm --cached - data/db.sqlite"
+        )
     
-    if not sucesso_commit:
-        logging.warning("⚠️ Nenhuma mudança para commit")
-        logging.info("✅ Automação concluída (sem mudanças)")
-        return True
+    # Arquivos de dados publicados
+    if MODO_PUBLICACAO == 'delta':
+        arquivos_dados = ["data/publicado", "data/arquivo", "data/db.sqlite"]
+    else:
+        arquivos_dados = ["data/db.sqlite", "data/arquivo"]
+    
+    commitado = verificar_mudancas_git(arquivos_dados) and commitar_dados(arquivos_dados, intradiaria)
+    if not commitado:
+        # Push que falhou numa execução anterior ainda precisa sair
+        pendentes = commits_nao_enviados()
+        if not pendentes:
+            logging.info("ℹ️  Nenhum dado novo publicado. Nada para commitar.")
+            return True
+        logging.info(f"📤 Nenhum dado novo, mas há {pendentes} commit(s) anteriores a enviar")
+    
+    try:
+        metricas_execucao['bytes_push'] = bytes_para_enviar()
+    except Exception as e:
+        logging.warning(f"[AVISO] Erro ao medir o tamanho do push: {e}")
     
     # Git push com retry
     logging.info("📤 Enviando para GitHub...")
-    tentativas_push = 0
     max_tentativas = 3
-    sucesso_push = False
-    
-    while tentativas_push < max_tentativas and not sucesso_push:
-        tentativas_push += 1
-        logging.info(f"Tentativa {tentativas_push}/{max_tentativas}")
+    for tentativa in range(1, max_tentativas + 1):
+        logging.info(f"Tentativa {tentativa}/{max_tentativas}")
         
         # Tentar pull antes do push (evitar conflitos)
+        # --autostash: logs alterados fora do commit (intradiária) não travam o rebase
         executar_comando(
-            "git pull --rebase origin main",
+            ["git", "pull", "--rebase", "--autostash", "origin", "main"],
             "Git pull (rebase)"
         )
         
-        # Tentar push
-        sucesso_push = executar_comando(
-            "git push origin main",
-            "Git push para GitHub"
-        )
-        
-        if sucesso_push:
+        if executar_comando(["git", "push", "origin", "main"], "Git push para GitHub"):
+            metricas_execucao['deploy'] = True
             logging.info("✅ Dados enviados para GitHub com sucesso!")
-            break
-        elif tentativas_push < max_tentativas:
+            return True
+        if tentativa < max_tentativas:
             logging.warning(f"⚠️ Falha no push. Tentando novamente em 5 segundos...")
             time.sleep(5)
     
-    if not sucesso_push:
-        logging.error("❌ Falha ao enviar para GitHub após 3 tentativas")
-        logging.error("🔧 Ações recomendadas:")
-        logging.error("   1. Verifique a conexão com internet")
-        logging.error("   2. Verifique as credenciais do Git")
-        logging.error("   3. Execute manualmente: git push origin main")
+    logging.error("❌ Falha ao enviar para GitHub após 3 tentativas")
+    logging.error("🔧 Ações recomendadas:")
+    logging.error("   1. Verifique a conexão com internet")
+    logging.error("   2. Verifique as credenciais do Git")
+    logging.error("   3. Execute manualmente: git push origin main")
+    return False
+
+def montar_pipeline(intradiaria=False):
+    """
+    Grafo da execução diária:
+
+        acordar app ─────────────────────────────────────────┐ (em paralelo)
+        download -> ingestão -> validação -> publicação -> git -> acordar após deploy
+                             └-> backup (em paralelo com a validação)
+
+    No modo snapshot não há git nem deploy: o app em execução baixa o
+    snapshot novo sozinho.
+
+    intradiaria: atualização durante o expediente (agendador.py): só a
+    extração headless (LUBRIMAX_HEADLESS=1), sem tomar a tela do desktop.
+    """
+    pipeline = Pipeline('automacao_completa')
+    # Streamlit Cloud pode levar minutos para acordar: roda junto com o download
+    pipeline.adicionar('acordar app', lambda: etapa_acordar('tempo_acordar'), obrigatoria=False)
+    # Baixa os relatórios das lojas para o staging (sem gravar no banco)
+    pipeline.adicionar('download', 'download_relatorio:main', argumentos={'banco': False, 'tela': not intradiaria},
+                       saidas=['staging'], isolada=isolar('download'))
+    # O backup roda depois, junto com a validação: o snapshot da execução
+    # anterior já é o estado do banco antes desta ingestão
+    pipeline.adicionar('ingestao', 'atualizar_database:main', argumentos={'backup': False},
+                       entradas=['staging'], saidas=['banco'], isolada=isolar('ingestao'))
+    pipeline.adicionar('backup', etapa_backup, entradas=['banco'], obrigatoria=False)
+    pipeline.adicionar('validacao', etapa_validacao, entradas=['banco'], saidas=['banco_validado'])
+    if MODO_PUBLICACAO == 'snapshot':
+        # Snapshot no armazenamento (LUBRIMAX_SNAPSHOTS)
+        pipeline.adicionar('publicacao', 'snapshots_dataset:publicar_snapshot', entradas=['banco_validado'],
+                           isolada=isolar('publicacao'))
+        return pipeline
+    if MODO_PUBLICACAO == 'delta':
+        # Changeset do dia em data/publicado
+        pipeline.adicionar('publicacao', 'publicar_delta:publicar', entradas=['banco_validado'],
+                           saidas=['publicado'], isolada=isolar('publicacao'))
+        pipeline.adicionar('git', etapa_git, argumentos={'intradiaria': intradiaria},
+                           entradas=['publicado'], saidas=['enviado'])
+    else:
+        pipeline.adicionar('git', etapa_git, argumentos={'intradiaria': intradiaria},
+                           entradas=['banco_validado'], saidas=['enviado'])
+    # O push dispara o redeploy; a sondagem para assim que o app responde pronto
+    # servindo os dados que acabaram de ser publicados (sem push, nada a esperar)
+    pipeline.adicionar('acordar app após deploy', etapa_acordar_deploy,
+                       entradas=['enviado'], obrigatoria=False)
+    return pipeline
+
+def registrar_metricas(pipeline, intradiaria=False):
+    """Grava as métricas da execução no histórico e avisa sobre regressões de tempo"""
+    try:
+        metricas = {
+            'modo': MODO_PUBLICACAO + (' intradiaria' if intradiaria else ''),
+            **metricas_pipeline.contagens_carga(DB_PATH, pipeline.execucao),
+            **metricas_execucao,
+        }
+        metricas_pipeline.registrar_execucao(pipeline, metricas)
+        logging.info(f"[OK] Métricas da execução: {metricas['linhas_extraidas']} linhas extraídas, "
+                     f"{metricas['linhas_inseridas']} gravadas, {metricas['linhas_rejeitadas']} rejeitadas")
+        for regressao in metricas_pipeline.regressoes(modo=metricas['modo']):
+            logging.warning(f"⚠️ Regressão de tempo - {metricas_pipeline.descrever_regressao(regressao)}")
+    except Exception as e:
+        logging.warning(f"[AVISO] Erro ao registrar as métricas da execução: {e}")
+
+def main(intradiaria=False):
+    """
+    Função principal da automação
+
+    Args:
+        intradiaria: atualização rápida do expediente, sem usar a tela
+                     (agendador.py roda várias no mesmo processo)
+    """
+    inicio = datetime.now()
+    metricas_execucao.clear()
+    logging.info("=" * 70)
+    logging.info(f"🤖 AUTOMAÇÃO COMPLETA INICIADA - {inicio.strftime('%d/%m/%Y %H:%M:%S')}")
+    logging.info(f"📁 Diretório de trabalho: {SCRIPT_DIR}")
+    logging.info("=" * 70)
+    
+    # Verificar se estamos em um repositório Git
+    if not (SCRIPT_DIR / '.git').exists():
+        logging.critical("❌ Não é um repositório Git! Verifique o diretório.")
         return False
     
-    # Acordar Streamlit após deploy
-    if sucesso_push:
-        logging.info("\n⏳ Aguardando deploy do Streamlit Cloud...")
-        logging.info("   O Streamlit Cloud detecta o push e faz redeploy automático")
-        time.sleep(60)  # Aguarda 1 minuto para o deploy iniciar
-        
-        logging.info("\n🔄 Garantindo que o app está acordado...")
-        acordar_streamlit(max_tentativas=5, intervalo=60)  # Tentativas mais persistentes
-
-    # Etapa 5: Resumo final
-    logging.info("\n📊 ETAPA 5/5: Resumo da execução")
-    fim = datetime.now()
-    duracao = (fim - inicio).total_seconds()
+    pipeline = montar_pipeline(intradiaria)
+    sucesso = pipeline.executar()
     
+    # Resumo final: tempo de cada etapa e caminho crítico
+    fim = datetime.now()
     logging.info("=" * 70)
-    logging.info(f"⏱️  Tempo total de execução: {duracao:.2f} segundos")
+    logging.info("📊 Tempos das etapas\n" + pipeline.relatorio())
+    try:
+        logging.info(f"[OK] Relatório da execução salvo em: {pipeline.salvar(PIPELINE_DIR)}")
+    except Exception as e:
+        logging.warning(f"[AVISO] Erro ao salvar o relatório da execução: {e}")
+    registrar_metricas(pipeline, intradiaria)
     logging.info(f"🏁 Automação finalizada em: {fim.strftime('%d/%m/%Y %H:%M:%S')}")
     logging.info("=" * 70)
     
-    if sucesso_push:
+    if sucesso and MODO_PUBLICACAO != 'snapshot':
         logging.info("\n🌐 Próximos passos automáticos:")
         logging.info("   1. ✅ GitHub recebe os dados")
         logging.info("   2. 🔄 Streamlit Cloud detecta mudança")
@@ -289,22 +439,20 @@ def main():
         logging.info("   4. 🌍 Site WordPress mostra dados atualizados")
         logging.info("=" * 70)
     
-    return sucesso_push
+    return sucesso
 
 def verificar_credenciais_git():
     """Verifica se as credenciais do Git estão configuradas"""
     try:
         resultado_user = subprocess.run(
-            "git config user.name",
-            shell=True,
+            ["git", "config", "user.name"],
             capture_output=True,
             text=True,
             cwd=SCRIPT_DIR
         )
         
         resultado_email = subprocess.run(
-            "git config user.email",
-            shell=True,
+            ["git", "config", "user.email"],
             capture_output=True,
             text=True,
             cwd=SCRIPT_DIR
@@ -330,8 +478,10 @@ if __name__ == "__main__":
         if not verificar_credenciais_git():
             sys.exit(1)
         
-        # Executar automação
-        sucesso = main()
+        # Executar automação (a mesma trava do agendador.py: nunca duas ao mesmo tempo)
+        from agendador import TRAVA_EXECUCAO, TravaProcesso
+        with TravaProcesso(TRAVA_EXECUCAO):
+            sucesso = main()
         
         # Retornar código apropriado
         sys.exit(0 if sucesso else 1)
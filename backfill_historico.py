@@ -0,0 +1,252 @@
+"""
+Carga do histórico de vendas em janelas mensais, com checkpoint
+
+Divide o período em meses e, para cada loja e mês, lê o relatório exportado
+do iAdmin para aquele mês e grava as vendas com upsert (chave da venda). Os
+relatórios ficam em HISTORICO_DIR, um por loja e mês:
+
+    historico/adj_2021-01.xlsx   (ou .tsv, o texto copiado do relatório)
+
+A leitura e o preparo dos arquivos rodam num pool limitado de threads; a
+gravação fica na thread principal (um único escritor no SQLite), na mesma
+transação do checkpoint em backfill_janela. Se o processo cair (ou faltar o
+arquivo de algum mês), a próxima execução pula as janelas já concluídas e
+continua das que faltam. Só mês fechado ganha checkpoint: o mês em andamento
+é gravado, mas lido de novo na próxima execução (ainda vai ter vendas depois
+de hoje).
+
+No fim, as vendas mais antigas que a janela do banco vão para o arquivo
+Parquet (arquivo_historico).
+
+Uso:
+    python backfill_historico.py --inicio 2021-01 --fim 2024-12
+    python backfill_historico.py --inicio 2021-01 --fim 2024-12 --lojas ADJ --workers 2
+    python backfill_historico.py --inicio 2021-01 --pasta D:\\exportacoes
+    python backfill_historico.py --inicio 2024-06 --fim 2024-06 --refazer
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import arquivo_historico
+import backup_database
+from carga_incremental import COLUNAS_VENDA, recalcular_km_suspeito, upsert_vendas
+from esquema_relatorio import ler_relatorio, ler_relatorio_texto
+from extracao_placa import extrair_placas_dataframe, inserir_vinculos_placa
+from migracoes import aplicar_migracoes, carimbar_versao_dados
+from normalizacao import LOJAS, converter_km, marcar_km_suspeito, remover_duplicatas
+
+PROJECT_DIR = Path(__file__).parent
+DB_PATH = PROJECT_DIR / "data" / "db.sqlite"
+HISTORICO_DIR = Path(os.environ.get('LUBRIMAX_HISTORICO_DIR', PROJECT_DIR / "historico"))
+
+WORKERS = 3   # arquivos lidos ao mesmo tempo
+
+def janelas_mensais(inicio, fim):
+    """
+    Meses entre inicio e fim ('AAAA-MM'), inclusive
+
+    Returns:
+        list: [(mes 'AAAA-MM', primeiro_dia, ultimo_dia), ...]
+    """
+    atual = datetime.strptime(inicio, '%Y-%m').date()
+    ultimo = min(datetime.strptime(fim, '%Y-%m').date(), date.today())
+    janelas = []
+    while atual <= ultimo:
+        proximo = proximo_mes(atual)
+        janelas.append((atual.strftime('%Y-%m'), atual, min(proximo - timedelta(days=1), date.today())))
+        atual = proximo
+    return janelas
+
+def proximo_mes(dia):
+    """Primeiro dia do mês seguinte ao de dia (date ou 'AAAA-MM')"""
+    if isinstance(dia, str):
+        dia = datetime.strptime(dia, '%Y-%m').date()
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def mes_fechado(mes, hoje=None):
+    """True se o mês ('AAAA-MM') já terminou: não entra mais venda nele"""
+    return proximo_mes(mes) <= (hoje or date.today())
+
+def ler_exportacao(loja, mes, primeiro, ultimo, pasta=HISTORICO_DIR):
+    """
+    Lê o relatório exportado da loja no mês (fonte padrão do backfill)
+
+    Returns:
+        DataFrame: vendas convertidas entre primeiro e ultimo
+
+    Raises:
+        FileNotFoundError: sem arquivo da loja para o mês
+    """
+    base = Path(pasta) / f'{loja.lower()}_{mes}'
+    if base.with_suffix('.xlsx').exists():
+        df, rejeitados = ler_relatorio(base.with_suffix('.xlsx'), loja)
+    elif base.with_suffix('.tsv').exists():
+        df, rejeitados = ler_relatorio_texto(base.with_suffix('.tsv'), loja)
+    else:
+        raise FileNotFoundError(f"Relatório não encontrado: {base}.xlsx ou .tsv")
+    if len(rejeitados):
+        logging.warning(f"[AVISO] {loja} {mes}: {len(rejeitados)} linhas rejeitadas")
+
+    # A exportação pode passar do mês (período digitado a mais): só a janela
+    dias = df['data_emissao'].str[:10]
+    return df[(dias >= primeiro.isoformat()) & (dias <= ultimo.isoformat())].reset_index(drop=True)
+
+def preparar_janela(loja, mes, primeiro, ultimo, fonte=ler_exportacao):
+    """
+    Lê e prepara as vendas de uma loja num mês (roda nas threads do pool)
+
+    Args:
+        fonte: função (loja, mes, primeiro, ultimo) -> DataFrame convertido
+
+    Returns:
+        tuple: (df pronto para gravar, segundos)
+    """
+    inicio = time.monotonic()
+    df = fonte(loja, mes, primeiro, ultimo)
+
+    extrair_placas_dataframe(df)
+    df = df[df['placa'].notna()]
+    df, _ = remover_duplicatas(df)
+    converter_km(df)
+    marcar_km_suspeito(df)
+    for coluna in COLUNAS_VENDA:
+        if coluna not in df.columns:
+            df[coluna] = None
+    return df, time.monotonic() - inicio
+
+def gravar_janela(conn, loja, mes, df, segundos, checkpoint=True):
+    """Grava as vendas da janela e o checkpoint (só mês fechado) numa única transação"""
+    cursor = conn.cursor()
+    if len(df):
+        upsert_vendas(cursor, df)
+        inserir_vinculos_placa(cursor, df)
+        recalcular_km_suspeito(cursor, df['placa'].dropna().unique())
+    if checkpoint:
+        cursor.execute('''
+            INSERT OR REPLACE INTO backfill_janela (loja, mes, linhas, segundos, concluido_em)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (loja, mes, len(df), round(segundos, 3), datetime.now().isoformat(timespec='seconds')))
+    carimbar_versao_dados(cursor)
+    conn.commit()
+
+def executar_backfill(inicio, fim, lojas=LOJAS, workers=WORKERS, refazer=False,
+                      caminho_db=DB_PATH, fonte=ler_exportacao,
+                      pasta_backup=backup_database.BACKUP_DIR, pasta_arquivo=arquivo_historico.ARQUIVO_DIR):
+    """
+    Carrega o histórico de inicio a fim ('AAAA-MM') em janelas mensais
+
+    Args:
+        refazer: lê de novo também as janelas já concluídas
+        fonte: de onde vêm as vendas de cada janela (ver preparar_janela)
+        pasta_backup / pasta_arquivo: backup do banco antes da carga e
+                                      Parquet das vendas arquivadas no fim
+
+    Returns:
+        dict: janelas concluídas, com falha e puladas, linhas e segundos
+    """
+    aplicar_migracoes(caminho_db)
+    try:
+        backup_database.criar_backup(caminho_db, pasta_backup)
+    except Exception as e:
+        logging.warning(f"[AVISO] Erro ao fazer backup: {e}")
+
+    conn = sqlite3.connect(caminho_db)
+    # Checkpoint gravado antes do fim do mês (versões antigas gravavam o mês
+    # em andamento) não vale: a janela é lida de novo
+    concluidas = set() if refazer else {
+        (loja, mes)
+        for loja, mes, concluido_em in conn.execute('SELECT loja, mes, concluido_em FROM backfill_janela')
+        if concluido_em >= proximo_mes(mes).isoformat()
+    }
+    janelas = [(loja, *janela) for janela in janelas_mensais(inicio, fim) for loja in lojas]
+    tarefas = [janela for janela in janelas if janela[:2] not in concluidas]
+    resumo = {'concluidas': 0, 'falhas': [], 'puladas': len(janelas) - len(tarefas),
+              'linhas': 0, 'segundos': 0.0}
+    logging.info(f"[INFO] Backfill {inicio} a {fim}: {len(tarefas)} janelas pendentes, "
+                 f"{resumo['puladas']} já concluídas, {workers} leituras simultâneas")
+
+    comeco = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+        pendentes = iter(tarefas)
+        em_andamento = {}
+
+        def submeter():
+            # No máximo 2 janelas por worker esperando gravação (memória limitada)
+            while len(em_andamento) < workers * 2:
+                tarefa = next(pendentes, None)
+                if tarefa is None:
+                    return
+                futuro = executor.submit(preparar_janela, *tarefa, fonte)
+                em_andamento[futuro] = tarefa
+
+        submeter()
+        while em_andamento:
+            prontos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                loja, mes, _, _ = em_andamento.pop(futuro)
+                try:
+                    df, segundos = futuro.result()
+                    gravar_janela(conn, loja, mes, df, segundos, checkpoint=mes_fechado(mes))
+                except Exception as e:
+                    conn.rollback()
+                    resumo['falhas'].append((loja, mes))
+                    logging.error(f"[ERRO] {loja} {mes}: {e}")
+                    continue
+
+                resumo['concluidas'] += 1
+                resumo['linhas'] += len(df)
+                decorrido = time.monotonic() - comeco
+                logging.info(
+                    f"[OK] {loja} {mes}: {len(df)} vendas "
+                    f"({resumo['concluidas'] + len(resumo['falhas'])}/{len(tarefas)}) - "
+                    f"{resumo['concluidas'] / decorrido * 60:.1f} janelas/min, "
+                    f"{resumo['linhas'] / decorrido:.0f} linhas/s"
+                )
+            submeter()
+    conn.close()
+    resumo['segundos'] = round(time.monotonic() - comeco, 3)
+
+    if resumo['concluidas']:
+        try:
+            arquivo_historico.arquivar_vendas_antigas(caminho_db, pasta_arquivo)
+        except Exception as e:
+            logging.warning(f"[AVISO] Erro ao arquivar vendas antigas: {e}")
+
+    minutos = resumo['segundos'] / 60 or 1
+    logging.info("=" * 60)
+    logging.info(f"[OK] Backfill: {resumo['concluidas']} janelas em {resumo['segundos']:.1f}s - "
+                 f"{resumo['concluidas'] / minutos:.1f} janelas/min, "
+                 f"{resumo['linhas'] / max(resumo['segundos'], 1e-9):.0f} linhas/s")
+    if resumo['falhas']:
+        logging.error(f"[ERRO] {len(resumo['falhas'])} janelas falharam (rode de novo para continuar): "
+                      + ', '.join(f'{l} {m}' for l, m in resumo['falhas']))
+    logging.info("=" * 60)
+    return resumo
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Carga do histórico de vendas em janelas mensais")
+    parser.add_argument('--inicio', required=True, help="Primeiro mês (AAAA-MM)")
+    parser.add_argument('--fim', default=date.today().strftime('%Y-%m'), help="Último mês (AAAA-MM)")
+    parser.add_argument('--lojas', nargs='+', choices=LOJAS, default=list(LOJAS))
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Arquivos lidos ao mesmo tempo")
+    parser.add_argument('--refazer', action='store_true', help="Refaz também as janelas já concluídas")
+    parser.add_argument('--banco', default=str(DB_PATH))
+    parser.add_argument('--pasta', default=str(HISTORICO_DIR),
+                        help="Pasta dos relatórios exportados (<loja>_<AAAA-MM>.xlsx ou .tsv)")
+    args = parser.parse_args()
+
+    fonte = lambda *janela: ler_exportacao(*janela, pasta=args.pasta)
+    resumo = executar_backfill(args.inicio, args.fim, args.lojas, args.workers, args.refazer,
+                               args.banco, fonte)
+    sys.exit(1 if resumo['falhas'] else 0)
@@ -0,0 +1,299 @@
+"""
+Backups online, incrementais e comprimidos do banco SQLite
+
+- O snapshot é consistente: usa sqlite3.Connection.backup, copiando as
+  páginas em passos curtos para não bloquear os leitores do app.
+- O arquivo é dividido em blocos de tamanho fixo; cada bloco é gravado
+  comprimido (gzip) com o seu hash SHA-256 como nome. Blocos que não
+  mudaram desde o backup anterior não ocupam espaço de novo.
+- Cada snapshot é um manifesto JSON que lista os blocos, com retenção por
+  idade e/ou tamanho total, verificação e restauração.
+
+Estrutura da pasta de backups:
+    objetos/<sha256>.gz        blocos comprimidos
+    snapshots/<id>.json        manifesto de cada snapshot
+
+Uso:
+    python backup_database.py criar
+    python backup_database.py listar
+    python backup_database.py verificar <id>
+    python backup_database.py restaurar <id> [--destino caminho.sqlite]
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent
+DB_PATH = PROJECT_DIR / "data" / "db.sqlite"
+BACKUP_DIR = PROJECT_DIR / "data" / "backups"
+
+TAMANHO_BLOCO = 1024 * 1024   # 1 MiB (múltiplo do tamanho de página)
+PAGINAS_POR_PASSO = 256       # páginas copiadas por passo do backup online
+RETENCAO_DIAS = 14
+RETENCAO_MB = 500
+
+def _gravar_atomico(caminho, dados):
+    """Grava em arquivo temporário e renomeia (nunca deixa arquivo pela metade)"""
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+def _snapshot_consistente(origem, destino_tmp, paginas_por_passo):
+    """Cópia consistente do banco via API de backup do SQLite"""
+    fonte = sqlite3.connect(Path(origem).resolve().as_uri() + '?mode=ro', uri=True)
+    copia = sqlite3.connect(destino_tmp)
+    try:
+        # sleep=0: entre passos o SQLite libera o lock para os leitores
+        fonte.backup(copia, pages=paginas_por_passo, sleep=0)
+    finally:
+        copia.close()
+        fonte.close()
+
+def listar_backups(pasta=BACKUP_DIR):
+    """Retorna os manifestos dos snapshots, do mais antigo para o mais recente"""
+    pasta_snapshots = Path(pasta) / 'snapshots'
+    if not pasta_snapshots.exists():
+        return []
+    manifestos = []
+    for arquivo in sorted(pasta_snapshots.glob('*.json')):
+        with open(arquivo, encoding='utf-8') as f:
+            manifestos.append(json.load(f))
+    return manifestos
+
+def tamanho_total(pasta=BACKUP_DIR):
+    """Espaço em disco ocupado pelos backups (bytes)"""
+    return sum(f.stat().st_size for f in Path(pasta).rglob('*') if f.is_file())
+
+def criar_backup(origem=DB_PATH, pasta=BACKUP_DIR, paginas_por_passo=PAGINAS_POR_PASSO):
+    """
+    Cria um snapshot incremental do banco
+
+    Returns:
+        dict: manifesto do snapshot (ou do último, se nada mudou) com as
+              métricas da execução em 'execucao'
+    """
+    inicio = time.monotonic()
+    pasta = Path(pasta)
+    pasta_objetos = pasta / 'objetos'
+    pasta_snapshots = pasta / 'snapshots'
+    pasta_objetos.mkdir(parents=True, exist_ok=True)
+    pasta_snapshots.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(suffix='.sqlite', dir=pasta)
+    os.close(fd)
+    try:
+        _snapshot_consistente(origem, tmp, paginas_por_passo)
+
+        hash_total = hashlib.sha256()
+        blocos = []
+        bytes_novos = 0
+        with open(tmp, 'rb') as f:
+            while True:
+                bloco = f.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                hash_total.update(bloco)
+                hash_bloco = hashlib.sha256(bloco).hexdigest()
+                blocos.append(hash_bloco)
+                objeto = pasta_objetos / f'{hash_bloco}.gz'
+                if not objeto.exists():
+                    comprimido = gzip.compress(bloco, compresslevel=6)
+                    _gravar_atomico(objeto, comprimido)
+                    bytes_novos += len(comprimido)
+        tamanho_db = os.path.getsize(tmp)
+    finally:
+        os.remove(tmp)
+
+    anteriores = listar_backups(pasta)
+    execucao = {'bytes_novos': bytes_novos}
+
+    if anteriores and anteriores[-1]['sha256'] == hash_total.hexdigest():
+        manifesto = anteriores[-1]
+        logging.info(f"[INFO] Banco sem mudanças desde o backup {manifesto['id']}")
+    else:
+        agora = datetime.now()
+        # Microssegundos no id: dois backups no mesmo segundo não se sobrescrevem
+        # (e, com relógio de baixa resolução, um contador desempata)
+        id_snapshot = base_id = agora.strftime('%Y%m%d_%H%M%S_%f')
+        sequencia = 0
+        while (pasta_snapshots / f'{id_snapshot}.json').exists():
+            sequencia += 1
+            id_snapshot = f'{base_id}_{sequencia}'
+        manifesto = {
+            'id': id_snapshot,
+            'criado_em': agora.isoformat(timespec='seconds'),
+            'sha256': hash_total.hexdigest(),
+            'tamanho': tamanho_db,
+            'tamanho_bloco': TAMANHO_BLOCO,
+            'blocos': blocos,
+        }
+        _gravar_atomico(
+            pasta_snapshots / f"{manifesto['id']}.json",
+            json.dumps(manifesto, indent=2).encode('utf-8')
+        )
+        logging.info(f"[OK] Backup criado: {manifesto['id']}")
+
+    execucao['segundos'] = round(time.monotonic() - inicio, 3)
+    execucao['tamanho_total'] = tamanho_total(pasta)
+    logging.info(
+        f"[INFO] Backup em {execucao['segundos']:.2f}s - "
+        f"{bytes_novos:,} bytes novos, {execucao['tamanho_total']:,} bytes no total"
+    )
+    return dict(manifesto, execucao=execucao)
+
+def aplicar_retencao(pasta=BACKUP_DIR, dias=RETENCAO_DIAS, tamanho_maximo_mb=RETENCAO_MB):
+    """
+    Remove snapshots mais velhos que `dias` e, se o total ainda passar de
+    `tamanho_maximo_mb`, os mais antigos até caber. O mais recente é sempre
+    mantido. Blocos que nenhum snapshot usa mais são apagados.
+
+    Returns:
+        int: quantidade de snapshots removidos
+    """
+    pasta = Path(pasta)
+    manifestos = listar_backups(pasta)
+    if not manifestos:
+        return 0
+
+    manter = list(manifestos)
+    if dias is not None:
+        limite = datetime.now() - timedelta(days=dias)
+        manter = [m for m in manter[:-1] if datetime.fromisoformat(m['criado_em']) >= limite] + manter[-1:]
+
+    if tamanho_maximo_mb is not None:
+        tamanhos = {}
+        for objeto in (pasta / 'objetos').glob('*.gz'):
+            tamanhos[objeto.stem] = objeto.stat().st_size
+
+        def ocupado(lista):
+            return sum(tamanhos.get(h, 0) for h in {h for m in lista for h in m['blocos']})
+
+        while len(manter) > 1 and ocupado(manter) > tamanho_maximo_mb * 1024 * 1024:
+            manter.pop(0)
+
+    ids_manter = {m['id'] for m in manter}
+    removidos = 0
+    for manifesto in manifestos:
+        if manifesto['id'] not in ids_manter:
+            (pasta / 'snapshots' / f"{manifesto['id']}.json").unlink()
+            logging.info(f"[INFO] Backup antigo removido: {manifesto['id']}")
+            removidos += 1
+
+    usados = {h for m in manter for h in m['blocos']}
+    for objeto in (pasta / 'objetos').glob('*.gz'):
+        if objeto.stem not in usados:
+            objeto.unlink()
+
+    return removidos
+
+def _carregar_manifesto(pasta, id_snapshot):
+    caminho = Path(pasta) / 'snapshots' / f'{id_snapshot}.json'
+    if not caminho.exists():
+        raise FileNotFoundError(f"Backup não encontrado: {id_snapshot}")
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+def _remontar(pasta, manifesto, destino):
+    """Reconstrói o arquivo do banco a partir dos blocos, conferindo os hashes"""
+    hash_total = hashlib.sha256()
+    with open(destino, 'wb') as saida:
+        for hash_bloco in manifesto['blocos']:
+            with open(Path(pasta) / 'objetos' / f'{hash_bloco}.gz', 'rb') as f:
+                bloco = gzip.decompress(f.read())
+            if hashlib.sha256(bloco).hexdigest() != hash_bloco:
+                raise ValueError(f"Bloco corrompido: {hash_bloco}")
+            hash_total.update(bloco)
+            saida.write(bloco)
+    if hash_total.hexdigest() != manifesto['sha256']:
+        raise ValueError(f"Hash do snapshot não confere: {manifesto['id']}")
+
+def verificar_backup(id_snapshot, pasta=BACKUP_DIR):
+    """
+    Confere hashes dos blocos e roda PRAGMA integrity_check no snapshot
+
+    Returns:
+        bool: True se o snapshot está íntegro
+    """
+    manifesto = _carregar_manifesto(pasta, id_snapshot)
+    fd, tmp = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        _remontar(pasta, manifesto, tmp)
+        conn = sqlite3.connect(tmp)
+        resultado = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        conn.close()
+    except (OSError, ValueError, sqlite3.DatabaseError) as e:
+        logging.error(f"[ERRO] Backup {id_snapshot} inválido: {e}")
+        return False
+    finally:
+        os.remove(tmp)
+
+    if resultado != 'ok':
+        logging.error(f"[ERRO] Backup {id_snapshot} falhou no integrity_check: {resultado}")
+        return False
+    logging.info(f"[OK] Backup {id_snapshot} íntegro")
+    return True
+
+def restaurar_backup(id_snapshot, destino=DB_PATH, pasta=BACKUP_DIR):
+    """
+    Restaura um snapshot sobre o banco de destino
+
+    A cópia final também usa a API de backup, então conexões abertas no
+    banco de destino continuam válidas e veem o conteúdo restaurado.
+    """
+    manifesto = _carregar_manifesto(pasta, id_snapshot)
+    fd, tmp = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        _remontar(pasta, manifesto, tmp)
+        fonte = sqlite3.connect(tmp)
+        alvo = sqlite3.connect(destino)
+        try:
+            fonte.backup(alvo)
+        finally:
+            alvo.close()
+            fonte.close()
+    finally:
+        os.remove(tmp)
+    logging.info(f"[OK] Backup {id_snapshot} restaurado em {destino}")
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Backups do banco de dados Lubrimax")
+    parser.add_argument('--pasta', default=str(BACKUP_DIR), help="Pasta dos backups")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    criar = sub.add_parser('criar', help="Cria um snapshot e aplica a retenção")
+    criar.add_argument('--banco', default=str(DB_PATH))
+    sub.add_parser('listar', help="Lista os snapshots")
+    verificar = sub.add_parser('verificar', help="Verifica a integridade de um snapshot")
+    verificar.add_argument('id')
+    restaurar = sub.add_parser('restaurar', help="Restaura um snapshot")
+    restaurar.add_argument('id')
+    restaurar.add_argument('--destino', default=str(DB_PATH))
+    args = parser.parse_args()
+
+    if args.comando == 'criar':
+        criar_backup(args.banco, args.pasta)
+        aplicar_retencao(args.pasta)
+    elif args.comando == 'listar':
+        for m in listar_backups(args.pasta):
+            print(f"{m['id']}  {m['tamanho']:>12,} bytes  {len(m['blocos'])} blocos  {m['sha256'][:12]}")
+        print(f"Total em disco: {tamanho_total(args.pasta):,} bytes")
+    elif args.comando == 'verificar':
+        sys.exit(0 if verificar_backup(args.id, args.pasta) else 1)
+    elif args.comando == 'restaurar':
+        restaurar_backup(args.id, args.destino, args.pasta)
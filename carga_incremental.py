@@ -0,0 +1,171 @@
+"""
+Carga incremental das vendas: marca d'água por loja + upsert
+
+A tabela marca_carga guarda, para cada loja, a última data de emissão (e o
+maior número de venda nessa data) já gravada no banco. inicio_incremental diz
+a partir de que data exportar o relatório (essa data menos DIAS_SOBREPOSICAO,
+para pegar cancelamentos e mudanças de status de vendas recentes) e a
+gravação incremental é um upsert pela chave da venda (idx_vendas_chave):
+vendas novas entram, as já existentes são atualizadas e o resto do histórico
+fica como está.
+
+A extração pela tela (download_relatorio.py) não usa a marca d'água: os
+cliques gravados não preenchem o período do relatório, então ela copia o
+relatório inteiro e a carga é completa. A marca vale para a importação manual
+de um relatório exportado a partir de inicio_incremental
+(atualizar_database.py --excel ... --incremental).
+"""
+
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from normalizacao import COLUNAS_CHAVE_VENDA, linhas_para_sql, marcar_km_suspeito
+
+PROJECT_DIR = Path(__file__).parent
+DB_PATH = PROJECT_DIR / "data" / "db.sqlite"
+
+DIAS_SOBREPOSICAO = 3
+
+COLUNAS_VENDA = [
+    'loja', 'data_emissao', 'numero_nf', 'serie', 'nome_cliente',
+    'total_venda', 'nome_vendedor', 'identificacao',
+    'placa', 'km', 'km_suspeito', 'status'
+]
+
+def ler_marca_carga(loja, caminho_db=DB_PATH):
+    """
+    Marca d'água da loja
+
+    Returns:
+        tuple: (ultima_data, ultimo_numero_nf) ou None se a loja nunca foi carregada
+    """
+    if not Path(caminho_db).exists():
+        return None
+    conn = sqlite3.connect(caminho_db)
+    try:
+        linha = conn.execute(
+            'SELECT ultima_data, ultimo_numero_nf FROM marca_carga WHERE loja = ?', (loja,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Banco ainda sem a migração da marca d'água
+        return None
+    finally:
+        conn.close()
+    return tuple(linha) if linha else None
+
+def inicio_incremental(loja, caminho_db=DB_PATH, dias_sobreposicao=DIAS_SOBREPOSICAO):
+    """Data inicial da próxima extração da loja (None = extração completa)"""
+    marca = ler_marca_carga(loja, caminho_db)
+    if marca is None:
+        return None
+    ultima = datetime.strptime(marca[0][:10], '%Y-%m-%d')
+    return ultima - timedelta(days=dias_sobreposicao)
+
+def atualizar_marca_carga(cursor, df):
+    """Grava a marca d'água de cada loja presente no df (sem commit)"""
+    agora = datetime.now().isoformat(timespec='seconds')
+    for loja, grupo in df.groupby('loja', observed=True):
+        ultima = grupo['data_emissao'].max()
+        numero = grupo.loc[grupo['data_emissao'] == ultima, 'numero_nf'].max()
+        cursor.execute('''
+            INSERT INTO marca_carga (loja, ultima_data, ultimo_numero_nf, atualizado_em)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(loja) DO UPDATE SET
+                ultima_data = excluded.ultima_data,
+                ultimo_numero_nf = excluded.ultimo_numero_nf,
+                atualizado_em = excluded.atualizado_em
+        ''', (loja, ultima, None if pd.isna(numero) else int(numero), agora))
+        logging.info(f"[INFO] Marca d'água {loja}: {ultima} / venda {numero}")
+
+def upsert_vendas(cursor, df):
+    """
+    Insere as vendas novas e atualiza as existentes pela chave da venda
+
+    Returns:
+        int: quantidade de vendas gravadas (novas + atualizadas)
+    """
+    colunas = ', '.join(COLUNAS_VENDA)
+    atualizar = ',\n                '.join(
+        f'{c} = excluded.{c}' for c in COLUNAS_VENDA if c not in COLUNAS_CHAVE_VENDA
+    )
+    cursor.executemany(f'''
+        INSERT INTO vendas ({colunas})
+        VALUES ({', '.join('?' * len(COLUNAS_VENDA))})
+        ON CONFLICT(loja, serie, numero_nf, data_emissao) DO UPDATE SET
+                {atualizar}
+    ''', linhas_para_sql(df, COLUNAS_VENDA))
+    return cursor.rowcount
+
+def substituir_vendas(cursor, df, loja=None):
+    """
+    Recarga completa (da loja ou de todas) sem renovar os ids: upsert pela
+    chave da venda e remoção só das chaves que sumiram do df. Vendas que não
+    mudaram ficam idênticas no banco e não entram no changeset publicado.
+    Vendas sem número não têm chave: essas são sempre removidas e regravadas.
+    Os vínculos placa/venda da faixa recarregada saem junto e são regravados
+    por inserir_vinculos_placa (venda que perdeu a placa perde o vínculo).
+
+    Returns:
+        tuple: (vendas gravadas, vendas removidas)
+    """
+    filtro_loja = 'AND loja = ?' if loja else ''
+    parametros = (loja,) if loja else ()
+
+    cursor.execute(f'DELETE FROM venda_placa {"WHERE loja = ?" if loja else ""}', parametros)
+    cursor.execute(f'DELETE FROM vendas WHERE numero_nf IS NULL {filtro_loja}', parametros)
+    removidas = cursor.rowcount
+    gravadas = upsert_vendas(cursor, df)
+
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS tmp_chaves_venda (
+            loja TEXT, serie TEXT, numero_nf INTEGER, data_emissao TEXT,
+            PRIMARY KEY (loja, serie, numero_nf, data_emissao)
+        )
+    ''')
+    cursor.execute('DELETE FROM tmp_chaves_venda')
+    cursor.executemany(
+        'INSERT OR IGNORE INTO tmp_chaves_venda VALUES (?, ?, ?, ?)',
+        linhas_para_sql(df[df['numero_nf'].notna()], COLUNAS_CHAVE_VENDA)
+    )
+    cursor.execute(f'''
+        DELETE FROM vendas
+        WHERE numero_nf IS NOT NULL {filtro_loja}
+          AND NOT EXISTS (
+              SELECT 1 FROM tmp_chaves_venda t
+              WHERE t.loja IS vendas.loja AND t.serie IS vendas.serie
+                AND t.numero_nf = vendas.numero_nf AND t.data_emissao = vendas.data_emissao
+          )
+    ''', parametros)
+    removidas += cursor.rowcount
+    cursor.execute('DELETE FROM tmp_chaves_venda')
+    return gravadas, removidas
+
+def recalcular_km_suspeito(cursor, placas):
+    """
+    Refaz km_suspeito das placas informadas com todo o histórico delas no
+    banco (a carga incremental só traz as leituras recentes)
+
+    Returns:
+        int: quantidade de vendas cuja marcação mudou
+    """
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS tmp_placas (placa TEXT PRIMARY KEY)')
+    cursor.execute('DELETE FROM tmp_placas')
+    cursor.executemany('INSERT OR IGNORE INTO tmp_placas VALUES (?)', ((p,) for p in placas))
+
+    df = pd.read_sql_query('''
+        SELECT id, placa, data_emissao, km, km_suspeito AS anterior
+        FROM vendas
+        WHERE placa IN (SELECT placa FROM tmp_placas)
+    ''', cursor.connection)
+    marcar_km_suspeito(df)
+    mudou = df[df['km_suspeito'] != df['anterior'].fillna(0)]
+    cursor.executemany(
+        'UPDATE vendas SET km_suspeito = ? WHERE id = ?',
+        ((int(s), int(i)) for s, i in zip(mudou['km_suspeito'], mudou['id']))
+    )
+    cursor.execute('DELETE FROM tmp_placas')
+    return len(mudou)
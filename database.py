@@ -1,38 +1,294 @@
+import json
+import logging
+import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from migracoes import VERSAO_ATUAL, versao_schema, versao_dados
 
-def buscar_por_placa(placa_exata):
+CAMINHO_DB = "data/db.sqlite"
+# Versão dos dados servida, publicada pelo próprio app em /app/static (static
+# serving do Streamlit): a sondagem após o deploy compara com o carimbo que
+# acabou de ser publicado para não aceitar a instância antiga como pronta
+VERSAO_SERVIDA_PATH = Path(__file__).parent / "static" / "versao_dados.json"
+INTERVALO_VIGIA = 5        # segundos entre verificações da versão dos dados
+MAX_CACHE_CONSULTAS = 512  # consultas guardadas por versão dos dados
+
+class BancoDesatualizado(Exception):
+    """O banco ainda não está na versão de schema esperada pelo app"""
+
+class _Geracao:
+    """Uma versão do banco aberta: conexão só leitura + cache das consultas"""
+
+    def __init__(self, caminho):
+        self.conn = sqlite3.connect(
+            Path(caminho).resolve().as_uri() + '?mode=ro', uri=True, check_same_thread=False
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.trava = threading.Lock()
+        self.arquivo = _identidade_arquivo(caminho)
+        self.schema = versao_schema(self.conn)
+        self.versao = versao_dados(self.conn)
+        self.cache = OrderedDict()
+        self.fechada = False
+
+    def fechar(self):
+        # Espera a consulta em andamento (se houver) terminar na versão antiga
+        with self.trava:
+            self.fechada = True
+            self.conn.close()
+
+def _identidade_arquivo(caminho):
+    """(inode, mtime, tamanho): muda quando o arquivo é substituído (os.replace)"""
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+class _Dataset:
+    """
+    Banco servido ao app com troca a quente
+
+    As consultas usam a geração atual. Quando o arquivo é substituído ou o
+    carimbo da tabela meta muda (nova carga), uma geração nova é aberta e
+    validada ao lado e só então trocada; até lá as consultas continuam na
+    versão anterior.
+    """
+
+    def __init__(self, caminho=CAMINHO_DB):
+        self.caminho = caminho
+        self.atual = None
+        self._troca = threading.Lock()
+        self._vigia = None
+        self._antes = None
+        self._depois_troca = None
+
+    def verificar(self):
+        """Troca de geração se houver versão nova dos dados; True se trocou"""
+        with self._troca:
+            atual = self.atual
+            arquivo = _identidade_arquivo(self.caminho)
+            if arquivo is None:
+                return False
+            if atual is not None and atual.arquivo == arquivo:
+                # Mesmo arquivo: carga feita no lugar muda só o carimbo
+                with atual.trava:
+                    if versao_dados(atual.conn) == atual.versao:
+                        return False
+            try:
+                nova = _Geracao(self.caminho)
+            except sqlite3.Error as e:
+                logging.warning(f"[AVISO] Versão nova do banco ilegível, mantendo a atual: {e}")
+                return False
+            if nova.schema < VERSAO_ATUAL and atual is not None and atual.schema >= VERSAO_ATUAL:
+                # Migração ainda não aplicada no arquivo novo: segue na versão anterior
+                nova.fechar()
+                return False
+            self.atual = nova
+        if atual is not None:
+            atual.fechar()
+            logging.info(f"[OK] Dados recarregados: versão {nova.versao}")
+        self._avisar_troca()
+        return True
+
+    def _avisar_troca(self):
+        if self._depois_troca is None:
+            return
+        try:
+            self._depois_troca()
+        except Exception as e:
+            logging.warning(f"[AVISO] Erro depois da troca de versão dos dados: {e}")
+
+    def _vigiar(self, intervalo):
+        while True:
+            time.sleep(intervalo)
+            try:
+                if self._antes:
+                    self._antes()
+                self.verificar()
+            except Exception as e:
+                logging.warning(f"[AVISO] Erro ao verificar a versão dos dados: {e}")
+
+    def iniciar_vigia(self, intervalo=INTERVALO_VIGIA, antes=None, depois_troca=None):
+        """
+        Verifica a versão dos dados em segundo plano (uma thread por processo)
+
+        depois_troca: chamada a cada geração nova aberta (e para a já aberta
+        na subida), na thread que fez a troca
+        """
+        if self._vigia is None:
+            self._antes = antes
+            self._depois_troca = depois_troca
+            if not self.verificar() and self.atual is not None:
+                # Geração aberta antes do vigia (consulta anterior à subida)
+                self._avisar_troca()
+            self._vigia = threading.Thread(target=self._vigiar, args=(intervalo,),
+                                           name='vigia-dados', daemon=True)
+            self._vigia.start()
+
+    def geracao(self):
+        # Sem vigia (scripts, testes), confere a versão a cada consulta
+        if self._vigia is None or self.atual is None:
+            self.verificar()
+        if self.atual is None:
+            raise FileNotFoundError(self.caminho)
+        return self.atual
+
+    def consultar(self, chave, funcao):
+        """Resultado de funcao(conn) na geração atual, guardado no cache dela"""
+        while True:
+            geracao = self.geracao()
+            if geracao.schema < VERSAO_ATUAL:
+                # Nunca consultar um banco com migração pendente
+                raise BancoDesatualizado(
+                    f"Banco na versão {geracao.schema}, app espera a versão {VERSAO_ATUAL}"
+                )
+            with geracao.trava:
+                if geracao.fechada:
+                    continue   # trocada entre pegar a geração e a trava: usa a nova
+                return self._consultar(geracao, chave, funcao)
+
+    @staticmethod
+    def _consultar(geracao, chave, funcao):
+        if chave in geracao.cache:
+            geracao.cache.move_to_end(chave)
+            return geracao.cache[chave]
+        resultado = funcao(geracao.conn)
+        geracao.cache[chave] = resultado
+        if len(geracao.cache) > MAX_CACHE_CONSULTAS:
+            geracao.cache.popitem(last=False)
+        return resultado
+
+DATASET = _Dataset()
+
+def iniciar_recarga(intervalo=INTERVALO_VIGIA, antes=None):
+    """
+    Liga a recarga a quente: dados novos aparecem sem reiniciar o app
+
+    Args:
+        intervalo: segundos entre verificações
+        antes: chamada antes de cada verificação (ex.: aplicar changesets
+               publicados), na thread do vigia
+
+    A cada versão nova aberta, confere a prontidão e publica a versão servida
+    (VERSAO_SERVIDA_PATH) que a sondagem confere depois do deploy.
+    """
+    DATASET.iniciar_vigia(intervalo, antes, depois_troca=_publicar_se_pronto)
+
+def _publicar_se_pronto():
+    """Publica a versão servida só com a busca da placa de amostra funcionando"""
+    publicar_versao_servida(conferir_prontidao()['versao'])
+
+def versao_atual():
+    """Carimbo da versão dos dados em uso (None se o banco não tem)"""
+    return DATASET.geracao().versao
+
+def conferir_prontidao():
+    """
+    Prontidão do app (health check): banco aberto e a busca de uma placa de
+    amostra funcionando. O resultado fica no cache da versão dos dados. Sem
+    efeito colateral: quem publica a versão servida é a recarga
+    (iniciar_recarga), a cada versão nova.
+
+    Returns:
+        dict: versao, placa de amostra e vendas encontradas
+    Raises:
+        RuntimeError: a busca da placa de amostra não encontrou a venda
+    """
+    placa = DATASET.consultar(('amostra',), lambda conn: (
+        conn.execute('SELECT placa FROM venda_placa LIMIT 1').fetchone() or [None]
+    )[0])
+    vendas = len(buscar_por_placa(placa)) if placa else 0
+    if placa and not vendas:
+        raise RuntimeError(f"Busca da placa de amostra {placa} não encontrou vendas")
+    return {'versao': versao_atual(), 'placa': placa, 'vendas': vendas}
+
+_versao_servida = None
+
+def publicar_versao_servida(versao, caminho=VERSAO_SERVIDA_PATH):
+    """Grava a versão dos dados servida (só quando muda) para a sondagem conferir"""
+    global _versao_servida
+    if versao == _versao_servida and Path(caminho).exists():
+        return
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+    temporario.write_text(json.dumps({'versao': versao}), encoding='utf-8')
+    os.replace(temporario, caminho)
+    _versao_servida = versao
+
+def buscar_por_placa(placa_exata, loja=None, historico_completo=False):
     """
     Busca vendas por placa no banco de dados
-    
+
     Args:
         placa_exata: Placa do veículo (formato ABC1234 ou ABC1D23)
-        
+        loja: Opcional - restringe a busca a uma loja ('LUBRIMAX' ou 'ADJ')
+        historico_completo: Se True, inclui as vendas antigas do arquivo
+                            Parquet (só lê os meses em que a placa aparece)
+
     Returns:
         Lista de dicionários com os dados das vendas
     """
-    conn = sqlite3.connect("data/db.sqlite")
-    conn.row_factory = sqlite3.Row
+    placa = placa_exata.upper()
+    chave = ('placa', placa, loja.upper() if loja else None, historico_completo)
+    resultados = DATASET.consultar(chave, lambda conn: _buscar_por_placa(conn, placa, loja, historico_completo))
+    # Cópia: quem chama pode alterar os dicionários sem mexer no cache
+    return [dict(venda) for venda in resultados]
+
+def _buscar_por_placa(conn, placa_exata, loja, historico_completo):
     cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            id,
-            data_emissao,
-            numero_nf,
-            serie,
-            nome_cliente,
-            total_venda,
-            nome_vendedor,
-            identificacao,
-            placa,
-            km,
-            status
-        FROM vendas
-        WHERE UPPER(placa) = ?
-        ORDER BY data_emissao DESC
-    """, (placa_exata.upper(),))
-    
-    resultados = cursor.fetchall()
-    conn.close()
-    
-    return [dict(row) for row in resultados]
+
+    # Busca pelo vínculo placa/venda: a chave (placa, venda_id) de
+    # venda_placa encontra também as vendas em que a placa não é a principal
+    filtros = ["vp.placa = ?"]
+    parametros = [placa_exata]
+    if loja:
+        # Filtro no próprio vínculo: índice idx_venda_placa_loja (loja, placa)
+        filtros.append("vp.loja = ?")
+        parametros.append(loja.upper())
+
+    cursor.execute(f"""
+        SELECT
+            v.id,
+            v.loja,
+            v.data_emissao,
+            v.numero_nf,
+            v.serie,
+            v.nome_cliente,
+            v.total_venda,
+            v.nome_vendedor,
+            v.identificacao,
+            vp.placa,
+            vp.km,
+            CASE WHEN vp.placa = v.placa THEN v.km_suspeito ELSE 0 END AS km_suspeito,
+            v.status
+        FROM venda_placa vp
+        JOIN vendas v ON v.id = vp.venda_id
+        WHERE {' AND '.join(filtros)}
+        ORDER BY v.data_emissao DESC
+    """, parametros)
+
+    resultados = [dict(row) for row in cursor.fetchall()]
+
+    if historico_completo:
+        meses = [linha[0] for linha in cursor.execute(
+            "SELECT mes FROM resumo_placa WHERE placa = ?", (placa_exata,)
+        )]
+        if meses:
+            from arquivo_historico import buscar_arquivo
+            resultados += buscar_arquivo(placa_exata, meses, loja=loja.upper() if loja else None)
+            resultados.sort(key=lambda venda: venda['data_emissao'] or '', reverse=True)
+
+    return resultados
+
+def contar_vendas_arquivadas(placa_exata):
+    """Quantidade de vendas da placa que estão só no arquivo (histórico antigo)"""
+    placa = placa_exata.upper()
+    return DATASET.consultar(('arquivadas', placa), lambda conn: conn.execute(
+        "SELECT COALESCE(SUM(vendas), 0) FROM resumo_placa WHERE placa = ?",
+        (placa,)
+    ).fetchone()[0])
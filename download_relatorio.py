@@ -1,18 +1,29 @@
+import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 import logging
+from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import pandas as pd
+import numpy as np
 import re
 import pyautogui
 import pyperclip
-from io import StringIO
+from io import BytesIO, StringIO
+from PIL import Image
+import instrumentacao
+import staging
+from normalizacao import LOJAS
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,262 +37,612 @@ logging.basicConfig(
     ]
 )
 
-def login_adj():        
-    """Função de login no sistema"""
-    options = Options()
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument('--start-maximized')
-    service = Service(r'C:\Projetos\Lubrimax\Site_Consulta\chromedriver-win64\chromedriver.exe')
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.get("https://cloud.sistemaiadmin.com.br")
-    wait = WebDriverWait(driver, 10)
-    time.sleep(2)
-    campo_usuario = driver.find_element(By.ID, 'Editbox1')
-    campo_usuario.send_keys('Lubrimax_Gerencia')
-    time.sleep(2)
-    campo_senha = driver.find_element(By.ID, 'Editbox2')    
-    campo_senha.send_keys('Lubrimax#24')
-    botao_entrar = driver.find_element(By.ID, 'buttonLogOn')
-    time.sleep(5)
-    botao_entrar.click()
-    time.sleep(10)
-    wait.until(EC.number_of_windows_to_be(2))
-    todas_abas = driver.window_handles
-    aba_original = driver.current_window_handle
-    for aba in todas_abas:
-            if aba != aba_original:
-                driver.switch_to.window(aba)
-                logging.info(f"[OK] Trocado para nova aba: {aba}")
-                break
-    
-    # Tentativa de localizar a imagem com retries
-    max_retries = 5
-    iAdmin = None
-    
-    for attempt in range(max_retries):
+PROJECT_DIR = Path(__file__).parent
+
+# Usuários e senhas fora do código: variáveis de ambiente ou .env na pasta
+# do projeto (modelo em .env.exemplo)
+load_dotenv(PROJECT_DIR / '.env')
+
+# LUBRIMAX_IADMIN_URL / LUBRIMAX_CHROMEDRIVER: replay contra o stub local
+# (teste_replay_scraper.py); chromedriver vazio = o do Selenium Manager
+URL_IADMIN = os.environ.get('LUBRIMAX_IADMIN_URL', "https://cloud.sistemaiadmin.com.br")
+# Página do portal depois do login: com a sessão expirada volta para o login
+PAGINA_SESSAO = '/Principal.aspx'
+CHROMEDRIVER = os.environ.get(
+    'LUBRIMAX_CHROMEDRIVER', r'C:\Projetos\Lubrimax\Site_Consulta\chromedriver-win64\chromedriver.exe'
+)
+IMAGEM_IADMIN = r'C:\Projetos\Lubrimax\Site_Consulta\imagens\iAdmin.png'
+# Perfil persistente do Chrome por loja (--user-data-dir): cookies, cache e
+# sessão do portal sobrevivem entre execuções
+PERFIS_DIR = r'C:\Projetos\Lubrimax\Site_Consulta\perfis_chrome'
+# Cookies da sessão do portal por loja (perfil temporário também reaproveita)
+SESSOES_DIR = Path(os.environ.get('LUBRIMAX_SESSOES_DIR', PROJECT_DIR / "sessoes"))
+
+# Tempos máximos de espera (segundos). São limites, não pausas: cada passo
+# segue assim que a condição (elemento, imagem, tela, clipboard) é atendida
+TIMEOUT_PAGINA = 30
+TIMEOUT_IMAGEM = 60
+TIMEOUT_TELA_ESTAVEL = 20
+TIMEOUT_CLIPBOARD = 60
+INTERVALO_VERIFICACAO = 0.25
+# Diferença média de pixels (0-255, tela reduzida em tons de cinza) abaixo
+# da qual dois quadros são considerados iguais (ignora cursor piscando)
+TOLERANCIA_TELA = 0.5
+
+# As coordenadas dos cliques foram gravadas na tela do Chrome maximizado.
+# No modo headless elas são convertidas para o viewport descontando a
+# altura da barra do navegador, e o viewport tem o mesmo tamanho do da
+# janela maximizada. Os valores reais aparecem no log do modo tela
+# ("[INFO] Viewport do navegador ...") e podem ser ajustados por variável
+# de ambiente.
+BARRA_NAVEGADOR_PX = int(os.environ.get('LUBRIMAX_BARRA_NAVEGADOR', 85))
+VIEWPORT_HEADLESS = (1920, int(os.environ.get('LUBRIMAX_VIEWPORT_ALTURA', 955)))
+# A extração headless só vale depois de calibrar os dois valores acima no
+# computador da automação: com a conversão errada cada clique cai no lugar
+# errado e cada imagem não achada espera TIMEOUT_IMAGEM. Até lá, a extração
+# padrão é pela tela do desktop; LUBRIMAX_HEADLESS=1 (ou --paralelo) liga
+HEADLESS = os.environ.get('LUBRIMAX_HEADLESS', '0') == '1'
+
+# Configuração de cada loja no iAdmin (mesmo fluxo, só muda a seleção da
+# empresa logo depois de abrir o iAdmin; usuário e senha em credencial())
+LOJAS_IADMIN = {
+    LOJAS[0]: {
+        'cliques_empresa': [],
+    },
+    LOJAS[1]: {
+        'cliques_empresa': [(860, 575, 1), (731, 622, 1)],
+    },
+}
+
+# Cliques no iAdmin: (x, y, espera máxima pela reação da tela em segundos)
+CLIQUES_LOGIN_IADMIN = [(604, 674, 2)]
+CLIQUE_SENHA_IADMIN = (612, 778, 2)
+CLIQUE_ENTRAR_IADMIN = (645, 848, 10)
+CLIQUES_RELATORIO = [
+    (908, 229, 15),   # abre a tela de relatórios (a mais lenta)
+    (230, 200, 5),
+    (219, 231, 1),
+    (219, 231, 1),
+    (144, 299, 1),
+    (203, 293, 1),
+    (261, 268, 1),
+    (370, 198, 1),
+    (337, 359, 1),
+    (476, 199, 5),
+    (659, 194, 5),
+]
+CLIQUE_COPIAR_RELATORIO = (1087, 664)
+CLIQUES_FECHAR_RELATORIO = [
+    (751, 204, 1),
+    (1024, 653, 2),
+    (1076, 223, 2),
+    (940, 652, 2),
+    (78, 703, 2),
+    (930, 677, 2),
+]
+
+# Injetado em todas as páginas/frames do modo headless: guarda o texto que
+# o iAdmin copia, sem passar pelo clipboard do sistema (cada sessão tem o seu)
+SCRIPT_CAPTURA_COPIA = '''
+(() => {
+    const guardar = (texto) => {
+        if (!texto) return;
+        window.__textoCopiado = String(texto);
+        try { window.top.__textoCopiado = String(texto); } catch (e) {}
+    };
+    const setData = DataTransfer.prototype.setData;
+    DataTransfer.prototype.setData = function (tipo, valor) {
+        if (String(tipo).startsWith('text')) guardar(valor);
+        return setData.apply(this, arguments);
+    };
+    if (navigator.clipboard && navigator.clipboard.writeText) {
+        const writeText = navigator.clipboard.writeText.bind(navigator.clipboard);
+        navigator.clipboard.writeText = (texto) => {
+            guardar(texto);
+            return writeText(texto).catch(() => {});
+        };
+    }
+    document.addEventListener('copy', () => guardar(String(document.getSelection())), true);
+})();
+'''
+
+# Rastro das etapas da execução (tempos, tentativas, capturas de falha);
+# main() começa um novo a cada chamada
+RASTREADOR = instrumentacao.Rastreador('download_relatorio')
+
+def credencial(nome):
+    """Usuário ou senha do portal/iAdmin (LUBRIMAX_PORTAL_* e LUBRIMAX_IADMIN_*)"""
+    valor = os.environ.get(nome)
+    if not valor:
+        raise RuntimeError(f"{nome} não configurada (variável de ambiente ou {PROJECT_DIR / '.env'})")
+    return valor
+
+def arquivo_cookies(loja, pasta=SESSOES_DIR):
+    return Path(pasta) / f'iadmin_{loja.lower()}.json'
+
+def ler_cookies(loja, pasta=SESSOES_DIR):
+    """Cookies salvos da sessão da loja ({nome: valor}, vazio se não houver)"""
+    arquivo = arquivo_cookies(loja, pasta)
+    if not arquivo.exists():
+        return {}
+    with open(arquivo, encoding='utf-8') as f:
+        return json.load(f)
+
+def salvar_cookies(loja, cookies, pasta=SESSOES_DIR):
+    """Grava os cookies da sessão da loja"""
+    arquivo = arquivo_cookies(loja, pasta)
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    # Nome único: várias threads podem salvar a sessão da mesma loja
+    temporario = arquivo.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(cookies, f)
+    os.replace(temporario, arquivo)
+
+def etapa(nome):
+    """Mede e registra uma etapa no rastro (captura tela e DOM se falhar)"""
+    return RASTREADOR.etapa(nome)
+
+class TelaDesktop:
+    """Tela física do Windows: pyautogui + clipboard do sistema (uma loja por vez)"""
+
+    def __init__(self, driver=None):
+        self.driver = driver   # só para o DOM nas capturas de falha
+
+    def imagem(self):
+        return pyautogui.screenshot()
+
+    def clicar(self, x, y):
+        pyautogui.click(x, y)
+
+    def escrever(self, texto):
+        pyautogui.write(texto)
+
+    def localizar(self, caminho, confidence):
+        return pyautogui.locateOnScreen(caminho, confidence=confidence)
+
+    def preparar_copia(self):
+        pyperclip.copy('')
+
+    def texto_copiado(self):
+        return pyperclip.paste()
+
+class TelaNavegador:
+    """
+    Viewport de um Chrome headless: cliques e teclas por ações do WebDriver
+    e cópia capturada na própria página. Várias lojas podem rodar ao mesmo
+    tempo porque nada é compartilhado (tela, mouse ou clipboard).
+    """
+
+    def __init__(self, driver, barra_px=BARRA_NAVEGADOR_PX):
+        self.driver = driver
+        self.barra_px = barra_px
+
+    def imagem(self):
+        return Image.open(BytesIO(self.driver.get_screenshot_as_png()))
+
+    def clicar(self, x, y):
+        acoes = ActionBuilder(self.driver)
+        acoes.pointer_action.move_to_location(x, y - self.barra_px)
+        acoes.pointer_action.click()
+        acoes.perform()
+
+    def escrever(self, texto):
+        ActionChains(self.driver).send_keys(texto).perform()
+
+    def localizar(self, caminho, confidence):
+        posicao = pyautogui.locate(caminho, self.imagem(), confidence=confidence)
+        if posicao:
+            # Devolve em coordenadas de tela, como os cliques gravados
+            posicao = posicao._replace(top=posicao.top + self.barra_px)
+        return posicao
+
+    def preparar_copia(self):
+        self.driver.execute_script('window.__textoCopiado = null')
+
+    def texto_copiado(self):
+        return self.driver.execute_script('return window.__textoCopiado') or ''
+
+def _quadro_tela(tela):
+    """Tela reduzida em tons de cinza, para comparar quadros rapidamente"""
+    imagem = tela.imagem().convert('L').resize((192, 108))
+    return np.asarray(imagem, dtype=np.int16)
+
+def _quadros_iguais(a, b):
+    return a is not None and b is not None and np.abs(a - b).mean() < TOLERANCIA_TELA
+
+def esperar_mudanca_tela(tela, antes, timeout):
+    """Espera a tela ficar diferente do quadro `antes` (a ação teve efeito)"""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        RASTREADOR.tentativa()
+        if not _quadros_iguais(antes, _quadro_tela(tela)):
+            return True
+        time.sleep(INTERVALO_VERIFICACAO)
+    return False
+
+def esperar_tela_estavel(tela, timeout=TIMEOUT_TELA_ESTAVEL, quadros=2):
+    """Espera a tela parar de mudar (página ou diálogo terminou de desenhar)"""
+    limite = time.monotonic() + timeout
+    anterior = _quadro_tela(tela)
+    iguais = 0
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_VERIFICACAO)
+        RASTREADOR.tentativa()
+        atual = _quadro_tela(tela)
+        iguais = iguais + 1 if _quadros_iguais(anterior, atual) else 0
+        if iguais >= quadros:
+            return True
+        anterior = atual
+    logging.warning(f"[AVISO] Tela não estabilizou em {timeout}s, seguindo")
+    return False
+
+def clicar_e_esperar(tela, x, y, espera_maxima, nome=None):
+    """
+    Clica e espera a reação da tela: primeiro a mudança (até espera_maxima,
+    o tempo que antes era um sleep fixo) e depois a tela ficar estável
+    """
+    with etapa(nome or f"clique ({x},{y})"):
+        antes = _quadro_tela(tela)
+        tela.clicar(x, y)
+        if esperar_mudanca_tela(tela, antes, espera_maxima):
+            esperar_tela_estavel(tela)
+
+def escrever_e_esperar(tela, texto, nome):
+    with etapa(nome):
+        tela.escrever(texto)
+        esperar_tela_estavel(tela)
+
+def esperar_imagem(tela, caminho, timeout=TIMEOUT_IMAGEM, confidence=0.8):
+    """
+    Procura a imagem na tela até encontrá-la ou estourar o timeout
+
+    Returns:
+        Box com a posição da imagem na tela
+    """
+    limite = time.monotonic() + timeout
+    tentativas = 0
+    while True:
+        tentativas += 1
+        RASTREADOR.tentativa()
         try:
-            logging.info(f"Tentativa {attempt + 1}/{max_retries} de localizar iAdmin.png...")
-            time.sleep(5) # Espera carregar
-            iAdmin = pyautogui.locateOnScreen(r'C:\Projetos\Lubrimax\Site_Consulta\imagens\iAdmin.png', confidence=0.8)
-            if iAdmin:
-                pyautogui.click(iAdmin)
-                logging.info("[OK] Clicado no ícone iAdmin") 
-                break
-        except Exception as e:
-            logging.warning(f"Imagem não encontrada na tentativa {attempt + 1}: {e}")
-            if attempt == max_retries - 1:
-                logging.error("Não foi possível localizar o ícone iAdmin após várias tentativas.")
-                raise e
-    
-    time.sleep(5)
-    pyautogui.click(860,575)
-    time.sleep(1)
-    pyautogui.click(731,622)
-    time.sleep(1)
-    pyautogui.click(604,674)
-    time.sleep(2)
-    pyautogui.write('ALEXANDRE')
-    time.sleep(2)
-    pyautogui.click(612,778)
-    time.sleep(2)
-    pyautogui.write('1234')
-    time.sleep(2)
-    pyautogui.click(645,848)
-    logging.info("[OK] Realizado login no iAdmin")
-    time.sleep(10)    
-    return driver
+            posicao = tela.localizar(caminho, confidence)
+            if posicao:
+                logging.info(f"[OK] {os.path.basename(caminho)} encontrada ({tentativas} tentativas)")
+                return posicao
+        except pyautogui.ImageNotFoundException:
+            pass
+        if time.monotonic() >= limite:
+            raise TimeoutError(f"Imagem {caminho} não apareceu na tela em {timeout}s")
+        time.sleep(INTERVALO_VERIFICACAO)
 
-def login():        
-    """Função de login no sistema"""
+def esperar_clipboard(tela, timeout=TIMEOUT_CLIPBOARD):
+    """
+    Espera o clipboard (limpo antes da cópia) receber conteúdo novo e
+    parar de mudar
+
+    Returns:
+        str: texto copiado
+    """
+    limite = time.monotonic() + timeout
+    anterior = ''
+    while time.monotonic() < limite:
+        RASTREADOR.tentativa()
+        atual = tela.texto_copiado()
+        if atual and atual == anterior:
+            return atual
+        anterior = atual
+        time.sleep(INTERVALO_VERIFICACAO)
+    raise TimeoutError(f"Relatório não chegou ao clipboard em {timeout}s")
+
+def abrir_navegador(headless=False, perfil=None):
+    """
+    Args:
+        perfil: nome do perfil persistente em PERFIS_DIR (None = perfil
+                temporário, descartado ao fechar)
+    """
     options = Options()
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument('--start-maximized')
-    service = Service(r'C:\Projetos\Lubrimax\Site_Consulta\chromedriver-win64\chromedriver.exe')
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.get("https://cloud.sistemaiadmin.com.br")
-    wait = WebDriverWait(driver, 10)
-    time.sleep(2)
-    campo_usuario = driver.find_element(By.ID, 'Editbox1')
-    campo_usuario.send_keys('Lubrimax_Gerencia')
-    campo_senha = driver.find_element(By.ID, 'Editbox2')    
-    campo_senha.send_keys('Lubrimax#24')
-    botao_entrar = driver.find_element(By.ID, 'buttonLogOn')
-    time.sleep(5)
-    botao_entrar.click()
-    time.sleep(10)
-    wait.until(EC.number_of_windows_to_be(2))
-    todas_abas = driver.window_handles
-    aba_original = driver.current_window_handle
-    for aba in todas_abas:
-            if aba != aba_original:
+    if perfil:
+        options.add_argument(f'--user-data-dir={os.path.join(PERFIS_DIR, perfil.lower())}')
+    if headless:
+        options.add_argument('--headless=new')
+        options.add_argument(f'--window-size={VIEWPORT_HEADLESS[0]},{VIEWPORT_HEADLESS[1]}')
+    else:
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument('--start-maximized')
+    driver = webdriver.Chrome(service=Service(CHROMEDRIVER or None), options=options)
+
+    if headless:
+        largura, altura = VIEWPORT_HEADLESS
+        driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+            'width': largura, 'height': altura, 'deviceScaleFactor': 1, 'mobile': False,
+        })
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': SCRIPT_CAPTURA_COPIA})
+    return driver
+
+def sessao_portal_valida(driver, wait):
+    """Abre a página inicial do portal; a sessão expirou se voltar para o login"""
+    driver.get(URL_IADMIN.rstrip('/') + PAGINA_SESSAO)
+    wait.until(lambda d: d.execute_script('return document.readyState') == 'complete')
+    return not driver.find_elements(By.ID, 'Editbox1')
+
+def carregar_cookies_navegador(driver, loja):
+    """Coloca no navegador os cookies salvos da loja (da última execução)"""
+    cookies = ler_cookies(loja)
+    if not cookies:
+        return False
+    driver.get(URL_IADMIN)
+    for nome, valor in cookies.items():
+        driver.add_cookie({'name': nome, 'value': valor, 'path': '/'})
+    return True
+
+def login_portal(driver, wait, loja):
+    """Login com as credenciais da loja; o portal abre o iAdmin numa aba nova"""
+    usuario, senha = credencial('LUBRIMAX_PORTAL_USUARIO'), credencial('LUBRIMAX_PORTAL_SENHA')
+    driver.get(URL_IADMIN)
+
+    with etapa(f"{loja}: login no portal"):
+        campo_usuario = wait.until(EC.element_to_be_clickable((By.ID, 'Editbox1')))
+        campo_usuario.send_keys(usuario)
+        campo_senha = wait.until(EC.element_to_be_clickable((By.ID, 'Editbox2')))
+        campo_senha.send_keys(senha)
+        abas_antes = set(driver.window_handles)
+        wait.until(EC.element_to_be_clickable((By.ID, 'buttonLogOn'))).click()
+
+    with etapa(f"{loja}: abrir aba do iAdmin"):
+        wait.until(EC.number_of_windows_to_be(len(abas_antes) + 1))
+        for aba in driver.window_handles:
+            if aba not in abas_antes:
                 driver.switch_to.window(aba)
                 logging.info(f"[OK] Trocado para nova aba: {aba}")
                 break
-    
-    # Tentativa de localizar a imagem com retries
-    max_retries = 5
-    iAdmin = None
-    
-    for attempt in range(max_retries):
-        try:
-            logging.info(f"Tentativa {attempt + 1}/{max_retries} de localizar iAdmin.png...")
-            time.sleep(5) # Espera carregar
-            iAdmin = pyautogui.locateOnScreen(r'C:\Projetos\Lubrimax\Site_Consulta\imagens\iAdmin.png', confidence=0.8)
-            if iAdmin:
-                pyautogui.click(iAdmin)
-                logging.info("[OK] Clicado no ícone iAdmin") 
-                break
-        except Exception as e:
-            logging.warning(f"Imagem não encontrada na tentativa {attempt + 1}: {e}")
-            if attempt == max_retries - 1:
-                logging.error("Não foi possível localizar o ícone iAdmin após várias tentativas.")
-                raise e
-    
-    time.sleep(5)
-    pyautogui.click(604,674)
-    time.sleep(2)
-    pyautogui.write('ALEXANDRE')
-    time.sleep(2)
-    pyautogui.click(612,778)
-    time.sleep(2)
-    pyautogui.write('1234')
-    time.sleep(2)
-    pyautogui.click(645,848)
-    logging.info("[OK] Realizado login no iAdmin")
-    time.sleep(10)    
-    return driver
+        wait.until(lambda d: d.execute_script('return document.readyState') == 'complete')
 
+    # A próxima execução reaproveita a sessão
+    salvar_cookies(loja, {c['name']: c['value'] for c in driver.get_cookies()})
 
+def login(loja=LOJAS[0], headless=False, driver=None, perfil=True):
+    """
+    Função de login no sistema
 
-def extração_relatorio_vendas_lubrimax(driver):
-    """Função para extração do relatório"""
-    driver = driver
-    pyautogui.click(908,229)
-    time.sleep(15)
-    pyautogui.click(230,200)
-    time.sleep(5)
-    pyautogui.click(219,231)
-    time.sleep(1)
-    pyautogui.click(219,231)
-    time.sleep(1)
-    pyautogui.click(144,299)
-    time.sleep(1)
-    pyautogui.click(203,293)
-    time.sleep(1)
-    pyautogui.click(261,268)
-    time.sleep(1)
-    pyautogui.click(370,198)
-    time.sleep(1)
-    pyautogui.click(337,359)
-    time.sleep(1)
-    pyautogui.click(476,199)
-    time.sleep(5)
-    pyautogui.click(659,194)
-    time.sleep(5)
-    pyautogui.click(1087,664)
-    time.sleep(5)
-    df = pd.read_clipboard()
-    caminho_arquivo = r'C:\Projetos\Lubrimax\Vendas_Lubrimax.xlsx'
-    if os.path.exists(caminho_arquivo):
-        os.remove(caminho_arquivo)
-    df.to_excel(caminho_arquivo, index=False, engine='openpyxl')
-    logging.info(f"[OK] Relatório salvo em: {caminho_arquivo}")
-    pyautogui.click(751,204)
-    time.sleep(1)
-    pyautogui.click(1024,653)
-    time.sleep(2)
-    pyautogui.click(1076,223)
-    time.sleep(2)
-    pyautogui.click(940,652)
-    time.sleep(2)
-    pyautogui.click(78,703)
-    time.sleep(2)
-    pyautogui.click(930,677)
-    return True
+    O login com as credenciais do portal só acontece se a sessão expirou:
+    antes, o navegador tenta a sessão do perfil persistente e os cookies
+    salvos da loja.
 
-def extração_relatorio_vendas_adj(driver):
-    """Função para extração do relatório"""
-    driver = driver
-    pyautogui.click(908,229)
-    time.sleep(15)
-    pyautogui.click(230,200)
-    time.sleep(5)
-    pyautogui.click(219,231)
-    time.sleep(1)
-    pyautogui.click(219,231)
-    time.sleep(1)
-    pyautogui.click(144,299)
-    time.sleep(1)
-    pyautogui.click(203,293)
-    time.sleep(1)
-    pyautogui.click(261,268)
-    time.sleep(1)
-    pyautogui.click(370,198)
-    time.sleep(1)
-    pyautogui.click(337,359)
-    time.sleep(1)
-    pyautogui.click(476,199)
-    time.sleep(5)
-    pyautogui.click(659,194)
-    time.sleep(5)
-    pyautogui.click(1087,664)
-    time.sleep(5)
-    df = pd.read_clipboard()
-    caminho_arquivo = r'C:\Projetos\Lubrimax\Vendas_Lubrimax.xlsx'
-    df_existente = pd.read_excel(caminho_arquivo, engine='openpyxl')
-    df_completo = pd.concat([df_existente, df], ignore_index=True)
-    df_completo.to_excel(caminho_arquivo, index=False, engine='openpyxl')
-    logging.info(f"[OK] Relatório salvo em: {caminho_arquivo}")
-    pyautogui.click(751,204)
-    time.sleep(1)
-    pyautogui.click(1024,653)
-    time.sleep(2)
-    pyautogui.click(1076,223)
-    time.sleep(2)
-    pyautogui.click(940,652)
-    time.sleep(2)
-    pyautogui.click(78,703)
-    time.sleep(2)
-    pyautogui.click(930,677)
-    return True
+    Args:
+        driver: navegador já aberto (quente) para reaproveitar
+        perfil: usa o perfil persistente da loja ao abrir um navegador novo
 
-def main():
-    """Função principal"""
-    logging.info("=" * 50)
-    logging.info("🚀 Iniciando extração Lubrimax")
-    logging.info("=" * 50)
-    driver_lubrimax = login()
-    sucesso = extração_relatorio_vendas_lubrimax(driver_lubrimax)
-    if sucesso:
-        logging.info("✅ Extração Lubrimax concluída com sucesso!")
+    Returns:
+        tuple: (driver, tela) - a tela é a do desktop ou a do navegador headless
+    """
+    config = LOJAS_IADMIN[loja]
+
+    if driver is None:
+        with etapa(f"{loja}: abrir navegador"):
+            driver = abrir_navegador(headless, perfil=loja if perfil else None)
+    RASTREADOR.definir_alvo(driver)
+    wait = WebDriverWait(driver, TIMEOUT_PAGINA, poll_frequency=INTERVALO_VERIFICACAO)
+
+    with etapa(f"{loja}: checar sessão do portal"):
+        valida = sessao_portal_valida(driver, wait)
+        if not valida and carregar_cookies_navegador(driver, loja):
+            valida = sessao_portal_valida(driver, wait)
+    if valida:
+        logging.info(f"[OK] Sessão do portal reaproveitada ({loja}), sem novo login")
     else:
-        logging.error("❌ Extração falhou.") 
-    driver_lubrimax.quit()
-    driver_adj = login_adj()
-    sucesso = extração_relatorio_vendas_adj(driver_adj)
-    if sucesso:
-        logging.info("✅ Extração ADJ Comercio concluída com sucesso!")
+        logging.info(f"[INFO] Sessão do portal expirada ({loja}), fazendo login")
+        login_portal(driver, wait, loja)
+
+    if headless:
+        tela = TelaNavegador(driver)
     else:
-        logging.error("❌ Extração falhou.") 
-    driver_adj.quit()
-    
-    # Atualizar banco de dados
+        tela = TelaDesktop(driver)
+        # Referência para calibrar BARRA_NAVEGADOR_PX / VIEWPORT_HEADLESS
+        barra, largura, altura = driver.execute_script(
+            'return [window.screenY + window.outerHeight - window.innerHeight, '
+            'window.innerWidth, window.innerHeight]'
+        )
+        logging.info(f"[INFO] Viewport do navegador: {largura}x{altura}, topo em y={barra}")
+    RASTREADOR.definir_alvo(tela)
+
+    with etapa(f"{loja}: localizar ícone iAdmin"):
+        iAdmin = esperar_imagem(tela, IMAGEM_IADMIN)
+    clicar_e_esperar(tela, *pyautogui.center(iAdmin), 5, f"{loja}: abrir iAdmin")
+    logging.info("[OK] Clicado no ícone iAdmin")
+
+    for x, y, espera in config['cliques_empresa']:
+        clicar_e_esperar(tela, x, y, espera, f"{loja}: selecionar empresa ({x},{y})")
+    for x, y, espera in CLIQUES_LOGIN_IADMIN:
+        clicar_e_esperar(tela, x, y, espera, f"{loja}: campo usuário")
+    escrever_e_esperar(tela, credencial('LUBRIMAX_IADMIN_USUARIO'), f"{loja}: digitar usuário")
+    clicar_e_esperar(tela, *CLIQUE_SENHA_IADMIN, f"{loja}: campo senha")
+    escrever_e_esperar(tela, credencial('LUBRIMAX_IADMIN_SENHA'), f"{loja}: digitar senha")
+    clicar_e_esperar(tela, *CLIQUE_ENTRAR_IADMIN, f"{loja}: entrar no iAdmin")
+    logging.info("[OK] Realizado login no iAdmin")
+    return driver, tela
+
+def extrair_relatorio(tela, loja=LOJAS[0]):
+    """
+    Função para extração do relatório
+
+    Returns:
+        Path: arquivo novo de staging com o texto copiado do relatório
+    """
+    for numero, (x, y, espera) in enumerate(CLIQUES_RELATORIO, start=1):
+        clicar_e_esperar(tela, x, y, espera, f"{loja}: relatório passo {numero}")
+
+    with etapa(f"{loja}: copiar relatório"):
+        tela.preparar_copia()
+        tela.clicar(*CLIQUE_COPIAR_RELATORIO)
+        texto = esperar_clipboard(tela)
+
+    with etapa(f"{loja}: salvar staging"):
+        entrada = staging.gravar_texto(loja, texto, 'tela')
+    caminho_arquivo = staging.STAGING_DIR / entrada['arquivo']
+
+    for numero, (x, y, espera) in enumerate(CLIQUES_FECHAR_RELATORIO, start=1):
+        clicar_e_esperar(tela, x, y, espera, f"{loja}: fechar relatório passo {numero}")
+    return caminho_arquivo
+
+def extrair_loja(loja, headless=False, perfil=True):
+    """Login + extração de uma loja numa sessão própria do navegador"""
+    driver, tela = login(loja, headless=headless, perfil=perfil)
+    try:
+        return extrair_relatorio(tela, loja)
+    finally:
+        RASTREADOR.definir_alvo(None)
+        driver.quit()
+
+def extrair_lojas(lojas=LOJAS, headless=False, perfil=True):
+    """
+    Extrai as lojas uma por vez no mesmo navegador (mantido aberto entre elas)
+
+    A segunda loja aproveita o navegador já carregado e a sessão do portal;
+    só o iAdmin é reaberto para selecionar a empresa.
+
+    Returns:
+        dict: {loja: arquivo de staging} só das lojas que deram certo
+    """
+    arquivos = {}
+    driver = None
+    try:
+        for loja in lojas:
+            try:
+                driver, tela = login(loja, headless=headless, driver=driver, perfil=perfil)
+                arquivos[loja] = extrair_relatorio(tela, loja)
+                logging.info(f"✅ Extração {loja} concluída com sucesso!")
+            except Exception as e:
+                logging.error(f"❌ Extração {loja} falhou: {e}")
+    finally:
+        RASTREADOR.definir_alvo(None)
+        if driver is not None:
+            driver.quit()
+    return arquivos
+
+def extrair_em_paralelo(lojas=LOJAS, perfil=True):
+    """
+    Extrai as lojas ao mesmo tempo, uma sessão headless isolada por loja
+
+    Returns:
+        dict: {loja: arquivo de staging} só das lojas que deram certo
+    """
+    arquivos = {}
+    with ThreadPoolExecutor(max_workers=len(lojas), thread_name_prefix='extracao') as executor:
+        futuros = {loja: executor.submit(extrair_loja, loja, True, perfil) for loja in lojas}
+        for loja, futuro in futuros.items():
+            try:
+                arquivos[loja] = futuro.result()
+            except Exception as e:
+                logging.error(f"❌ Extração headless {loja} falhou: {e}")
+    return arquivos
+
+def registrar_rastro(sucesso):
+    """Salva o rastro da execução e mostra no log as etapas mais lentas"""
+    try:
+        RASTREADOR.salvar(sucesso)
+        for registro in RASTREADOR.mais_lentas(5):
+            logging.info(f"[TEMPO] Mais lenta: {registro['nome']} {registro['duracao']:.2f}s "
+                         f"({registro['tentativas']} tentativas)")
+        resumo = instrumentacao.resumo_etapas(instrumentacao.ler_rastros(RASTREADOR.pasta), top=5)
+        logging.info("[INFO] Etapas mais lentas nas últimas execuções:\n"
+                     + instrumentacao.formatar_resumo(resumo))
+    except Exception as e:
+        logging.warning(f"[AVISO] Erro ao salvar o rastro da execução: {e}")
+
+def main(paralelo=None, perfil=True, banco=True, tela=True):
+    """
+    Função principal
+
+    Args:
+        paralelo: extrai as lojas ao mesmo tempo em navegadores headless; as
+                  que falharem são refeitas, uma por vez, pelo modo tela.
+                  None segue a configuração (HEADLESS, desligado por padrão)
+        perfil: navegadores com o perfil persistente de cada loja (sessão
+                do portal reaproveitada entre execuções)
+        banco: grava as extrações no banco ao final (False: só o staging;
+               a automação faz a ingestão numa etapa separada)
+        tela: as lojas que faltarem são extraídas pela tela do desktop
+              (False nas atualizações durante o expediente: não toma o
+              mouse/teclado do computador do balcão)
+
+    Returns:
+        list | bool: lojas extraídas (a ingestão grava as extrações delas do
+                     staging); False só quando nenhuma loja foi extraída.
+                     Uma loja com falha não impede a carga das outras.
+    """
+    global RASTREADOR
+    # Rastro próprio por chamada: com o agendador, main() roda várias vezes
+    # no mesmo processo e não pode herdar o id nem as etapas da anterior
+    RASTREADOR = instrumentacao.Rastreador('download_relatorio')
     logging.info("=" * 50)
-    logging.info("🔄 Atualizando banco de dados")
+    logging.info("🚀 Iniciando extração Lubrimax")
     logging.info("=" * 50)
+    inicio = time.monotonic()
+    arquivos = {}
+    if paralelo is None:
+        paralelo = HEADLESS
     try:
-        import atualizar_database
-        sucesso_db = atualizar_database.main()
-        if sucesso_db:
-            logging.info("✅ Banco de dados atualizado com sucesso!")
-        else:
-            logging.error("❌ Falha ao atualizar banco de dados")
-    except Exception as e:
-        logging.error(f"❌ Erro ao atualizar banco de dados: {e}")
+        if paralelo:
+            arquivos.update(extrair_em_paralelo(LOJAS, perfil))
+        for loja in LOJAS:
+            if loja in arquivos:
+                logging.info(f"✅ Extração {loja} concluída com sucesso!")
+        # Pela tela, um navegador só para as lojas que faltaram
+        pendentes = [loja for loja in LOJAS if loja not in arquivos]
+        if pendentes and tela:
+            arquivos.update(extrair_lojas(pendentes, perfil=perfil))
+        elif pendentes:
+            logging.warning(f"⚠️ Extração pela tela desativada, lojas sem dados novos: {', '.join(pendentes)}")
+        logging.info(f"[TEMPO] Extração completa: {time.monotonic() - inicio:.2f}s "
+                     f"em {len(RASTREADOR.etapas)} etapas")
+
+        if not arquivos:
+            logging.error("❌ Nenhuma loja extraída, banco de dados mantido")
+            return False
+        extraidas = [loja for loja in LOJAS if loja in arquivos]
+        faltando = [loja for loja in LOJAS if loja not in arquivos]
+        if faltando:
+            logging.warning(f"⚠️ Extração parcial: {', '.join(faltando)} sem dados novos nesta execução; "
+                            f"gravando só {', '.join(extraidas)}")
+        if not banco:
+            return extraidas
+
+        # Atualizar banco de dados: a ingestão lê o manifesto de staging e grava
+        # cada extração ainda não processada (completa ou incremental, por loja)
+        logging.info("=" * 50)
+        logging.info("🔄 Atualizando banco de dados")
+        logging.info("=" * 50)
+        try:
+            import atualizar_database
+            with etapa("atualizar banco de dados"):
+                sucesso_db = atualizar_database.main()
+            if sucesso_db:
+                logging.info("✅ Banco de dados atualizado com sucesso!")
+            else:
+                logging.error("❌ Falha ao atualizar banco de dados")
+        except Exception as e:
+            logging.error(f"❌ Erro ao atualizar banco de dados: {e}")
+        return extraidas
+    finally:
+        registrar_rastro(sucesso=len(arquivos) == len(LOJAS))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Extração dos relatórios de vendas do iAdmin")
+    parser.add_argument('--paralelo', action='store_true', default=None,
+                        help="Lojas ao mesmo tempo em navegadores headless (coordenadas calibradas)")
+    parser.add_argument('--sequencial', action='store_false', dest='paralelo',
+                        help="Uma loja por vez pela tela do desktop (padrão sem LUBRIMAX_HEADLESS=1)")
+    parser.add_argument('--sem-perfil', action='store_true',
+                        help="Navegador com perfil temporário (sempre faz login no portal)")
+    parser.add_argument('--sem-banco', action='store_true',
+                        help="Só grava as extrações no staging (sem atualizar o banco)")
+    parser.add_argument('--sem-tela', action='store_true',
+                        help="Não usa a tela do desktop para as lojas que faltarem")
+    args = parser.parse_args()
+    sys.exit(0 if main(paralelo=args.paralelo, perfil=not args.sem_perfil,
+                       banco=not args.sem_banco, tela=not args.sem_tela) else 1)
@@ -0,0 +1,169 @@
+"""
+Esquema declarativo do relatório de vendas do iAdmin
+
+Define quais colunas do relatório são lidas, o nome de destino no banco e o
+tipo de cada uma. A leitura só carrega essas colunas e converte linha a
+linha: um valor inválido vira nulo (e, se a coluna for obrigatória, a linha
+é rejeitada) sem derrubar a conversão da coluna inteira.
+
+Tipos:
+    data        datas nos formatos de FORMATOS_DATA -> texto '%Y-%m-%d %H:%M:%S'
+    decimal_br  valores no padrão brasileiro ("1.234,56", "R$ 12,50")
+    inteiro     números inteiros (Int64, aceita vazios)
+    categoria   texto com poucos valores distintos (dtype category)
+    texto       texto livre
+"""
+
+import re
+from datetime import datetime
+
+import pandas as pd
+
+FORMATOS_DATA = ['%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+FORMATO_DATA_BANCO = '%Y-%m-%d %H:%M:%S'
+
+# coluna no relatório -> (coluna no banco, tipo, obrigatória)
+ESQUEMA_RELATORIO = {
+    'EMISSÃO':       ('data_emissao', 'data', True),
+    'SÉRIE':         ('serie', 'categoria', False),
+    'NUMERO VENDA':  ('numero_nf', 'inteiro', True),
+    'CLIENTE':       ('nome_cliente', 'texto', False),
+    'TOTAL VENDA':   ('total_venda', 'decimal_br', False),
+    'VENDEDOR':      ('nome_vendedor', 'categoria', False),
+    'IDENTIFICAÇÃO': ('identificacao', 'texto', False),
+    'STATUS':        ('status', 'categoria', False),
+    'OBSERVAÇÃO':    ('observacao', 'texto', False),
+    'LOJA':          ('loja', 'categoria', False),
+}
+
+_MILHAR_SEM_DECIMAL = re.compile(r'^-?\d{1,3}(\.\d{3})+$')
+
+def _como_texto(serie):
+    """Texto sem espaços nas pontas; vazio vira nulo"""
+    texto = serie.astype('string').str.strip()
+    return texto.mask(texto == '')
+
+def converter_data(serie):
+    """Converte cada valor tentando os formatos de FORMATOS_DATA em ordem"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return pd.to_datetime(serie, errors='coerce')
+
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    # Células que o Excel já entregou como data
+    nativas = serie.map(lambda v: isinstance(v, datetime)).astype(bool)
+    if nativas.any():
+        resultado[nativas] = pd.to_datetime(serie[nativas], errors='coerce')
+
+    texto = _como_texto(serie.where(~nativas))
+    for formato in FORMATOS_DATA:
+        pendentes = resultado.isna() & texto.notna()
+        if not pendentes.any():
+            break
+        resultado[pendentes] = pd.to_datetime(texto[pendentes], format=formato, errors='coerce')
+    return resultado
+
+def converter_decimal_br(serie):
+    """
+    Converte valores no padrão brasileiro para float
+
+    Com vírgula, o ponto é separador de milhar ("1.234,56" -> 1234.56).
+    Sem vírgula, só "1.234" / "1.234.567" são tratados como milhar;
+    números que já vieram como número do Excel ficam como estão.
+    """
+    numericos = pd.to_numeric(serie.where(serie.map(lambda v: isinstance(v, (int, float))).astype(bool)), errors='coerce')
+
+    texto = _como_texto(serie.where(numericos.isna()))
+    texto = texto.str.replace('R$', '', regex=False).str.replace(' ', '', regex=False)
+    com_virgula = texto.str.contains(',', regex=False).fillna(False)
+    so_milhar = texto.str.match(_MILHAR_SEM_DECIMAL).fillna(False)
+
+    texto = texto.mask(com_virgula | so_milhar, texto.str.replace('.', '', regex=False))
+    texto = texto.mask(com_virgula, texto.str.replace(',', '.', regex=False))
+    return numericos.fillna(pd.to_numeric(texto, errors='coerce')).astype('float64')
+
+def converter_inteiro(serie):
+    numeros = pd.to_numeric(_como_texto(serie), errors='coerce')
+    # Valores com casas decimais não são identificadores válidos
+    numeros = numeros.where(numeros.isna() | (numeros == numeros.round()))
+    return numeros.astype('Int64')
+
+CONVERSORES = {
+    'data': converter_data,
+    'decimal_br': converter_decimal_br,
+    'inteiro': converter_inteiro,
+    'categoria': lambda serie: _como_texto(serie).astype('category'),
+    'texto': _como_texto,
+}
+
+def aplicar_esquema(df):
+    """
+    Renomeia e converte as colunas de um relatório já carregado
+
+    Returns:
+        tuple: (df_convertido, df_rejeitado) - as linhas rejeitadas têm algum
+               campo obrigatório ausente ou inválido
+    """
+    convertido = pd.DataFrame(index=df.index)
+    invalidas = pd.Series(False, index=df.index)
+    rejeitar = pd.Series(False, index=df.index)
+
+    for origem, (destino, tipo, obrigatoria) in ESQUEMA_RELATORIO.items():
+        if origem not in df.columns:
+            if obrigatoria:
+                raise ValueError(f"Coluna obrigatória ausente no relatório: {origem}")
+            convertido[destino] = pd.Series(pd.NA, index=df.index, dtype='string')
+            continue
+        valores = CONVERSORES[tipo](df[origem])
+        # Preenchido no relatório mas sem conversão possível (vazio não conta)
+        invalidas |= _como_texto(df[origem]).notna() & valores.isna()
+        if obrigatoria:
+            rejeitar |= valores.isna()
+        convertido[destino] = valores
+
+    convertido['data_emissao'] = convertido['data_emissao'].dt.strftime(FORMATO_DATA_BANCO)
+    convertido.attrs['valores_invalidos'] = int(invalidas.sum())
+
+    rejeitado = df[rejeitar]
+    return convertido[~rejeitar].reset_index(drop=True), rejeitado
+
+def ler_relatorio(caminho, loja=None):
+    """
+    Lê o relatório (xlsx) carregando só as colunas do esquema
+
+    Args:
+        loja: preenche a coluna LOJA quando o relatório não a traz (relatório
+              de uma loja só)
+
+    Returns:
+        tuple: (df_convertido, df_rejeitado)
+    """
+    df = pd.read_excel(
+        caminho,
+        engine='openpyxl',
+        usecols=lambda coluna: coluna in ESQUEMA_RELATORIO,
+        dtype=object,
+    )
+    if loja and 'LOJA' not in df.columns:
+        df['LOJA'] = loja
+    return aplicar_esquema(df)
+
+def ler_relatorio_texto(caminho, loja=None):
+    """
+    Lê o relatório em texto separado por tab (cópia da tela do iAdmin)
+
+    Args:
+        loja: preenche a coluna LOJA (o texto do iAdmin não traz a loja)
+
+    Returns:
+        tuple: (df_convertido, df_rejeitado)
+    """
+    df = pd.read_csv(
+        caminho,
+        sep='\t',
+        encoding='utf-8',
+        usecols=lambda coluna: coluna in ESQUEMA_RELATORIO,
+        dtype=object,
+    )
+    if loja:
+        df['LOJA'] = loja
+    return aplicar_esquema(df)
@@ -0,0 +1,174 @@
+"""
+Extração de placas e KM dos campos OBSERVAÇÃO / IDENTIFICAÇÃO
+
+Um único regex com alternação percorre o texto uma vez e devolve, na
+ordem em que aparecem, todas as placas e leituras de KM. Cada KM fica
+associado à placa citada antes dele (ou à primeira placa, se vier antes
+de qualquer placa).
+
+Formatos aceitos para KM:
+- "KM 123456", "KM: 220.878", "KM  265184", "KM  1207403", "KM: 220,878"
+
+Formatos aceitos para placa (antigo e Mercosul):
+- "PLACA: ABC1234", "PLACAS: ABC1234  DEF5G67", "VW ABC1234", "ABC1D23"
+- "ABC-1234" / "ABC 1234" (só usados se não houver placa sem separador,
+  para não confundir "UNO 2019" com placa)
+
+Placa com caractere faltando (ex.: "FXG495" em "PLACAS: EAS5445  FXG495")
+não é suportada: a venda só é achada pelas outras placas do texto (EAS5445).
+O vínculo não é gravado nem como placa incompleta para busca por prefixo
+porque não se sabe qual caractere falta ("FXG495" pode ser FXG4950, FXG4195,
+FXG0495...): a busca por prefixo só acertaria quando falta o último, e
+completar o caractere seria chute. A busca do app só aceita placas completas
+(7 caracteres).
+"""
+
+import re
+
+import pandas as pd
+
+_TOKENS = re.compile(r'''
+    KM\s*[:=]?\s*(?P<km>[\d.,\s]*\d)
+  | (?<![A-Z0-9])(?P<placa>[A-Z]{3}[0-9][A-Z0-9][0-9]{2})(?![A-Z0-9])
+  | (?<![A-Z0-9])(?P<placa_sep>[A-Z]{3}[-\s][0-9][A-Z0-9][0-9]{2})(?![A-Z0-9])
+''', re.VERBOSE)
+
+_NAO_DIGITO = re.compile(r'\D')
+
+def extrair_placas_kms(*textos):
+    """
+    Extrai todas as placas e leituras de KM dos textos
+
+    Returns:
+        list: [(placa, km), ...] sem placas repetidas, na ordem em que
+              aparecem; km é texto só com dígitos ou None
+    """
+    placas = []
+    separadas = []
+    kms = []   # (posição da placa à qual pertence, km)
+
+    for texto in textos:
+        if texto is None or pd.isna(texto):
+            continue
+        for token in _TOKENS.finditer(str(texto).strip().upper()):
+            if token.group('km') is not None:
+                kms.append((len(placas) - 1, _NAO_DIGITO.sub('', token.group('km'))))
+            elif token.group('placa') is not None:
+                placas.append(token.group('placa'))
+            else:
+                separadas.append(token.group('placa_sep').replace('-', '').replace(' ', ''))
+
+    if not placas:
+        placas = separadas
+
+    resultado = {}
+    for placa in placas:
+        resultado.setdefault(placa, None)
+    ordem = list(resultado)
+    for indice, km in kms:
+        if not ordem:
+            break
+        placa = ordem[max(indice, 0)] if indice < len(ordem) else ordem[-1]
+        if resultado[placa] is None:
+            resultado[placa] = km
+    return list(resultado.items())
+
+def extrair_placa_km(observacao):
+    """
+    Extrai a primeira placa e o primeiro KM do campo observação
+
+    Returns:
+        tuple: (placa, km) onde ambos podem ser None
+    """
+    if observacao is None or pd.isna(observacao):
+        return None, None
+    pares = extrair_placas_kms(observacao)
+    if pares:
+        placa, km = pares[0]
+        if km is None:
+            km = next((k for _, k in pares if k is not None), None)
+        return placa, km
+    return None, _primeiro_km(observacao)
+
+def _primeiro_km(texto):
+    for token in _TOKENS.finditer(str(texto).strip().upper()):
+        if token.group('km') is not None:
+            return _NAO_DIGITO.sub('', token.group('km'))
+    return None
+
+def extrair_placas_dataframe(df):
+    """
+    Preenche placa/km (principais) e a lista de placas de cada venda
+
+    - placas: [(placa, km), ...] de OBSERVAÇÃO e IDENTIFICAÇÃO
+    - placa / km: o primeiro par (ou a identificação limpa, se não houver placa)
+    """
+    pares = [
+        extrair_placas_kms(observacao, identificacao)
+        for observacao, identificacao in zip(df['observacao'], df['identificacao'])
+    ]
+    kms_soltos = [_primeiro_km(observacao) if not p and pd.notna(observacao) else None
+                  for p, observacao in zip(pares, df['observacao'])]
+
+    identificacao = df['identificacao'].astype('string').str.upper().str.replace(r'[^A-Z0-9]', '', regex=True)
+    identificacao = identificacao.mask(identificacao == '')
+
+    df['placa'] = [p[0][0] if p else None for p in pares]
+    df['placa'] = df['placa'].fillna(identificacao)
+    df['km'] = [p[0][1] if p and p[0][1] is not None else k for p, k in zip(pares, kms_soltos)]
+    df['placas'] = [
+        p if p else ([(placa, km)] if pd.notna(placa) else [])
+        for p, placa, km in zip(pares, df['placa'], df['km'])
+    ]
+    return df
+
+def inserir_vinculos_placa(cursor, df):
+    """
+    Grava em venda_placa um vínculo para cada placa de cada venda
+
+    As vendas já devem estar inseridas: o id é obtido pela chave da venda
+    (índice único idx_vendas_chave), via tabela temporária.
+
+    Returns:
+        int: quantidade de vínculos gravados
+    """
+    vinculos = df[['loja', 'serie', 'numero_nf', 'data_emissao', 'placas']].explode('placas')
+    vinculos = vinculos[vinculos['placas'].notna()]
+    if len(vinculos) == 0:
+        return 0
+
+    vinculos['placa'] = [par[0] for par in vinculos['placas']]
+    vinculos['km'] = pd.to_numeric(pd.Series([par[1] for par in vinculos['placas']], index=vinculos.index),
+                                   errors='coerce').astype('Int64')
+
+    from normalizacao import linhas_para_sql
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS tmp_vinculos (
+            loja TEXT, serie TEXT, numero_nf INTEGER, data_emissao TEXT, placa TEXT, km INTEGER
+        )
+    ''')
+    cursor.execute('DELETE FROM tmp_vinculos')
+    cursor.executemany(
+        'INSERT INTO tmp_vinculos VALUES (?, ?, ?, ?, ?, ?)',
+        linhas_para_sql(vinculos, ['loja', 'serie', 'numero_nf', 'data_emissao', 'placa', 'km'])
+    )
+    # Venda atualizada (upsert) pode ter trocado de placas
+    cursor.execute('''
+        DELETE FROM venda_placa WHERE venda_id IN (
+            SELECT v.id FROM tmp_vinculos t
+            JOIN vendas v
+              ON v.loja IS t.loja AND v.serie IS t.serie
+             AND v.numero_nf = t.numero_nf AND v.data_emissao = t.data_emissao
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO venda_placa (placa, venda_id, km, loja)
+        SELECT t.placa, v.id, t.km, v.loja
+        FROM tmp_vinculos t
+        JOIN vendas v
+          ON v.loja IS t.loja AND v.serie IS t.serie
+         AND v.numero_nf = t.numero_nf AND v.data_emissao = t.data_emissao
+    ''')
+    gravados = cursor.rowcount
+    cursor.execute('DELETE FROM tmp_vinculos')
+    return gravados
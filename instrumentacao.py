@@ -0,0 +1,234 @@
+"""
+Instrumentação das etapas do scraper (download_relatorio.py)
+
+Cada etapa nomeada (clique, espera, login, download...) é medida com
+time.monotonic e registrada com o número de tentativas (voltas das esperas
+por tela, imagem ou clipboard) e o resultado. Se a etapa falhar, é feita
+uma captura da tela (PNG) e do DOM da página (HTML) no momento da falha.
+
+No fim da execução o rastro vai para logs/traces/trace_<execucao>.json e as
+capturas ficam em logs/traces/<execucao>/. O resumo das etapas mais lentas
+entre as últimas execuções sai no log ou pela linha de comando:
+
+    python instrumentacao.py [--execucoes 30] [--top 15]
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+TRACES_DIR = Path(os.environ.get('LUBRIMAX_TRACES_DIR', r'C:\Projetos\Lubrimax\Site_Consulta\logs\traces'))
+MANTER_EXECUCOES = 60   # rastros (e capturas) mais antigos são apagados
+
+def _nome_arquivo(texto):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', texto).strip('_')[:60]
+
+def capturar_falha(alvo, base):
+    """
+    Grava a tela (PNG) e o DOM (HTML) do alvo no momento da falha
+
+    Args:
+        alvo: tela do scraper (TelaDesktop / TelaNavegador) ou WebDriver
+        base: caminho sem extensão dos arquivos
+
+    Returns:
+        list: arquivos gravados
+    """
+    arquivos = []
+    driver = getattr(alvo, 'driver', None) or (alvo if hasattr(alvo, 'page_source') else None)
+    try:
+        if hasattr(alvo, 'imagem'):
+            alvo.imagem().save(f'{base}.png')
+        else:
+            Path(f'{base}.png').write_bytes(driver.get_screenshot_as_png())
+        arquivos.append(f'{base}.png')
+    except Exception as e:
+        logging.warning(f"[AVISO] Captura de tela da falha não gravada: {e}")
+    if driver is not None:
+        try:
+            Path(f'{base}.html').write_text(driver.page_source, encoding='utf-8')
+            arquivos.append(f'{base}.html')
+        except Exception as e:
+            logging.warning(f"[AVISO] DOM da falha não gravado: {e}")
+    return arquivos
+
+class Rastreador:
+    """Rastro das etapas de uma execução (seguro para várias threads)"""
+
+    def __init__(self, script, pasta=TRACES_DIR):
+        self.script = script
+        self.pasta = Path(pasta)
+        self.execucao = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.inicio = datetime.now()
+        self._inicio_monotonic = time.monotonic()
+        self.etapas = []
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    def definir_alvo(self, alvo):
+        """Tela ou navegador capturado quando uma etapa desta thread falhar"""
+        self._local.alvo = alvo
+
+    def _pilha(self):
+        if not hasattr(self._local, 'pilha'):
+            self._local.pilha = []
+        return self._local.pilha
+
+    def tentativa(self):
+        """Conta mais uma tentativa (volta de espera) na etapa em andamento"""
+        pilha = self._pilha()
+        if pilha:
+            pilha[-1]['tentativas'] += 1
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede a etapa; em caso de erro registra a falha e captura tela e DOM"""
+        pilha = self._pilha()
+        registro = {
+            'nome': nome,
+            'thread': threading.current_thread().name,
+            'pai': pilha[-1]['nome'] if pilha else None,
+            'inicio': round(time.monotonic() - self._inicio_monotonic, 3),
+            'duracao': None,
+            'tentativas': 0,
+            'status': 'ok',
+        }
+        pilha.append(registro)
+        inicio = time.monotonic()
+        try:
+            yield registro
+        except Exception as e:
+            registro['status'] = 'erro'
+            registro['erro'] = f'{type(e).__name__}: {e}'
+            # Só a etapa mais interna captura (o erro sobe pelas etapas de fora)
+            if not getattr(e, '_capturado', False):
+                registro['capturas'] = self._capturar(nome)
+                try:
+                    e._capturado = True
+                except AttributeError:
+                    pass
+            raise
+        finally:
+            registro['duracao'] = round(time.monotonic() - inicio, 3)
+            pilha.pop()
+            with self._trava:
+                self.etapas.append(registro)
+            if registro['status'] == 'ok':
+                logging.info(f"[TEMPO] {nome}: {registro['duracao']:.2f}s")
+            else:
+                logging.error(f"[TEMPO] {nome}: falhou em {registro['duracao']:.2f}s "
+                              f"({registro['tentativas']} tentativas) - {registro['erro']}")
+
+    def _capturar(self, nome):
+        alvo = getattr(self._local, 'alvo', None)
+        if alvo is None:
+            return []
+        pasta = self.pasta / self.execucao
+        pasta.mkdir(parents=True, exist_ok=True)
+        with self._trava:
+            numero = sum(1 for e in self.etapas if e['status'] == 'erro') + 1
+        arquivos = capturar_falha(alvo, str(pasta / f'falha_{numero:02d}_{_nome_arquivo(nome)}'))
+        for arquivo in arquivos:
+            logging.error(f"[ERRO] Captura da falha: {arquivo}")
+        return arquivos
+
+    def mais_lentas(self, top=5):
+        with self._trava:
+            return sorted(self.etapas, key=lambda e: e['duracao'], reverse=True)[:top]
+
+    def salvar(self, sucesso):
+        """Grava o rastro da execução (JSON) e apaga os rastros mais antigos"""
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        with self._trava:
+            etapas = sorted(self.etapas, key=lambda e: e['inicio'])
+        rastro = {
+            'script': self.script,
+            'execucao': self.execucao,
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'duracao': round(time.monotonic() - self._inicio_monotonic, 3),
+            'sucesso': bool(sucesso),
+            'etapas': etapas,
+        }
+        destino = self.pasta / f'trace_{self.execucao}.json'
+        temporario = destino.with_name(destino.name + '.tmp')
+        temporario.write_text(json.dumps(rastro, indent=1, ensure_ascii=False), encoding='utf-8')
+        os.replace(temporario, destino)
+        logging.info(f"[OK] Rastro da execução salvo em: {destino}")
+
+        for antigo in sorted(self.pasta.glob('trace_*.json'))[:-MANTER_EXECUCOES]:
+            antigo.unlink()
+            shutil.rmtree(self.pasta / antigo.stem.replace('trace_', ''), ignore_errors=True)
+        return destino
+
+def ler_rastros(pasta=TRACES_DIR, execucoes=30):
+    """Rastros das últimas execuções (mais antigas primeiro)"""
+    rastros = []
+    for arquivo in sorted(Path(pasta).glob('trace_*.json'))[-execucoes:]:
+        try:
+            rastros.append(json.loads(arquivo.read_text(encoding='utf-8')))
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"[AVISO] Rastro ilegível {arquivo.name}: {e}")
+    return rastros
+
+def resumo_etapas(rastros, top=15):
+    """
+    Etapas que mais somaram tempo nas execuções informadas
+
+    Returns:
+        list: dicts com nome, execucoes, media, p95, maximo, tentativas (média),
+              falhas e total, do maior total para o menor
+    """
+    por_etapa = {}
+    for rastro in rastros:
+        for etapa in rastro['etapas']:
+            por_etapa.setdefault(etapa['nome'], []).append(etapa)
+
+    resumo = []
+    for nome, registros in por_etapa.items():
+        duracoes = sorted(e['duracao'] for e in registros)
+        resumo.append({
+            'nome': nome,
+            'execucoes': len(registros),
+            'media': sum(duracoes) / len(duracoes),
+            'p95': duracoes[min(len(duracoes) - 1, int(0.95 * len(duracoes)))],
+            'maximo': duracoes[-1],
+            'tentativas': sum(e['tentativas'] for e in registros) / len(registros),
+            'falhas': sum(e['status'] == 'erro' for e in registros),
+            'total': sum(duracoes),
+        })
+    resumo.sort(key=lambda r: r['total'], reverse=True)
+    return resumo[:top]
+
+def formatar_resumo(resumo):
+    linhas = [f"{'Etapa':<45} {'N':>4} {'Média':>7} {'p95':>7} {'Máx':>7} {'Tent.':>6} {'Falhas':>6}"]
+    for r in resumo:
+        linhas.append(
+            f"{r['nome'][:45]:<45} {r['execucoes']:>4} {r['media']:>6.2f}s {r['p95']:>6.2f}s "
+            f"{r['maximo']:>6.2f}s {r['tentativas']:>6.1f} {r['falhas']:>6}"
+        )
+    return '\n'.join(linhas)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Etapas mais lentas do scraper nas últimas execuções")
+    parser.add_argument('--execucoes', type=int, default=30)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--pasta', default=str(TRACES_DIR))
+    args = parser.parse_args()
+
+    rastros = ler_rastros(args.pasta, args.execucoes)
+    if not rastros:
+        print(f"Nenhum rastro em {args.pasta}")
+    else:
+        falhas = sum(not r['sucesso'] for r in rastros)
+        media = sum(r['duracao'] for r in rastros) / len(rastros)
+        print(f"{len(rastros)} execuções ({falhas} com falha), duração média {media:.1f}s\n")
+        print(formatar_resumo(resumo_etapas(rastros, args.top)))
@@ -0,0 +1,337 @@
+"""
+Histórico de métricas das execuções da automação (logs/metricas_pipeline.sqlite)
+
+Cada execução do automacao_completa.py grava uma linha em pipeline_runs
+(duração, status, linhas extraídas/gravadas/rejeitadas, tamanho do banco,
+bytes enviados no push, tempo até o app acordar, sobrecarga de início e
+importação das etapas) e o tempo de cada etapa em pipeline_run_etapas.
+
+O relatório de desempenho mostra p50/p95 das últimas N execuções e aponta
+regressões: a metade mais recente das execuções comparada com a mais antiga,
+com a execução a partir da qual o tempo mudou e o tamanho do histórico
+naquele momento (ex.: ingestão dobrou depois de 100 mil vendas). Cada modo
+de execução (ex.: 'delta' e 'delta intradiaria') tem a sua própria base de
+comparação: uma intradiária rápida não pode esconder nem inventar regressão
+da execução completa.
+
+Uso:
+    python metricas_pipeline.py [--execucoes 30] [--modo "delta intradiaria"]
+"""
+
+import logging
+import sqlite3
+from pathlib import Path
+
+from migracoes import adicionar_coluna
+
+PROJECT_DIR = Path(__file__).parent
+METRICAS_PATH = PROJECT_DIR / 'logs' / 'metricas_pipeline.sqlite'
+
+EXECUCOES_PADRAO = 30
+# Regressão: p50 recente acima de FATOR_REGRESSAO x p50 anterior e com
+# diferença de pelo menos DIFERENCA_MINIMA segundos (ruído de etapas curtas)
+FATOR_REGRESSAO = 1.5
+DIFERENCA_MINIMA = 2.0
+AMOSTRAS_MINIMAS = 3
+
+# Métricas da execução: (coluna, descrição, unidade)
+METRICAS = [
+    ('duracao', 'Duração total', 's'),
+    ('linhas_extraidas', 'Linhas extraídas', ''),
+    ('linhas_inseridas', 'Linhas gravadas', ''),
+    ('linhas_rejeitadas', 'Linhas rejeitadas', ''),
+    ('total_vendas', 'Vendas no banco', ''),
+    ('tamanho_db', 'Tamanho do banco', 'B'),
+    ('bytes_push', 'Bytes enviados no push', 'B'),
+    ('tempo_acordar', 'App pronto (início)', 's'),
+    ('tempo_acordar_deploy', 'App pronto (após deploy)', 's'),
+    ('sobrecarga', 'Sobrecarga início/importação', 's'),
+]
+# Métricas de tempo entram na detecção de regressão junto com as etapas
+METRICAS_TEMPO = ['duracao', 'tempo_acordar', 'tempo_acordar_deploy', 'sobrecarga']
+
+def abrir(caminho=METRICAS_PATH):
+    """Abre o histórico de métricas, criando as tabelas se preciso"""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(caminho)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pipeline TEXT NOT NULL,
+            inicio TEXT NOT NULL,
+            duracao REAL,
+            sucesso INTEGER NOT NULL,
+            modo TEXT,
+            linhas_extraidas INTEGER,
+            linhas_inseridas INTEGER,
+            linhas_rejeitadas INTEGER,
+            total_vendas INTEGER,
+            tamanho_db INTEGER,
+            bytes_push INTEGER,
+            tempo_acordar REAL,
+            tempo_acordar_deploy REAL,
+            caminho_critico TEXT
+        )
+    ''')
+    adicionar_coluna(conn, 'pipeline_runs', 'sobrecarga', 'REAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_run_etapas (
+            run_id INTEGER NOT NULL REFERENCES pipeline_runs(id),
+            etapa TEXT NOT NULL,
+            status TEXT NOT NULL,
+            inicio REAL,
+            duracao REAL,
+            PRIMARY KEY (run_id, etapa)
+        ) WITHOUT ROWID
+    ''')
+    adicionar_coluna(conn, 'pipeline_run_etapas', 'isolada', 'INTEGER NOT NULL DEFAULT 0')
+    adicionar_coluna(conn, 'pipeline_run_etapas', 'sobrecarga', 'REAL')
+    return conn
+
+def contagens_carga(caminho_db, desde):
+    """
+    Linhas extraídas, gravadas e rejeitadas pelos arquivos de staging
+    ingeridos desde o início da execução, total de vendas e tamanho do banco
+
+    Args:
+        caminho_db: Banco de dados (data/db.sqlite)
+        desde: datetime do início da execução
+    """
+    caminho_db = Path(caminho_db)
+    contagens = {'linhas_extraidas': 0, 'linhas_inseridas': 0, 'linhas_rejeitadas': 0,
+                 'total_vendas': None, 'tamanho_db': None}
+    if not caminho_db.exists():
+        return contagens
+    contagens['tamanho_db'] = caminho_db.stat().st_size
+    conn = sqlite3.connect(caminho_db.resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        contagens['total_vendas'] = conn.execute('SELECT COUNT(*) FROM vendas').fetchone()[0]
+        linha = conn.execute('''
+            SELECT COALESCE(SUM(lidas), 0), COALESCE(SUM(linhas), 0), COALESCE(SUM(rejeitadas), 0)
+            FROM staging_ingerido WHERE ingerido_em >= ?
+        ''', (desde.isoformat(timespec='seconds'),)).fetchone()
+        contagens['linhas_extraidas'], contagens['linhas_inseridas'], contagens['linhas_rejeitadas'] = linha
+    except sqlite3.OperationalError as e:
+        # Banco ainda sem as tabelas/colunas (migrações pendentes)
+        logging.warning(f"[AVISO] Contagens da carga indisponíveis: {e}")
+    finally:
+        conn.close()
+    return contagens
+
+def registrar_execucao(pipeline, metricas=None, caminho=METRICAS_PATH):
+    """
+    Grava a execução do pipeline e o tempo de cada etapa no histórico
+
+    Args:
+        pipeline: Pipeline já executado (pipeline.py)
+        metricas: dict com as colunas de METRICAS medidas pelo chamador
+                  (linhas, tamanho do banco, bytes do push, tempo até acordar)
+        caminho: Banco do histórico de métricas
+
+    Returns:
+        int: id da execução em pipeline_runs
+    """
+    metricas = dict(metricas or {})
+    metricas.setdefault('sobrecarga', pipeline.sobrecarga)
+    colunas = [c for c, _, _ in METRICAS if c != 'duracao']
+    conn = abrir(caminho)
+    try:
+        with conn:
+            cursor = conn.execute(f'''
+                INSERT INTO pipeline_runs (pipeline, inicio, duracao, sucesso, modo, caminho_critico,
+                                           {', '.join(colunas)})
+                VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' * len(colunas))})
+            ''', (pipeline.nome, pipeline.execucao.isoformat(timespec='seconds'),
+                  round(pipeline.duracao, 3), int(pipeline.sucesso), metricas.get('modo'),
+                  ' -> '.join(e.nome for e in pipeline.caminho_critico()),
+                  *[metricas.get(c) for c in colunas]))
+            run_id = cursor.lastrowid
+            conn.executemany(
+                '''INSERT INTO pipeline_run_etapas (run_id, etapa, status, inicio, duracao, isolada, sobrecarga)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                [(run_id, e.nome, e.status,
+                  round(e.inicio, 3) if e.inicio is not None else None,
+                  round(e.duracao, 3) if e.duracao is not None else None,
+                  int(e.isolada),
+                  round(e.sobrecarga, 3) if e.sobrecarga is not None else None)
+                 for e in pipeline.etapas.values()]
+            )
+    finally:
+        conn.close()
+    return run_id
+
+def historico(execucoes=EXECUCOES_PADRAO, caminho=METRICAS_PATH, modo=None):
+    """
+    Últimas N execuções (só as do modo informado), da mais antiga para a mais recente
+
+    Returns:
+        list[dict]: colunas de pipeline_runs + 'etapas' ({nome: duração} das
+                    etapas concluídas com sucesso)
+    """
+    conn = abrir(caminho)
+    conn.row_factory = sqlite3.Row
+    try:
+        if modo is None:
+            linhas = conn.execute('SELECT * FROM pipeline_runs ORDER BY id DESC LIMIT ?', (execucoes,))
+        else:
+            linhas = conn.execute('SELECT * FROM pipeline_runs WHERE modo IS ? ORDER BY id DESC LIMIT ?',
+                                  (modo, execucoes))
+        execucoes = [dict(linha) for linha in linhas]
+        for execucao in execucoes:
+            execucao['etapas'] = dict(conn.execute(
+                "SELECT etapa, duracao FROM pipeline_run_etapas WHERE run_id = ? AND status = 'ok'",
+                (execucao['id'],)
+            ).fetchall())
+    finally:
+        conn.close()
+    return list(reversed(execucoes))
+
+def modos(caminho=METRICAS_PATH):
+    """Modos de execução registrados, do mais recente para o mais antigo"""
+    conn = abrir(caminho)
+    try:
+        return [linha[0] for linha in conn.execute(
+            'SELECT modo FROM pipeline_runs GROUP BY modo ORDER BY MAX(id) DESC'
+        )]
+    finally:
+        conn.close()
+
+def _percentil(valores, p):
+    """Percentil pelo posto mais próximo (valores já sem None)"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posto = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(posto) - 1]
+
+def _series(execucoes):
+    """{nome: [(execução, valor)]} das etapas e das métricas de tempo, em ordem cronológica"""
+    series = {}
+    for execucao in execucoes:
+        for etapa, duracao in execucao['etapas'].items():
+            if duracao is not None:
+                series.setdefault(f'etapa {etapa}', []).append((execucao, duracao))
+        for coluna in METRICAS_TEMPO:
+            if execucao[coluna] is not None:
+                series.setdefault(coluna, []).append((execucao, execucao[coluna]))
+    return series
+
+def regressoes(execucoes=EXECUCOES_PADRAO, caminho=METRICAS_PATH, historico_execucoes=None, modo=None):
+    """
+    Tempos que pioraram: metade recente das execuções contra a metade antiga,
+    comparando só execuções do mesmo modo (sem modo: cada modo separado)
+
+    Returns:
+        list[dict]: serie, p50_antes, p50_depois, fator, desde (início da
+                    primeira execução recente acima do p95 anterior) e
+                    total_vendas naquela execução
+    """
+    if historico_execucoes is None:
+        if modo is None:
+            return [r for m in modos(caminho) for r in regressoes(execucoes, caminho, modo=m)]
+        historico_execucoes = historico(execucoes, caminho, modo)
+    encontradas = []
+    for serie, pontos in _series(historico_execucoes).items():
+        meio = len(pontos) // 2
+        antes, depois = pontos[:meio], pontos[meio:]
+        if len(antes) < AMOSTRAS_MINIMAS or len(depois) < AMOSTRAS_MINIMAS:
+            continue
+        p50_antes = _percentil([v for _, v in antes], 50)
+        p50_depois = _percentil([v for _, v in depois], 50)
+        if p50_depois <= p50_antes * FATOR_REGRESSAO or p50_depois - p50_antes < DIFERENCA_MINIMA:
+            continue
+        p95_antes = _percentil([v for _, v in antes], 95)
+        marco = next((e for e, v in depois if v > p95_antes), depois[0][0])
+        encontradas.append({
+            'serie': serie,
+            'p50_antes': p50_antes,
+            'p50_depois': p50_depois,
+            'fator': round(p50_depois / p50_antes, 2) if p50_antes else None,
+            'desde': marco['inicio'],
+            'total_vendas': marco['total_vendas'],
+        })
+    return encontradas
+
+def _formatar(valor, unidade):
+    if valor is None:
+        return '-'
+    if unidade == 's':
+        return f'{valor:.1f}s'
+    if unidade == 'B':
+        return f'{valor / 1024 / 1024:.1f} MB' if valor >= 1024 * 1024 else f'{valor / 1024:.1f} KB'
+    return f'{valor:,.0f}'
+
+def descrever_regressao(regressao):
+    """Uma linha de texto para o log/relatório"""
+    fator = f" (x{regressao['fator']})" if regressao['fator'] else ''
+    vendas = (f", histórico com {regressao['total_vendas']:,} vendas"
+              if regressao['total_vendas'] is not None else '')
+    return (f"{regressao['serie']}: p50 {regressao['p50_antes']:.1f}s -> {regressao['p50_depois']:.1f}s"
+            f"{fator} desde {regressao['desde']}{vendas}")
+
+def relatorio_desempenho(execucoes=EXECUCOES_PADRAO, caminho=METRICAS_PATH, modo=None):
+    """
+    Texto com p50/p95 por etapa e por métrica nas últimas N execuções,
+    tendência (metade antiga x metade recente) e regressões encontradas,
+    uma seção por modo de execução (ou só a do modo informado)
+    """
+    if modo is None:
+        encontrados = modos(caminho)
+        if not encontrados:
+            return "Nenhuma execução registrada em " + str(caminho)
+        return '\n\n'.join(relatorio_desempenho(execucoes, caminho, m) for m in encontrados)
+
+    dados = historico(execucoes, caminho, modo)
+    if not dados:
+        return f"Nenhuma execução do modo '{modo}' registrada em {caminho}"
+
+    meio = len(dados) // 2
+    sucessos = sum(e['sucesso'] for e in dados)
+    linhas = [
+        f"Modo {modo}: últimas {len(dados)} execuções ({dados[0]['inicio']} a {dados[-1]['inicio']}), "
+        f"{sucessos} com sucesso, {len(dados) - sucessos} com falha",
+        '',
+        f"{'Etapa / métrica':<32} {'p50':>10} {'p95':>10} {'p50 antes':>10} {'p50 agora':>10}",
+    ]
+
+    def linha(nome, valores_por_execucao, unidade):
+        antes = [v for v in valores_por_execucao[:meio] if v is not None]
+        depois = [v for v in valores_por_execucao[meio:] if v is not None]
+        todos = antes + depois
+        if not todos:
+            return
+        linhas.append(
+            f"{nome[:32]:<32} {_formatar(_percentil(todos, 50), unidade):>10} "
+            f"{_formatar(_percentil(todos, 95), unidade):>10} "
+            f"{_formatar(_percentil(antes, 50), unidade):>10} "
+            f"{_formatar(_percentil(depois, 50), unidade):>10}"
+        )
+
+    etapas = []
+    for execucao in dados:
+        etapas.extend(e for e in execucao['etapas'] if e not in etapas)
+    for etapa in etapas:
+        linha(etapa, [e['etapas'].get(etapa) for e in dados], 's')
+    linhas.append('')
+    for coluna, descricao, unidade in METRICAS:
+        linha(descricao, [e[coluna] for e in dados], unidade)
+
+    encontradas = regressoes(historico_execucoes=dados)
+    linhas.append('')
+    if encontradas:
+        linhas.append(f"⚠️ Regressões (p50 recente > {FATOR_REGRESSAO}x o anterior):")
+        linhas.extend('   ' + descrever_regressao(r) for r in encontradas)
+    else:
+        linhas.append("✅ Nenhuma regressão de tempo nas últimas execuções")
+    return '\n'.join(linhas)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tendências de desempenho da automação diária")
+    parser.add_argument('--execucoes', type=int, default=EXECUCOES_PADRAO, help="Quantas execuções analisar")
+    parser.add_argument('--banco', default=str(METRICAS_PATH), help="Histórico de métricas")
+    parser.add_argument('--modo', help="Só as execuções deste modo (padrão: uma seção por modo)")
+    args = parser.parse_args()
+    print(relatorio_desempenho(args.execucoes, args.banco, args.modo))
@@ -0,0 +1,451 @@
+"""
+Migrações versionadas do banco de dados (data/db.sqlite)
+
+A versão do schema fica em PRAGMA user_version. Cada migração é aplicada
+uma única vez, em ordem, e a troca de versão acontece na mesma transação
+que as alterações: quem abre o banco vê a versão antiga inteira ou a nova
+inteira, nunca um estado intermediário.
+
+Migrações que precisam copiar/recalcular muitos registros têm uma etapa
+de backfill em lotes (commit a cada lote, sem travar os leitores) que roda
+antes da transação final. O backfill é idempotente: se o processo cair no
+meio, a próxima execução continua de onde parou.
+
+Para evoluir o schema basta acrescentar uma entrada em MIGRACOES.
+"""
+
+import logging
+import sqlite3
+from datetime import datetime
+
+# Tamanho padrão dos lotes de backfill
+TAMANHO_LOTE = 5000
+
+def versao_schema(conn):
+    """Retorna a versão atual do schema (PRAGMA user_version)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def carimbar_versao_dados(cursor):
+    """
+    Marca uma nova versão dos dados (tabela meta) na transação da carga
+
+    O app compara o carimbo para trocar a conexão e os caches sem reiniciar.
+    """
+    cursor.execute(
+        "INSERT OR REPLACE INTO meta (chave, valor) VALUES ('versao_dados', ?)",
+        (datetime.now().isoformat(timespec='microseconds'),)
+    )
+
+def versao_dados(conn):
+    """Carimbo da última carga gravada (None em banco sem a tabela meta)"""
+    try:
+        linha = conn.execute("SELECT valor FROM meta WHERE chave = 'versao_dados'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return linha[0] if linha else None
+
+def colunas_tabela(conn, tabela):
+    """Retorna {nome_coluna: tipo_declarado} da tabela"""
+    return {linha[1]: linha[2].upper() for linha in conn.execute(f'PRAGMA table_info({tabela})')}
+
+def adicionar_coluna(conn, tabela, coluna, definicao):
+    """ALTER TABLE ADD COLUMN apenas se a coluna ainda não existir"""
+    if coluna not in colunas_tabela(conn, tabela):
+        conn.execute(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}')
+
+def backfill_em_lotes(conn, sql, tabela, lote=TAMANHO_LOTE, inicio=0):
+    """
+    Executa um UPDATE/INSERT ... SELECT em faixas de id, com commit por lote
+
+    O SQL recebe dois parâmetros (id_inicial, id_final] e deve filtrar por
+    "id > ? AND id <= ?". Retorna o total de linhas afetadas.
+    """
+    maximo = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabela}').fetchone()[0]
+    afetadas = 0
+    while inicio < maximo:
+        fim = inicio + lote
+        conn.execute('BEGIN IMMEDIATE')
+        afetadas += conn.execute(sql, (inicio, fim)).rowcount
+        conn.execute('COMMIT')
+        inicio = fim
+    return afetadas
+
+# ---------------------------------------------------------------------------
+# Migrações
+# ---------------------------------------------------------------------------
+
+SQL_TABELA_VENDAS = '''
+    CREATE TABLE IF NOT EXISTS {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        loja TEXT,
+        data_emissao TEXT,
+        numero_nf INTEGER,
+        serie TEXT,
+        nome_cliente TEXT,
+        total_venda REAL,
+        nome_vendedor TEXT,
+        identificacao TEXT,
+        placa TEXT,
+        km INTEGER,
+        km_suspeito INTEGER DEFAULT 0,
+        status TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def _m001_tabela_vendas(conn):
+    """Tabela vendas na estrutura original (bancos criados antes das migrações)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vendas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_emissao TEXT,
+            numero_nf INTEGER,
+            serie TEXT,
+            nome_cliente TEXT,
+            total_venda REAL,
+            nome_vendedor TEXT,
+            identificacao TEXT,
+            placa TEXT,
+            km TEXT,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _m002_loja(conn):
+    """Coluna loja, índices por loja e chave única da venda"""
+    adicionar_coluna(conn, 'vendas', 'loja', 'TEXT')
+
+    # Duplicatas antigas impediriam o índice único: fica a mais recente
+    conn.execute('''
+        DELETE FROM vendas
+        WHERE numero_nf IS NOT NULL
+          AND id NOT IN (
+              SELECT MAX(id) FROM vendas
+              GROUP BY loja, serie, numero_nf, data_emissao
+          )
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_placa')
+    _criar_indices_vendas(conn)
+
+def _criar_indices_vendas(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_placa ON vendas(placa, data_emissao)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vendas_loja_placa
+        ON vendas(loja, placa, data_emissao)
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_vendas_chave
+        ON vendas(loja, serie, numero_nf, data_emissao)
+    ''')
+    if 'km_suspeito' in colunas_tabela(conn, 'vendas'):
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_vendas_km_suspeito
+            ON vendas(km_suspeito) WHERE km_suspeito = 1
+        ''')
+
+def _km_precisa_reconstruir(conn):
+    return colunas_tabela(conn, 'vendas').get('km') != 'INTEGER'
+
+SQL_COPIA_VENDAS_V3 = '''
+    INSERT INTO vendas_v3 (
+        id, loja, data_emissao, numero_nf, serie, nome_cliente, total_venda,
+        nome_vendedor, identificacao, placa, km, status, created_at
+    )
+    SELECT
+        id, loja, data_emissao, numero_nf, serie, nome_cliente, total_venda,
+        nome_vendedor, identificacao, placa,
+        CASE WHEN TRIM(COALESCE(km, '')) = '' THEN NULL ELSE CAST(km AS INTEGER) END,
+        status, created_at
+    FROM vendas
+    WHERE {filtro}
+'''
+
+# Vendas alteradas ou removidas durante a cópia (recopiadas na etapa atômica)
+SQL_VENDAS_V3_ALTERADAS = 'CREATE TABLE IF NOT EXISTS vendas_v3_alteradas (id INTEGER PRIMARY KEY)'
+
+def _m003_km_inteiro_backfill(conn, lote):
+    """
+    Copia vendas para vendas_v3 (km INTEGER) em lotes e recalcula km_suspeito
+
+    SQLite não troca o tipo de uma coluna: a tabela é reconstruída ao lado
+    (o app continua lendo a antiga) e trocada na etapa atômica.
+    """
+    if not _km_precisa_reconstruir(conn):
+        return
+
+    conn.execute(SQL_TABELA_VENDAS.format(tabela='vendas_v3'))
+    # Escritas na tabela antiga durante a cópia (o app e a carga seguem
+    # gravando): os triggers anotam o id para a etapa atômica recopiar
+    conn.execute(SQL_VENDAS_V3_ALTERADAS)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_vendas_v3_update AFTER UPDATE ON vendas
+        BEGIN
+            INSERT OR IGNORE INTO vendas_v3_alteradas VALUES (OLD.id);
+            INSERT OR IGNORE INTO vendas_v3_alteradas VALUES (NEW.id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_vendas_v3_delete AFTER DELETE ON vendas
+        BEGIN
+            INSERT OR IGNORE INTO vendas_v3_alteradas VALUES (OLD.id);
+        END
+    ''')
+    copiado_ate = conn.execute('SELECT COALESCE(MAX(id), 0) FROM vendas_v3').fetchone()[0]
+    copiadas = backfill_em_lotes(conn, SQL_COPIA_VENDAS_V3.format(filtro='id > ? AND id <= ?'),
+                                 'vendas', lote=lote, inicio=copiado_ate)
+    logging.info(f"[INFO] Migração 3: {copiadas} registros copiados para vendas_v3")
+
+    _recalcular_km_suspeito(conn, 'vendas_v3', lote)
+
+def _recalcular_km_suspeito(conn, tabela, lote):
+    import pandas as pd
+    from normalizacao import marcar_km_suspeito
+
+    df = pd.read_sql_query(f'SELECT id, placa, data_emissao, km FROM {tabela}', conn)
+    marcar_km_suspeito(df)
+    suspeitos = df.loc[df['km_suspeito'] == 1, 'id'].tolist()
+    for i in range(0, len(suspeitos), lote):
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            f'UPDATE {tabela} SET km_suspeito = 1 WHERE id = ?',
+            [(id_venda,) for id_venda in suspeitos[i:i + lote]]
+        )
+        conn.execute('COMMIT')
+    logging.info(f"[INFO] Migração 3: {len(suspeitos)} leituras de KM marcadas como suspeitas")
+
+def _m003_km_inteiro(conn):
+    """
+    Troca vendas por vendas_v3 (ou só acrescenta km_suspeito)
+
+    Dentro da transação (BEGIN IMMEDIATE, sem outros escritores) recopia as
+    vendas gravadas depois do backfill e as alteradas ou removidas durante
+    ele, e refaz km_suspeito das placas dessas vendas.
+    """
+    if _km_precisa_reconstruir(conn):
+        from carga_incremental import recalcular_km_suspeito
+
+        conn.execute(SQL_VENDAS_V3_ALTERADAS)
+        copiado_ate = conn.execute('SELECT COALESCE(MAX(id), 0) FROM vendas_v3').fetchone()[0]
+        recopiar = 'id > ? OR id IN (SELECT id FROM vendas_v3_alteradas)'
+        conn.execute('DELETE FROM vendas_v3 WHERE id IN (SELECT id FROM vendas_v3_alteradas)')
+        recopiadas = conn.execute(SQL_COPIA_VENDAS_V3.format(filtro=recopiar), (copiado_ate,)).rowcount
+        placas = [linha[0] for linha in conn.execute(
+            f'SELECT DISTINCT placa FROM vendas_v3 WHERE placa IS NOT NULL AND ({recopiar})', (copiado_ate,)
+        )]
+        conn.execute('DROP TABLE vendas')
+        conn.execute('DROP TABLE vendas_v3_alteradas')
+        conn.execute('ALTER TABLE vendas_v3 RENAME TO vendas')
+        recalcular_km_suspeito(conn.cursor(), placas)
+        logging.info(f"[INFO] Migração 3: {recopiadas} registros gravados durante a cópia recopiados")
+    else:
+        adicionar_coluna(conn, 'vendas', 'km_suspeito', 'INTEGER DEFAULT 0')
+    _criar_indices_vendas(conn)
+
+def _m004_resumo_placa(conn):
+    """Resumo por placa e mês das vendas arquivadas em Parquet (data/arquivo)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_placa (
+            placa TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            vendas INTEGER NOT NULL,
+            primeira_data TEXT,
+            ultima_data TEXT,
+            ultimo_km INTEGER,
+            PRIMARY KEY (placa, mes)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_resumo_placa_mes ON resumo_placa(mes)')
+
+SQL_TABELA_VENDA_PLACA = '''
+    CREATE TABLE IF NOT EXISTS venda_placa (
+        placa TEXT NOT NULL,
+        venda_id INTEGER NOT NULL,
+        km INTEGER,
+        PRIMARY KEY (placa, venda_id)
+    ) WITHOUT ROWID
+'''
+
+def _m005_venda_placa_backfill(conn, lote):
+    """Vincula as vendas já gravadas à placa principal (a observação não fica no banco)"""
+    conn.execute(SQL_TABELA_VENDA_PLACA)
+    vinculado_ate = conn.execute('SELECT COALESCE(MAX(venda_id), 0) FROM venda_placa').fetchone()[0]
+    vinculadas = backfill_em_lotes(conn, '''
+        INSERT OR IGNORE INTO venda_placa (placa, venda_id, km)
+        SELECT placa, id, km FROM vendas
+        WHERE placa IS NOT NULL AND id > ? AND id <= ?
+    ''', 'vendas', lote=lote, inicio=vinculado_ate)
+    logging.info(f"[INFO] Migração 5: {vinculadas} vínculos placa/venda criados")
+
+def _m005_venda_placa(conn):
+    """
+    Tabela de vínculo placa <-> venda (uma venda pode citar várias placas)
+
+    A chave (placa, venda_id) numa tabela WITHOUT ROWID é o próprio índice
+    de busca por placa e já cobre o km. Os vínculos acompanham a exclusão
+    da venda por trigger.
+    """
+    conn.execute(SQL_TABELA_VENDA_PLACA)
+    # Vendas gravadas depois do backfill
+    conn.execute('''
+        INSERT OR IGNORE INTO venda_placa (placa, venda_id, km)
+        SELECT placa, id, km FROM vendas
+        WHERE placa IS NOT NULL
+          AND id > (SELECT COALESCE(MAX(venda_id), 0) FROM venda_placa)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_venda_placa_venda ON venda_placa(venda_id)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_vendas_remove_placas
+        AFTER DELETE ON vendas
+        BEGIN
+            DELETE FROM venda_placa WHERE venda_id = OLD.id;
+        END
+    ''')
+
+def _m006_marca_carga(conn):
+    """
+    Marca d'água por loja (carga incremental) e série sem nulos
+
+    O upsert usa ON CONFLICT na chave (loja, serie, numero_nf, data_emissao)
+    e nulos nunca conflitam no índice único: série vazia passa a ser ''.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS marca_carga (
+            loja TEXT PRIMARY KEY,
+            ultima_data TEXT NOT NULL,
+            ultimo_numero_nf INTEGER,
+            atualizado_em TEXT NOT NULL
+        )
+    ''')
+    # Se a mesma venda já existe com série '', fica a gravada por último
+    conn.execute('''
+        DELETE FROM vendas
+        WHERE serie IS NULL
+          AND EXISTS (
+              SELECT 1 FROM vendas v
+              WHERE v.serie = '' AND v.loja IS vendas.loja
+                AND v.numero_nf = vendas.numero_nf AND v.data_emissao = vendas.data_emissao
+          )
+    ''')
+    conn.execute("UPDATE vendas SET serie = '' WHERE serie IS NULL")
+    conn.execute('''
+        INSERT OR IGNORE INTO marca_carga (loja, ultima_data, ultimo_numero_nf, atualizado_em)
+        SELECT loja, MAX(data_emissao), NULL, datetime('now', 'localtime')
+        FROM vendas
+        WHERE loja IS NOT NULL AND data_emissao IS NOT NULL
+        GROUP BY loja
+    ''')
+
+def _m007_backfill_janela(conn):
+    """Checkpoint da carga histórica (backfill_historico.py): uma linha por loja e mês"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_janela (
+            loja TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            linhas INTEGER NOT NULL,
+            segundos REAL NOT NULL,
+            concluido_em TEXT NOT NULL,
+            PRIMARY KEY (loja, mes)
+        ) WITHOUT ROWID
+    ''')
+
+def _m008_staging_ingerido(conn):
+    """Arquivos de staging já gravados no banco (pulados pela loja + sha256 na próxima carga)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS staging_ingerido (
+            loja TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            arquivo TEXT NOT NULL,
+            linhas INTEGER NOT NULL,
+            ingerido_em TEXT NOT NULL,
+            PRIMARY KEY (loja, sha256)
+        ) WITHOUT ROWID
+    ''')
+
+def _m009_meta(conn):
+    """Chave/valor com o carimbo da versão dos dados (recarga a quente no app)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    carimbar_versao_dados(conn)
+
+def _m010_staging_contagens(conn):
+    """Registros lidos e rejeitados de cada arquivo de staging (métricas da execução)"""
+    adicionar_coluna(conn, 'staging_ingerido', 'lidas', 'INTEGER NOT NULL DEFAULT 0')
+    adicionar_coluna(conn, 'staging_ingerido', 'rejeitadas', 'INTEGER NOT NULL DEFAULT 0')
+
+SQL_LOJA_VINCULOS = '''
+    UPDATE venda_placa
+    SET loja = (SELECT v.loja FROM vendas v WHERE v.id = venda_placa.venda_id)
+    WHERE loja IS NULL
+'''
+
+def _m011_venda_placa_loja_backfill(conn, lote):
+    """Copia a loja da venda para os vínculos já gravados, em faixas de venda_id"""
+    adicionar_coluna(conn, 'venda_placa', 'loja', 'TEXT')
+    preenchidos = backfill_em_lotes(conn, SQL_LOJA_VINCULOS + ' AND venda_id > ? AND venda_id <= ?',
+                                    'vendas', lote=lote)
+    logging.info(f"[INFO] Migração 11: loja preenchida em {preenchidos} vínculos placa/venda")
+
+def _m011_venda_placa_loja(conn):
+    """
+    Loja no vínculo placa/venda: a busca por placa filtrada por loja usa o
+    índice (loja, placa) de venda_placa em vez de filtrar cada venda encontrada
+    """
+    adicionar_coluna(conn, 'venda_placa', 'loja', 'TEXT')
+    # Vínculos gravados depois do backfill
+    conn.execute(SQL_LOJA_VINCULOS)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_venda_placa_loja ON venda_placa(loja, placa)')
+
+# (versão, descrição, etapa atômica, backfill em lotes opcional)
+MIGRACOES = [
+    (1, "Tabela vendas", _m001_tabela_vendas, None),
+    (2, "Coluna loja e índices por loja", _m002_loja, None),
+    (3, "KM inteiro e km_suspeito", _m003_km_inteiro, _m003_km_inteiro_backfill),
+    (4, "Resumo por placa do histórico arquivado", _m004_resumo_placa, None),
+    (5, "Vínculo placa/venda (várias placas por venda)", _m005_venda_placa, _m005_venda_placa_backfill),
+    (6, "Marca d'água da carga incremental", _m006_marca_carga, None),
+    (7, "Checkpoint da carga histórica", _m007_backfill_janela, None),
+    (8, "Arquivos de staging já ingeridos", _m008_staging_ingerido, None),
+    (9, "Carimbo da versão dos dados", _m009_meta, None),
+    (10, "Registros lidos e rejeitados por arquivo de staging", _m010_staging_contagens, None),
+    (11, "Loja no vínculo placa/venda", _m011_venda_placa_loja, _m011_venda_placa_loja_backfill),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+def aplicar_migracoes(caminho_db, lote=TAMANHO_LOTE):
+    """
+    Leva o banco até VERSAO_ATUAL aplicando as migrações pendentes
+
+    Returns:
+        int: versão do schema após as migrações
+    """
+    conn = sqlite3.connect(caminho_db, isolation_level=None)
+    try:
+        versao = versao_schema(conn)
+        for numero, descricao, aplicar, backfill in MIGRACOES:
+            if numero <= versao:
+                continue
+
+            logging.info(f"[INFO] Aplicando migração {numero}: {descricao}")
+            if backfill:
+                backfill(conn, lote)
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                aplicar(conn)
+                conn.execute(f'PRAGMA user_version = {numero}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            versao = numero
+            logging.info(f"[OK] Migração {numero} aplicada")
+
+        return versao
+    finally:
+        conn.close()
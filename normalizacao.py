@@ -0,0 +1,126 @@
+"""
+Normalização e deduplicação das vendas extraídas (Lubrimax + ADJ)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Lojas cujos relatórios são extraídos do iAdmin
+LOJAS = ('LUBRIMAX', 'ADJ')
+
+# Identidade de uma venda: loja de origem + série + número + data de emissão
+COLUNAS_CHAVE_VENDA = ['loja', 'serie', 'numero_nf', 'data_emissao']
+
+def normalizar_chave_venda(df):
+    """
+    Normaliza as colunas que identificam uma venda (in-place)
+
+    - loja e série: sem espaços nas pontas e em maiúsculas (série vazia
+      vira '' para que a chave única não tenha nulos)
+    - numero_nf: inteiro (Int64, aceita vazios)
+    - data_emissao: texto sem espaços nas pontas
+
+    Returns:
+        DataFrame: o próprio df, com as colunas da chave normalizadas
+    """
+    for coluna in COLUNAS_CHAVE_VENDA:
+        if coluna not in df.columns:
+            df[coluna] = None
+
+    df['loja'] = df['loja'].astype('string').str.strip().str.upper()
+    df['serie'] = df['serie'].astype('string').str.strip().str.upper().fillna('')
+    df['numero_nf'] = pd.to_numeric(df['numero_nf'], errors='coerce').astype('Int64')
+    df['data_emissao'] = df['data_emissao'].astype('string').str.strip()
+    return df
+
+def remover_duplicatas(df):
+    """
+    Remove vendas repetidas (re-execuções e janelas de datas sobrepostas)
+
+    A chave é reduzida a um hash de 64 bits por linha e o drop_duplicates
+    é feito sobre esse hash, então o custo é O(n) mesmo com histórico grande.
+    Mantém a última ocorrência (extração mais recente, status mais atual).
+    Linhas sem numero_nf não têm identidade e nunca são descartadas.
+
+    Returns:
+        tuple: (df_sem_duplicatas, quantidade_removida)
+    """
+    if df is None or len(df) == 0:
+        return df, 0
+
+    normalizar_chave_venda(df)
+
+    hashes = pd.util.hash_pandas_object(df[COLUNAS_CHAVE_VENDA], index=False)
+    duplicadas = hashes.duplicated(keep='last') & df['numero_nf'].notna()
+
+    removidas = int(duplicadas.sum())
+    return df[~duplicadas.to_numpy()].reset_index(drop=True), removidas
+
+def linhas_para_sql(df, colunas):
+    """
+    Converte as colunas do DataFrame em tuplas aceitas pelo sqlite3
+    (NaN/NA viram None e inteiros numpy viram int do Python)
+    """
+    dados = df[colunas].astype(object)
+    dados = dados.where(dados.notna(), None)
+    for linha in dados.itertuples(index=False, name=None):
+        yield tuple(
+            valor.item() if hasattr(valor, 'item') else valor
+            for valor in linha
+        )
+
+# Limites de plausibilidade do hodômetro
+KM_MAXIMO = 1_000_000       # acima disso é erro de digitação (ex: "KM 1207403")
+KM_SALTO_MINIMO = 50_000    # salto tolerado entre duas visitas próximas
+KM_POR_DIA_MAXIMO = 1_500   # rodagem diária máxima plausível
+
+def converter_km(df):
+    """Converte a coluna km (texto extraído da observação) para inteiro (Int64)"""
+    df['km'] = pd.to_numeric(df['km'], errors='coerce').astype('Int64')
+    return df
+
+def marcar_km_suspeito(df):
+    """
+    Marca em km_suspeito (0/1) as leituras de hodômetro implausíveis
+
+    Passo vetorizado: ordena por placa e data e calcula np.diff do KM
+    dentro de cada placa. É suspeita a leitura que:
+    - passa de KM_MAXIMO;
+    - é menor que a leitura anterior do mesmo veículo (hodômetro "voltou");
+    - salta mais que max(KM_SALTO_MINIMO, KM_POR_DIA_MAXIMO * dias) desde a anterior.
+
+    Returns:
+        DataFrame: o próprio df, com a coluna km_suspeito preenchida
+    """
+    df['km_suspeito'] = 0
+    if len(df) == 0:
+        return df
+
+    km = pd.to_numeric(df['km'], errors='coerce')
+    absurdo = (km > KM_MAXIMO).fillna(False).to_numpy(dtype=bool)
+    df.loc[absurdo, 'km_suspeito'] = 1
+
+    # Sequência por veículo, só com leituras válidas e plausíveis
+    validos = km.notna().to_numpy(dtype=bool) & ~absurdo & df['placa'].notna().to_numpy(dtype=bool)
+    seq = pd.DataFrame({
+        'placa': df['placa'].to_numpy()[validos],
+        'data': pd.to_datetime(df['data_emissao'].to_numpy()[validos], errors='coerce'),
+        'km': km.to_numpy()[validos].astype('float64'),
+    }, index=df.index[validos])
+    if len(seq) < 2:
+        return df
+    seq = seq.sort_values(['placa', 'data', 'km'], kind='mergesort')
+
+    placas = seq['placa'].to_numpy()
+    kms = seq['km'].to_numpy()
+    datas = seq['data'].to_numpy().astype('datetime64[s]')
+    dias = np.where(np.isnat(datas), np.nan, datas.astype('int64') / 86400)
+
+    mesma_placa = np.r_[False, placas[1:] == placas[:-1]]
+    delta_km = np.diff(kms, prepend=np.nan)
+    delta_dias = np.nan_to_num(np.diff(dias, prepend=np.nan), nan=0.0)
+    salto_maximo = np.maximum(KM_SALTO_MINIMO, KM_POR_DIA_MAXIMO * delta_dias)
+
+    suspeito = mesma_placa & ((delta_km < 0) | (delta_km > salto_maximo))
+    df.loc[seq.index[suspeito], 'km_suspeito'] = 1
+    return df
@@ -0,0 +1,308 @@
+"""
+Execução de etapas por grafo de dependências (usado pelo automacao_completa.py)
+
+Cada etapa declara o que consome (entradas) e o que produz (saídas); uma
+etapa começa assim que todas as etapas que produzem as suas entradas
+terminam com sucesso, e etapas independentes rodam ao mesmo tempo.
+
+A etapa falha se levantar exceção ou retornar False. As etapas que dependem
+dela (direta ou indiretamente) são puladas; as demais continuam. Etapas
+opcionais (obrigatoria=False) não fazem a execução falhar.
+
+No fim sai o tempo de cada etapa e o caminho crítico: a cadeia de
+dependências que determinou a duração total (cada etapa da cadeia esperou a
+anterior). Encurtar uma etapa fora dele não adianta a execução.
+
+A função da etapa pode ser um callable ou 'modulo:funcao'. Nesse caso ela roda
+no próprio processo (o módulo é importado uma vez e fica carregado para as
+próximas etapas e execuções) ou, com isolada=True, num interpretador novo:
+para etapas que precisam de processo próprio (ex.: extração pela tela, que
+usa o desktop e pode travar). A sobrecarga de cada etapa (importação no
+processo; início do interpretador + importações + retorno do resultado na
+isolada) sai no relatório.
+
+Exemplo:
+    pipeline = Pipeline('diaria')
+    pipeline.adicionar('download', baixar, saidas=['staging'])
+    pipeline.adicionar('ingestao', ingerir, entradas=['staging'], saidas=['banco'])
+    pipeline.adicionar('backup', fazer_backup, entradas=['banco'])
+    pipeline.adicionar('validacao', validar, entradas=['banco'], saidas=['banco_ok'])
+    pipeline.adicionar('extracao', 'download_relatorio:main', argumentos={'banco': False}, isolada=True)
+    sucesso = pipeline.executar()
+"""
+
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+# Limite das etapas isoladas (segundos). A extração pela tela das duas lojas
+# passa fácil de 5 min quando o portal está lento (cada espera vai até 60s)
+TIMEOUT_ISOLADA = int(os.environ.get('LUBRIMAX_TIMEOUT_ISOLADA', 1800))
+# Última linha do interpretador da etapa isolada: resultado e tempos medidos lá dentro
+MARCADOR_RESULTADO = '@@etapa@@ '
+
+_EXECUTOR_ISOLADO = f'''
+import importlib, json, logging, sys, time
+inicio = time.perf_counter()
+funcao = getattr(importlib.import_module(sys.argv[1]), sys.argv[2])
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+importado = time.perf_counter()
+resultado = funcao(**json.loads(sys.argv[3]))
+fim = time.perf_counter()
+print({MARCADOR_RESULTADO!r} + json.dumps({{
+    'ok': resultado is not False, 'importacao': importado - inicio, 'execucao': fim - importado}}), flush=True)
+'''
+
+class Etapa:
+    """Etapa do pipeline e o resultado da sua execução"""
+
+    def __init__(self, nome, funcao, entradas=(), saidas=(), obrigatoria=True, isolada=False,
+                 argumentos=None):
+        if isolada and not isinstance(funcao, str):
+            raise ValueError(f"Etapa {nome}: isolada=True exige a função como 'modulo:funcao'")
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.saidas = list(saidas)
+        self.obrigatoria = obrigatoria
+        self.isolada = isolada
+        self.argumentos = dict(argumentos or {})
+        self.dependencias = []
+        self.status = 'pendente'   # pendente, executando, ok, falhou, pulada
+        self.erro = None
+        self.inicio = None
+        self.fim = None
+        self.sobrecarga = None     # segundos fora da função: importação / início do interpretador
+
+    def chamar(self):
+        """Executa a função da etapa (no processo ou isolada) e mede a sobrecarga"""
+        if not isinstance(self.funcao, str):
+            return self.funcao(**self.argumentos)
+        modulo, funcao = self.funcao.split(':')
+        if self.isolada:
+            return self._chamar_isolada(modulo, funcao)
+        inicio = time.perf_counter()
+        alvo = getattr(importlib.import_module(modulo), funcao)
+        self.sobrecarga = time.perf_counter() - inicio
+        return alvo(**self.argumentos)
+
+    def _chamar_isolada(self, modulo, funcao):
+        inicio = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, '-c', _EXECUTOR_ISOLADO, modulo, funcao, json.dumps(self.argumentos)],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8',
+            errors='replace', env={**os.environ, 'PYTHONIOENCODING': 'utf-8'},
+            timeout=TIMEOUT_ISOLADA,
+        )
+        total = time.perf_counter() - inicio
+        saida, resultado = [], None
+        for linha in processo.stdout.splitlines():
+            if linha.startswith(MARCADOR_RESULTADO):
+                resultado = json.loads(linha[len(MARCADOR_RESULTADO):])
+            else:
+                saida.append(linha)
+        if saida:
+            logging.info(f"[{self.nome}] Output:\n" + '\n'.join(saida))
+        if resultado is None:
+            self.sobrecarga = None
+            raise RuntimeError(f"processo isolado terminou sem resultado (código {processo.returncode})")
+        self.sobrecarga = total - resultado['execucao']
+        return resultado['ok'] and processo.returncode == 0
+
+    @property
+    def duracao(self):
+        if self.inicio is None or self.fim is None:
+            return None
+        return self.fim - self.inicio
+
+    def como_dict(self):
+        return {
+            'nome': self.nome,
+            'dependencias': self.dependencias,
+            'status': self.status,
+            'obrigatoria': self.obrigatoria,
+            'isolada': self.isolada,
+            'inicio': None if self.inicio is None else round(self.inicio, 3),
+            'duracao': None if self.duracao is None else round(self.duracao, 3),
+            'sobrecarga': None if self.sobrecarga is None else round(self.sobrecarga, 3),
+            'erro': self.erro,
+        }
+
+class Pipeline:
+    """Grafo de etapas executado com um pool de threads"""
+
+    def __init__(self, nome, workers=4):
+        self.nome = nome
+        self.workers = workers
+        self.etapas = {}
+        self.execucao = None
+        self.duracao = None
+
+    def adicionar(self, nome, funcao, entradas=(), saidas=(), obrigatoria=True, isolada=False,
+                  argumentos=None):
+        if nome in self.etapas:
+            raise ValueError(f"Etapa duplicada: {nome}")
+        self.etapas[nome] = Etapa(nome, funcao, entradas, saidas, obrigatoria, isolada, argumentos)
+        return self.etapas[nome]
+
+    def _resolver_dependencias(self):
+        """Liga cada entrada à etapa que a produz e recusa ciclos"""
+        produtores = {}
+        for etapa in self.etapas.values():
+            for saida in etapa.saidas:
+                if saida in produtores:
+                    raise ValueError(f"'{saida}' produzido por {produtores[saida]} e {etapa.nome}")
+                produtores[saida] = etapa.nome
+        for etapa in self.etapas.values():
+            faltando = [e for e in etapa.entradas if e not in produtores]
+            if faltando:
+                raise ValueError(f"Etapa {etapa.nome}: nenhuma etapa produz {faltando}")
+            etapa.dependencias = sorted({produtores[e] for e in etapa.entradas})
+
+        # Ordenação topológica só para detectar ciclo
+        restantes = {nome: set(e.dependencias) for nome, e in self.etapas.items()}
+        while restantes:
+            livres = [nome for nome, deps in restantes.items() if not deps]
+            if not livres:
+                raise ValueError(f"Ciclo entre as etapas: {sorted(restantes)}")
+            for nome in livres:
+                del restantes[nome]
+            for deps in restantes.values():
+                deps.difference_update(livres)
+
+    def _rodar(self, etapa, relogio):
+        threading.current_thread().name = f'etapa-{etapa.nome}'
+        etapa.inicio = time.monotonic() - relogio
+        logging.info(f"[ETAPA] ▶️  {etapa.nome}")
+        try:
+            resultado = etapa.chamar()
+            if resultado is False:
+                etapa.status = 'falhou'
+                etapa.erro = 'retornou False'
+            else:
+                etapa.status = 'ok'
+        except Exception as e:
+            etapa.status = 'falhou'
+            etapa.erro = f'{type(e).__name__}: {e}'
+            logging.error(f"[ERRO] Etapa {etapa.nome}: {etapa.erro}")
+        finally:
+            etapa.fim = time.monotonic() - relogio
+        icone = '✅' if etapa.status == 'ok' else '❌'
+        logging.info(f"[ETAPA] {icone} {etapa.nome} ({etapa.duracao:.2f}s)")
+
+    def executar(self):
+        """
+        Executa todas as etapas respeitando as dependências
+
+        Returns:
+            bool: True se todas as etapas obrigatórias terminaram com sucesso
+        """
+        self._resolver_dependencias()
+        self.execucao = datetime.now()
+        relogio = time.monotonic()
+        em_andamento = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                for etapa in self.etapas.values():
+                    if etapa.status != 'pendente':
+                        continue
+                    deps = [self.etapas[d] for d in etapa.dependencias]
+                    if any(d.status in ('falhou', 'pulada') for d in deps):
+                        etapa.status = 'pulada'
+                        etapa.erro = 'dependência não concluída: ' + ', '.join(
+                            d.nome for d in deps if d.status != 'ok')
+                        logging.warning(f"[ETAPA] ⏭️  {etapa.nome} pulada ({etapa.erro})")
+                    elif all(d.status == 'ok' for d in deps):
+                        etapa.status = 'executando'
+                        em_andamento[executor.submit(self._rodar, etapa, relogio)] = etapa
+                if not em_andamento:
+                    # Uma etapa pulada pode liberar outras para pular; repete até estabilizar
+                    if any(e.status == 'pendente' for e in self.etapas.values()):
+                        continue
+                    break
+                concluidas, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                for futuro in concluidas:
+                    del em_andamento[futuro]
+
+        self.duracao = time.monotonic() - relogio
+        return self.sucesso
+
+    @property
+    def sucesso(self):
+        return all(e.status == 'ok' for e in self.etapas.values() if e.obrigatoria)
+
+    @property
+    def sobrecarga(self):
+        """Soma da sobrecarga das etapas 'modulo:funcao' (None se nenhuma mediu)"""
+        medidas = [e.sobrecarga for e in self.etapas.values() if e.sobrecarga is not None]
+        return sum(medidas) if medidas else None
+
+    def caminho_critico(self):
+        """
+        Cadeia de etapas que determinou a duração da execução: parte da etapa
+        que terminou por último e volta sempre pela dependência que terminou
+        por último (a que ela esperou)
+        """
+        executadas = [e for e in self.etapas.values() if e.fim is not None]
+        if not executadas:
+            return []
+        atual = max(executadas, key=lambda e: e.fim)
+        caminho = [atual]
+        while True:
+            deps = [self.etapas[d] for d in atual.dependencias if self.etapas[d].fim is not None]
+            if not deps:
+                break
+            atual = max(deps, key=lambda e: e.fim)
+            caminho.append(atual)
+        return list(reversed(caminho))
+
+    def relatorio(self):
+        """Tempos por etapa e caminho crítico (texto para o log)"""
+        critico = [e.nome for e in self.caminho_critico()]
+        linhas = [f"{'Etapa':<32} {'Status':<8} {'Início':>8} {'Duração':>9} {'Sobrec.':>8}  Depende de"]
+        ordem = sorted(self.etapas.values(), key=lambda e: (e.inicio is None, e.inicio or 0))
+        for e in ordem:
+            marca = '*' if e.nome in critico else ' '
+            inicio = f'{e.inicio:>7.1f}s' if e.inicio is not None else f"{'-':>8}"
+            duracao = f'{e.duracao:>8.1f}s' if e.duracao is not None else f"{'-':>9}"
+            sobrecarga = f'{e.sobrecarga:>7.2f}s' if e.sobrecarga is not None else f"{'-':>8}"
+            linhas.append(f"{marca}{e.nome[:31]:<31} {e.status:<8} {inicio} {duracao} {sobrecarga}  "
+                          f"{', '.join(e.dependencias) or '-'}")
+        soma = sum(e.duracao or 0 for e in self.etapas.values())
+        linhas.append('')
+        linhas.append(f"Caminho crítico (*): {' -> '.join(critico) or '-'}")
+        linhas.append(f"Duração total {self.duracao:.1f}s | soma das etapas {soma:.1f}s "
+                      f"(ganho do paralelismo {soma - self.duracao:.1f}s)")
+        if self.sobrecarga is not None:
+            isoladas = [e.nome for e in self.etapas.values() if e.isolada]
+            linhas.append(f"Sobrecarga de início/importação {self.sobrecarga:.2f}s "
+                          f"(isoladas: {', '.join(isoladas) or 'nenhuma'})")
+        return '\n'.join(linhas)
+
+    def salvar(self, pasta):
+        """Grava tempos e caminho crítico em <pasta>/pipeline_<execucao>.json"""
+        pasta = Path(pasta)
+        pasta.mkdir(parents=True, exist_ok=True)
+        dados = {
+            'pipeline': self.nome,
+            'execucao': self.execucao.isoformat(timespec='seconds'),
+            'duracao': round(self.duracao, 3),
+            'sucesso': self.sucesso,
+            'sobrecarga': None if self.sobrecarga is None else round(self.sobrecarga, 3),
+            'caminho_critico': [e.nome for e in self.caminho_critico()],
+            'etapas': [e.como_dict() for e in self.etapas.values()],
+        }
+        destino = pasta / f"pipeline_{self.execucao.strftime('%Y%m%d_%H%M%S')}.json"
+        temporario = destino.with_name(destino.name + '.tmp')
+        temporario.write_text(json.dumps(dados, indent=1, ensure_ascii=False), encoding='utf-8')
+        os.replace(temporario, destino)
+        return destino
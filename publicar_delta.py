@@ -0,0 +1,309 @@
+"""
+Publicação do banco por changesets (em vez do db.sqlite inteiro no git)
+
+Em data/publicado (a pasta que vai para o GitHub):
+    indice.json                base atual, changesets e sha256 de cada arquivo
+    base_<carimbo>.sqlite.gz   cópia comprimida do banco (uma por semana)
+    delta_<carimbo>.json.gz    linhas inseridas/alteradas e removidas desde
+                               a publicação anterior, por tabela
+
+O changeset é a diferença entre o banco atual e a cópia do último estado
+publicado (data/publicacao_estado.sqlite, fora do git), tabela a tabela pela
+chave primária. O push diário cresce com as vendas do dia, não com o
+histórico. Uma base nova sai a cada DIAS_BASE dias ou quando o schema muda,
+e aí os changesets anteriores são removidos da pasta.
+
+O app chama carregar_dataset() ao iniciar: monta data/db.sqlite a partir
+da base e aplica os changesets que ainda não aplicou (tabela
+publicacao_aplicada do banco local).
+
+Uso:
+    python publicar_delta.py [--base]
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from migracoes import versao_schema
+
+PROJECT_DIR = Path(__file__).parent
+DB_PATH = PROJECT_DIR / "data" / "db.sqlite"
+PUBLICADO_DIR = PROJECT_DIR / "data" / "publicado"
+ESTADO_PATH = PROJECT_DIR / "data" / "publicacao_estado.sqlite"
+INDICE = 'indice.json'
+
+DIAS_BASE = 7
+# Tabelas lidas pelo app -> chave primária (ordem de aplicação dos changesets)
+TABELAS = {
+    'vendas': ['id'],
+    'venda_placa': ['placa', 'venda_id'],
+    'resumo_placa': ['placa', 'mes'],
+    'meta': ['chave'],
+}
+
+def _sha256(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for pedaco in iter(lambda: f.read(1024 * 1024), b''):
+            resumo.update(pedaco)
+    return resumo.hexdigest()
+
+def _gravar_atomico(caminho, dados):
+    temporario = Path(caminho).with_name(Path(caminho).name + '.tmp')
+    temporario.write_bytes(dados)
+    os.replace(temporario, caminho)
+
+def ler_indice(pasta=PUBLICADO_DIR):
+    indice = Path(pasta) / INDICE
+    if not indice.exists():
+        return None
+    return json.loads(indice.read_text(encoding='utf-8'))
+
+def _copiar_banco(origem, destino):
+    """Cópia consistente do banco (API de backup do SQLite, sem travar o escritor)"""
+    conn_origem = sqlite3.connect(origem)
+    conn_destino = sqlite3.connect(destino)
+    try:
+        conn_origem.backup(conn_destino)
+    finally:
+        conn_destino.close()
+        conn_origem.close()
+
+def _tabelas_existentes(conn, esquema='main'):
+    return {linha[0] for linha in conn.execute(f"SELECT name FROM {esquema}.sqlite_master WHERE type = 'table'")}
+
+def calcular_changeset(atual, anterior):
+    """
+    Diferença entre dois bancos, tabela a tabela pela chave primária
+
+    Returns:
+        dict: {tabela: {'colunas', 'upsert': [linhas], 'delete': [chaves]}}
+              só das tabelas com mudança
+    """
+    conn = sqlite3.connect(atual)
+    try:
+        conn.execute('ATTACH DATABASE ? AS ant', (str(anterior),))
+        existentes_ant = _tabelas_existentes(conn, 'ant')
+        changeset = {}
+        for tabela, chave in TABELAS.items():
+            colunas = [linha[1] for linha in conn.execute(f'PRAGMA main.table_info({tabela})')]
+            if tabela not in existentes_ant:
+                upsert = conn.execute(f'SELECT * FROM main.{tabela}').fetchall()
+                delete = []
+            else:
+                upsert = conn.execute(
+                    f'SELECT * FROM main.{tabela} EXCEPT SELECT * FROM ant.{tabela}'
+                ).fetchall()
+                pk = ', '.join(chave)
+                delete = conn.execute(
+                    f'SELECT {pk} FROM ant.{tabela} EXCEPT SELECT {pk} FROM main.{tabela}'
+                ).fetchall()
+            if upsert or delete:
+                changeset[tabela] = {
+                    'colunas': colunas,
+                    'upsert': [list(linha) for linha in upsert],
+                    'delete': [list(linha) for linha in delete],
+                }
+        return changeset
+    finally:
+        conn.close()
+
+def aplicar_changeset(conn, changeset):
+    """Aplica um changeset no banco (sem commit): remoções primeiro, depois upserts"""
+    for tabela, chave in TABELAS.items():
+        mudancas = changeset.get(tabela)
+        if not mudancas:
+            continue
+        filtro = ' AND '.join(f'{c} = ?' for c in chave)
+        conn.executemany(f'DELETE FROM {tabela} WHERE {filtro}', mudancas['delete'])
+        colunas = mudancas['colunas']
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) "
+            f"VALUES ({', '.join('?' * len(colunas))})",
+            mudancas['upsert'],
+        )
+
+def _remover_publicacoes_antigas(pasta, manter):
+    for arquivo in list(Path(pasta).glob('base_*.sqlite.gz')) + list(Path(pasta).glob('delta_*.json.gz')):
+        if arquivo.name not in manter:
+            arquivo.unlink()
+
+def publicar(caminho_db=DB_PATH, pasta=PUBLICADO_DIR, estado=ESTADO_PATH, forcar_base=False):
+    """
+    Publica o estado atual do banco como changeset (ou base semanal)
+
+    Returns:
+        dict: tipo ('base', 'delta' ou None se nada mudou), arquivo, bytes e linhas
+    """
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    indice = ler_indice(pasta)
+    carimbo = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+
+    with tempfile.TemporaryDirectory(prefix='publicacao_') as temporaria:
+        copia = Path(temporaria) / 'db.sqlite'
+        _copiar_banco(caminho_db, copia)
+        conn = sqlite3.connect(copia)
+        versao = versao_schema(conn)
+        conn.close()
+
+        motivo_base = None
+        if forcar_base:
+            motivo_base = "pedida"
+        elif indice is None or not Path(estado).exists():
+            motivo_base = "primeira publicação"
+        elif indice['versao_schema'] != versao:
+            motivo_base = f"schema mudou ({indice['versao_schema']} -> {versao})"
+        elif datetime.now() - datetime.fromisoformat(indice['base']['criado_em']) >= timedelta(days=DIAS_BASE):
+            motivo_base = f"base com mais de {DIAS_BASE} dias"
+
+        if motivo_base:
+            nome = f'base_{carimbo}.sqlite.gz'
+            with open(copia, 'rb') as f:
+                _gravar_atomico(pasta / nome, gzip.compress(f.read(), compresslevel=9))
+            indice = {
+                'versao_schema': versao,
+                'base': {
+                    'arquivo': nome,
+                    'sha256': _sha256(pasta / nome),
+                    'criado_em': datetime.now().isoformat(timespec='seconds'),
+                },
+                'deltas': [],
+            }
+            resultado = {'tipo': 'base', 'arquivo': nome, 'bytes': (pasta / nome).stat().st_size, 'linhas': None}
+            logging.info(f"[OK] Base publicada ({motivo_base}): {nome} ({resultado['bytes']:,} bytes)")
+        else:
+            changeset = calcular_changeset(copia, estado)
+            if not changeset:
+                logging.info("[INFO] Nenhuma mudança desde a última publicação")
+                return {'tipo': None, 'arquivo': None, 'bytes': 0, 'linhas': 0}
+
+            nome = f'delta_{carimbo}.json.gz'
+            conteudo = json.dumps({
+                'versao_schema': versao,
+                'criado_em': datetime.now().isoformat(timespec='seconds'),
+                'tabelas': changeset,
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            _gravar_atomico(pasta / nome, gzip.compress(conteudo, compresslevel=9))
+            linhas = {t: len(m['upsert']) + len(m['delete']) for t, m in changeset.items()}
+            indice['deltas'].append({
+                'arquivo': nome,
+                'sha256': _sha256(pasta / nome),
+                'criado_em': datetime.now().isoformat(timespec='seconds'),
+                'linhas': linhas,
+            })
+            resultado = {'tipo': 'delta', 'arquivo': nome, 'bytes': (pasta / nome).stat().st_size,
+                         'linhas': sum(linhas.values())}
+            logging.info(f"[OK] Changeset publicado: {nome} ({resultado['bytes']:,} bytes, {linhas})")
+
+        _gravar_atomico(pasta / INDICE, json.dumps(indice, indent=2, ensure_ascii=False).encode('utf-8'))
+        _remover_publicacoes_antigas(pasta, {indice['base']['arquivo']} | {d['arquivo'] for d in indice['deltas']})
+        # O próximo changeset é calculado contra o que acabou de ser publicado
+        shutil.copyfile(copia, Path(estado).with_name(Path(estado).name + '.tmp'))
+        os.replace(Path(estado).with_name(Path(estado).name + '.tmp'), estado)
+    return resultado
+
+# ---------------------------------------------------------------------------
+# Carga no app
+# ---------------------------------------------------------------------------
+
+def _conferir_sha256(caminho, esperado):
+    if _sha256(caminho) != esperado:
+        raise ValueError(f"Arquivo publicado corrompido (sha256 não confere): {caminho}")
+
+def _ler_changeset(pasta, delta):
+    caminho = Path(pasta) / delta['arquivo']
+    _conferir_sha256(caminho, delta['sha256'])
+    with gzip.open(caminho, 'rb') as f:
+        return json.loads(f.read().decode('utf-8'))['tabelas']
+
+def _aplicados(caminho_db):
+    if not Path(caminho_db).exists():
+        return None, set()
+    conn = sqlite3.connect(caminho_db)
+    try:
+        linhas = conn.execute('SELECT arquivo, tipo FROM publicacao_aplicada').fetchall()
+    except sqlite3.OperationalError:
+        return None, set()
+    finally:
+        conn.close()
+    base = next((arquivo for arquivo, tipo in linhas if tipo == 'base'), None)
+    return base, {arquivo for arquivo, tipo in linhas if tipo == 'delta'}
+
+def _aplicar_deltas(conn, pasta, deltas):
+    for delta in deltas:
+        aplicar_changeset(conn, _ler_changeset(pasta, delta))
+        conn.execute("INSERT OR REPLACE INTO publicacao_aplicada VALUES (?, 'delta', ?)",
+                     (delta['arquivo'], datetime.now().isoformat(timespec='seconds')))
+        conn.commit()
+
+def carregar_dataset(caminho_db=DB_PATH, pasta=PUBLICADO_DIR):
+    """
+    Monta ou atualiza o banco local a partir de data/publicado
+
+    Com a mesma base já aplicada, só os changesets novos são aplicados (cada
+    um na sua transação). Com base nova, o banco é remontado ao lado e
+    trocado de uma vez (os.replace).
+
+    Returns:
+        int: changesets aplicados (None se não há publicação)
+    """
+    indice = ler_indice(pasta)
+    if indice is None:
+        return None
+    base_aplicada, deltas_aplicados = _aplicados(caminho_db)
+
+    if base_aplicada == indice['base']['arquivo']:
+        pendentes = [d for d in indice['deltas'] if d['arquivo'] not in deltas_aplicados]
+        if pendentes:
+            conn = sqlite3.connect(caminho_db)
+            try:
+                _aplicar_deltas(conn, pasta, pendentes)
+            finally:
+                conn.close()
+            logging.info(f"[OK] {len(pendentes)} changeset(s) aplicados em {caminho_db}")
+        return len(pendentes)
+
+    base = Path(pasta) / indice['base']['arquivo']
+    _conferir_sha256(base, indice['base']['sha256'])
+    caminho_db = Path(caminho_db)
+    caminho_db.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho_db.with_name(caminho_db.name + '.montando')
+    with gzip.open(base, 'rb') as origem, open(temporario, 'wb') as destino:
+        shutil.copyfileobj(origem, destino, 1024 * 1024)
+
+    conn = sqlite3.connect(temporario)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS publicacao_aplicada (
+                arquivo TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                aplicado_em TEXT NOT NULL
+            )
+        ''')
+        conn.execute("INSERT OR REPLACE INTO publicacao_aplicada VALUES (?, 'base', ?)",
+                     (indice['base']['arquivo'], datetime.now().isoformat(timespec='seconds')))
+        conn.commit()
+        _aplicar_deltas(conn, pasta, indice['deltas'])
+    finally:
+        conn.close()
+    os.replace(temporario, caminho_db)
+    logging.info(f"[OK] Banco montado a partir de {base.name} + {len(indice['deltas'])} changeset(s)")
+    return len(indice['deltas'])
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Publica o banco como changeset (ou base semanal)")
+    parser.add_argument('--base', action='store_true', help="Publica uma base nova mesmo sem vencer a semana")
+    args = parser.parse_args()
+    publicar(forcar_base=args.base)
@@ -0,0 +1,456 @@
+"""
+Snapshots do banco endereçados por conteúdo, fora do repositório de código
+
+A carga publica o banco inteiro como snapshots/<sha256>.sqlite.gz (nome = hash
+do arquivo descomprimido) e, depois dele, o manifesto.json:
+
+    {"versao": <carimbo meta.versao_dados>, "schema": 9,
+     "arquivo": "snapshots/<sha256>.sqlite.gz", "sha256": "...",
+     "tamanho": <bytes descomprimido>, "tamanho_comprimido": ...,
+     "linhas": {"vendas": ..., ...}, "publicado_em": "...",
+     "anteriores": ["snapshots/<sha256>.sqlite.gz", ...],
+     "particoes": {"ano=AAAA/mes=MM/vendas.parquet":
+                   {"arquivo": "arquivo/<sha256>.parquet", "sha256": "...", "tamanho": ...}},
+     "particoes_substituidas": ["arquivo/<sha256>.parquet", ...]}
+
+O histórico arquivado (data/arquivo, Parquet por mês, arquivo_historico.py)
+vai junto: cada partição é publicada pelo hash do conteúdo e só as que
+mudaram são enviadas e baixadas. Sem elas o "histórico completo" do app não
+acharia as vendas antigas que o resumo_placa do banco aponta.
+
+O app consulta o manifesto com GET condicional (If-None-Match): sem mudança a
+resposta é 304, sem corpo. Só baixa o snapshot quando o hash muda, confere o
+sha256 e o tamanho e troca o data/db.sqlite de uma vez (os.replace); a
+recarga a quente do database.py pega a versão nova. As partições novas do
+arquivo são baixadas antes do banco que as referencia. Deploy de código e
+atualização de dados ficam independentes.
+
+Armazenamento (LUBRIMAX_SNAPSHOTS):
+    pasta local                 C:\\Lubrimax\\snapshots
+    S3 ou compatível (MinIO)    s3://bucket/prefixo
+        endpoint: LUBRIMAX_S3_ENDPOINT (padrão AWS), região: LUBRIMAX_S3_REGIAO
+        credenciais: AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+
+Uso:
+    python snapshots_dataset.py publicar [--banco data/db.sqlite]
+    python snapshots_dataset.py baixar [--destino data/db.sqlite]
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import requests
+
+from migracoes import versao_dados, versao_schema
+
+PROJECT_DIR = Path(__file__).parent
+DB_PATH = PROJECT_DIR / "data" / "db.sqlite"
+# Histórico arquivado em Parquet (arquivo_historico.ARQUIVO_DIR)
+ARQUIVO_DIR = PROJECT_DIR / "data" / "arquivo"
+# Último manifesto aplicado no banco local (ETag para o GET condicional)
+ESTADO_PATH = PROJECT_DIR / "data" / "snapshot_atual.json"
+SNAPSHOTS_URL = os.environ.get('LUBRIMAX_SNAPSHOTS', '')
+
+MANIFESTO = 'manifesto.json'
+MANTER_SNAPSHOTS = 5
+TABELAS_CONTADAS = ['vendas', 'venda_placa', 'resumo_placa']
+TAMANHO_PEDACO = 1024 * 1024
+TIMEOUT = (10, 120)
+
+class ArmazenamentoLocal:
+    """Snapshots numa pasta (disco local ou compartilhamento de rede)"""
+
+    def __init__(self, pasta):
+        self.pasta = Path(pasta)
+
+    def __repr__(self):
+        return f'ArmazenamentoLocal({self.pasta})'
+
+    def _caminho(self, chave):
+        return self.pasta / chave
+
+    @staticmethod
+    def _etag(caminho):
+        info = caminho.stat()
+        return f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+
+    def ler(self, chave, etag=None):
+        """
+        Returns:
+            tuple: (conteúdo, etag); conteúdo None se o etag ainda confere
+        """
+        caminho = self._caminho(chave)
+        if not caminho.exists():
+            raise FileNotFoundError(chave)
+        atual = self._etag(caminho)
+        if etag == atual:
+            return None, atual
+        return caminho.read_bytes(), atual
+
+    def baixar(self, chave, destino):
+        shutil.copyfile(self._caminho(chave), destino)
+
+    def existe(self, chave):
+        return self._caminho(chave).exists()
+
+    def enviar(self, chave, origem):
+        destino = self._caminho(chave)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_name(destino.name + '.tmp')
+        shutil.copyfile(origem, temporario)
+        os.replace(temporario, destino)
+
+    def gravar(self, chave, dados):
+        destino = self._caminho(chave)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_name(destino.name + '.tmp')
+        temporario.write_bytes(dados)
+        os.replace(temporario, destino)
+
+    def remover(self, chave):
+        self._caminho(chave).unlink(missing_ok=True)
+
+class ArmazenamentoS3:
+    """
+    Bucket S3 ou compatível (MinIO, R2...) com endereçamento por caminho
+    ({endpoint}/{bucket}/{chave}) e assinatura AWS Signature V4
+    """
+
+    def __init__(self, bucket, prefixo='', endpoint=None, regiao=None, chave_acesso=None, segredo=None):
+        self.bucket = bucket
+        self.prefixo = prefixo.strip('/')
+        self.endpoint = (endpoint or os.environ.get('LUBRIMAX_S3_ENDPOINT')
+                         or 'https://s3.amazonaws.com').rstrip('/')
+        self.regiao = regiao or os.environ.get('LUBRIMAX_S3_REGIAO', 'us-east-1')
+        self.chave_acesso = chave_acesso or os.environ.get('AWS_ACCESS_KEY_ID', '')
+        self.segredo = segredo or os.environ.get('AWS_SECRET_ACCESS_KEY', '')
+        self.session = requests.Session()
+
+    def __repr__(self):
+        return f'ArmazenamentoS3({self.endpoint}/{self.bucket}/{self.prefixo})'
+
+    def _url_caminho(self, chave):
+        chave = f'{self.prefixo}/{chave}' if self.prefixo else chave
+        caminho = quote(f'/{self.bucket}/{chave}', safe='/-_.~')
+        return self.endpoint + caminho, caminho
+
+    def _assinar(self, metodo, caminho, hash_corpo):
+        agora = datetime.now(timezone.utc)
+        data_hora = agora.strftime('%Y%m%dT%H%M%SZ')
+        data = agora.strftime('%Y%m%d')
+        host = urlsplit(self.endpoint).netloc
+        cabecalhos = {'host': host, 'x-amz-content-sha256': hash_corpo, 'x-amz-date': data_hora}
+        assinados = ';'.join(sorted(cabecalhos))
+        canonica = '\n'.join([
+            metodo, caminho, '',
+            ''.join(f'{nome}:{cabecalhos[nome]}\n' for nome in sorted(cabecalhos)),
+            assinados, hash_corpo,
+        ])
+        escopo = f'{data}/{self.regiao}/s3/aws4_request'
+        texto = '\n'.join(['AWS4-HMAC-SHA256', data_hora, escopo,
+                           hashlib.sha256(canonica.encode()).hexdigest()])
+        chave = ('AWS4' + self.segredo).encode()
+        for parte in (data, self.regiao, 's3', 'aws4_request'):
+            chave = hmac.new(chave, parte.encode(), hashlib.sha256).digest()
+        assinatura = hmac.new(chave, texto.encode(), hashlib.sha256).hexdigest()
+        cabecalhos['Authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.chave_acesso}/{escopo}, '
+            f'SignedHeaders={assinados}, Signature={assinatura}'
+        )
+        del cabecalhos['host']   # o requests envia o Host
+        return cabecalhos
+
+    def _requisicao(self, metodo, chave, corpo=b'', hash_corpo=None, extras=None, **kwargs):
+        url, caminho = self._url_caminho(chave)
+        cabecalhos = self._assinar(metodo, caminho, hash_corpo or hashlib.sha256(corpo).hexdigest())
+        cabecalhos.update(extras or {})
+        resposta = self.session.request(metodo, url, data=corpo or None, headers=cabecalhos,
+                                        timeout=TIMEOUT, **kwargs)
+        if resposta.status_code == 404:
+            raise FileNotFoundError(chave)
+        if resposta.status_code >= 400:
+            raise IOError(f"S3 {metodo} {chave}: HTTP {resposta.status_code} {resposta.text[:200]}")
+        return resposta
+
+    def ler(self, chave, etag=None):
+        resposta = self._requisicao('GET', chave, extras={'If-None-Match': etag} if etag else None)
+        if resposta.status_code == 304:
+            return None, etag
+        return resposta.content, resposta.headers.get('ETag')
+
+    def baixar(self, chave, destino):
+        with self._requisicao('GET', chave, stream=True) as resposta, open(destino, 'wb') as f:
+            for pedaco in resposta.iter_content(TAMANHO_PEDACO):
+                f.write(pedaco)
+
+    def existe(self, chave):
+        try:
+            self._requisicao('HEAD', chave)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def enviar(self, chave, origem):
+        with open(origem, 'rb') as f:
+            self._requisicao('PUT', chave, corpo=f, hash_corpo=sha256_arquivo(origem))
+
+    def gravar(self, chave, dados):
+        self._requisicao('PUT', chave, corpo=dados)
+
+    def remover(self, chave):
+        try:
+            self._requisicao('DELETE', chave)
+        except FileNotFoundError:
+            pass
+
+def abrir_armazenamento(destino=None):
+    """Armazenamento a partir de 's3://bucket/prefixo' ou de um caminho de pasta"""
+    destino = destino or SNAPSHOTS_URL
+    if not destino:
+        raise ValueError("Armazenamento de snapshots não configurado (LUBRIMAX_SNAPSHOTS)")
+    if destino.startswith('s3://'):
+        partes = urlsplit(destino)
+        return ArmazenamentoS3(partes.netloc, partes.path)
+    return ArmazenamentoLocal(destino)
+
+def sha256_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for pedaco in iter(lambda: f.read(TAMANHO_PEDACO), b''):
+            resumo.update(pedaco)
+    return resumo.hexdigest()
+
+def _ler_manifesto(armazenamento):
+    try:
+        dados, _ = armazenamento.ler(MANIFESTO)
+    except FileNotFoundError:
+        return None
+    return json.loads(dados)
+
+def _particoes_locais(pasta):
+    """Partições do arquivo: {'ano=AAAA/mes=MM/vendas.parquet': caminho}"""
+    pasta = Path(pasta)
+    if not pasta.exists():
+        return {}
+    return {caminho.relative_to(pasta).as_posix(): caminho
+            for caminho in sorted(pasta.glob('ano=*/mes=*/vendas.parquet'))}
+
+def publicar_particoes(armazenamento, pasta=ARQUIVO_DIR):
+    """
+    Envia as partições do arquivo que o armazenamento ainda não tem
+
+    Returns:
+        dict: {partição: {'arquivo', 'sha256', 'tamanho'}} para o manifesto
+    """
+    particoes = {}
+    for relativo, caminho in _particoes_locais(pasta).items():
+        sha256 = sha256_arquivo(caminho)
+        chave = f'arquivo/{sha256}.parquet'
+        if not armazenamento.existe(chave):
+            armazenamento.enviar(chave, caminho)
+            logging.info(f"[INFO] Partição do arquivo enviada: {relativo} -> {chave}")
+        particoes[relativo] = {'arquivo': chave, 'sha256': sha256, 'tamanho': caminho.stat().st_size}
+    return particoes
+
+def publicar_snapshot(caminho_db=DB_PATH, armazenamento=None, manter=MANTER_SNAPSHOTS, pasta_arquivo=ARQUIVO_DIR):
+    """
+    Publica o banco como snapshot endereçado por conteúdo + manifesto
+
+    O snapshot e as partições do arquivo vão antes do manifesto: quem lê o
+    manifesto sempre encontra os arquivos. Banco e partições iguais aos do
+    manifesto atual não publicam nada.
+
+    Returns:
+        dict: manifesto publicado (ou o atual, se nada mudou)
+    """
+    armazenamento = armazenamento or abrir_armazenamento()
+    anterior = _ler_manifesto(armazenamento)
+    particoes = publicar_particoes(armazenamento, pasta_arquivo)
+
+    with tempfile.TemporaryDirectory(prefix='snapshot_') as temporaria:
+        copia = Path(temporaria) / 'db.sqlite'
+        fonte = sqlite3.connect(Path(caminho_db).resolve().as_uri() + '?mode=ro', uri=True)
+        destino = sqlite3.connect(copia)
+        try:
+            fonte.backup(destino)
+        finally:
+            destino.close()
+            fonte.close()
+
+        sha256 = sha256_arquivo(copia)
+        if anterior and anterior['sha256'] == sha256 and anterior.get('particoes') == particoes:
+            logging.info(f"[INFO] Banco sem mudança desde o snapshot {sha256[:12]}")
+            return anterior
+
+        conn = sqlite3.connect(copia)
+        try:
+            linhas = {t: conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0] for t in TABELAS_CONTADAS}
+            versao, schema = versao_dados(conn), versao_schema(conn)
+        finally:
+            conn.close()
+
+        chave = f'snapshots/{sha256}.sqlite.gz'
+        comprimido = Path(temporaria) / 'db.sqlite.gz'
+        with open(copia, 'rb') as origem, gzip.open(comprimido, 'wb', compresslevel=6) as saida:
+            shutil.copyfileobj(origem, saida, TAMANHO_PEDACO)
+        if not armazenamento.existe(chave):
+            armazenamento.enviar(chave, comprimido)
+
+        anteriores = []
+        if anterior:
+            anteriores = [a for a in [anterior['arquivo']] + anterior.get('anteriores', []) if a != chave]
+        em_uso = {p['arquivo'] for p in particoes.values()}
+        substituidas = sorted({p['arquivo'] for p in (anterior or {}).get('particoes', {}).values()} - em_uso)
+        manifesto = {
+            'versao': versao,
+            'schema': schema,
+            'arquivo': chave,
+            'sha256': sha256,
+            'tamanho': copia.stat().st_size,
+            'tamanho_comprimido': comprimido.stat().st_size,
+            'linhas': linhas,
+            'publicado_em': datetime.now().isoformat(timespec='seconds'),
+            'anteriores': anteriores[:manter - 1],
+            'particoes': particoes,
+            'particoes_substituidas': substituidas,
+        }
+        armazenamento.gravar(MANIFESTO, json.dumps(manifesto, indent=2, ensure_ascii=False).encode('utf-8'))
+
+    # Snapshots que saíram da retenção (o anterior fica para quem ainda está baixando);
+    # partições substituídas ficam uma publicação a mais pelo mesmo motivo
+    for antigo in anteriores[manter - 1:]:
+        armazenamento.remover(antigo)
+    for antiga in set((anterior or {}).get('particoes_substituidas', [])) - em_uso:
+        armazenamento.remover(antiga)
+    logging.info(f"[OK] Snapshot publicado em {armazenamento}: {chave} "
+                 f"({manifesto['tamanho_comprimido']:,} bytes, {linhas}, {len(particoes)} partições do arquivo)")
+    return manifesto
+
+def _ler_estado(estado):
+    try:
+        return json.loads(Path(estado).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+def _baixar_verificado(armazenamento, chave, destino, sha256, tamanho):
+    """Baixa ao lado, confere sha256 e tamanho e troca o arquivo de uma vez"""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    baixando = destino.with_name(destino.name + '.baixando')
+    try:
+        armazenamento.baixar(chave, baixando)
+        if sha256_arquivo(baixando) != sha256 or baixando.stat().st_size != tamanho:
+            raise ValueError(f"{chave} não confere com o manifesto")
+        os.replace(baixando, destino)
+    finally:
+        baixando.unlink(missing_ok=True)
+
+def sincronizar_particoes(manifesto, armazenamento, pasta=ARQUIVO_DIR, conhecidas=None):
+    """
+    Deixa data/arquivo igual às partições do manifesto
+
+    Args:
+        conhecidas: {partição: sha256} já baixadas (estado local); partição
+                    sem registro tem o hash conferido no disco
+
+    Returns:
+        dict: {partição: sha256} do arquivo local, para o estado
+    """
+    if 'particoes' not in manifesto:
+        return conhecidas or {}   # manifesto publicado antes do arquivo entrar no snapshot
+    conhecidas = conhecidas or {}
+    pasta = Path(pasta)
+    locais = _particoes_locais(pasta)
+    for relativo, particao in manifesto['particoes'].items():
+        caminho = pasta / relativo
+        if caminho.exists() and (conhecidas.get(relativo) or sha256_arquivo(caminho)) == particao['sha256']:
+            continue
+        _baixar_verificado(armazenamento, particao['arquivo'], caminho, particao['sha256'], particao['tamanho'])
+        logging.info(f"[OK] Partição do arquivo atualizada: {relativo}")
+    for relativo, caminho in locais.items():
+        if relativo not in manifesto['particoes']:
+            caminho.unlink()
+            logging.info(f"[OK] Partição do arquivo removida: {relativo}")
+    return {relativo: p['sha256'] for relativo, p in manifesto['particoes'].items()}
+
+def atualizar_dataset(destino=DB_PATH, armazenamento=None, estado=ESTADO_PATH, pasta_arquivo=ARQUIVO_DIR):
+    """
+    Baixa o snapshot do manifesto se ele mudou e troca o banco local
+
+    As partições do arquivo que mudaram são baixadas antes do banco: o
+    resumo_placa do banco novo nunca aponta para um mês que ainda falta.
+
+    Returns:
+        bool: True se o banco ou o arquivo foi trocado
+    """
+    armazenamento = armazenamento or abrir_armazenamento()
+    destino = Path(destino)
+    atual = _ler_estado(estado) if destino.exists() else {}
+
+    dados, etag = armazenamento.ler(MANIFESTO, etag=atual.get('etag'))
+    if dados is None:
+        return False   # 304: manifesto não mudou
+    manifesto = json.loads(dados)
+    particoes = sincronizar_particoes(manifesto, armazenamento, pasta_arquivo, atual.get('particoes'))
+    arquivo_mudou = particoes != atual.get('particoes', {})
+    if manifesto['sha256'] != atual.get('sha256'):
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        baixado = destino.with_name(destino.name + '.gz.baixando')
+        montado = destino.with_name(destino.name + '.baixando')
+        try:
+            armazenamento.baixar(manifesto['arquivo'], baixado)
+            resumo = hashlib.sha256()
+            with gzip.open(baixado, 'rb') as origem, open(montado, 'wb') as saida:
+                for pedaco in iter(lambda: origem.read(TAMANHO_PEDACO), b''):
+                    resumo.update(pedaco)
+                    saida.write(pedaco)
+            if resumo.hexdigest() != manifesto['sha256'] or montado.stat().st_size != manifesto['tamanho']:
+                raise ValueError(f"Snapshot {manifesto['arquivo']} não confere com o manifesto")
+            os.replace(montado, destino)
+        finally:
+            baixado.unlink(missing_ok=True)
+            montado.unlink(missing_ok=True)
+        logging.info(f"[OK] Banco atualizado para o snapshot {manifesto['sha256'][:12]} "
+                     f"(versão {manifesto['versao']}, {manifesto['linhas']})")
+        trocou = True
+    else:
+        trocou = False
+
+    Path(estado).write_text(json.dumps(
+        {'etag': etag, 'sha256': manifesto['sha256'], 'versao': manifesto['versao'], 'particoes': particoes}
+    ), encoding='utf-8')
+    return trocou or arquivo_mudou
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Snapshots do banco endereçados por conteúdo")
+    parser.add_argument('--armazenamento', default=SNAPSHOTS_URL,
+                        help="Pasta ou s3://bucket/prefixo (padrão: LUBRIMAX_SNAPSHOTS)")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    publicar = sub.add_parser('publicar', help="Publica o banco como snapshot")
+    publicar.add_argument('--banco', default=str(DB_PATH))
+    baixar = sub.add_parser('baixar', help="Baixa o snapshot do manifesto se ele mudou")
+    baixar.add_argument('--destino', default=str(DB_PATH))
+    args = parser.parse_args()
+
+    try:
+        armazenamento = abrir_armazenamento(args.armazenamento)
+    except ValueError as e:
+        logging.error(f"[ERRO] {e}")
+        sys.exit(1)
+    if args.comando == 'publicar':
+        publicar_snapshot(args.banco, armazenamento)
+    else:
+        atualizar_dataset(args.destino, armazenamento)
@@ -0,0 +1,245 @@
+"""
+Sondagem do app (acordar e esperar ficar pronto) com asyncio
+
+Várias sondas leves ficam em andamento ao mesmo tempo, cada uma com espera
+adaptativa com jitter (decorrelated jitter: cresce enquanto nada muda, volta
+ao mínimo quando o app avança de estado). A sondagem para no instante em
+que o app fica pronto.
+
+Estados, do sinal mais forte para o mais fraco:
+    pronto     /_stcore/script-health-check responde 200: o script do app
+               rodou inteiro (banco ausente ou ilegível vira aviso na página,
+               não erro). Com versao_esperada, /app/static/versao_dados.json
+               também precisa trazer essa versão, gravada só depois do banco
+               aberto e da consulta de uma placa de amostra funcionando
+               (database.iniciar_recarga, a cada versão nova); logo depois
+               do push quem responde ainda é a instância antiga, com os
+               dados anteriores
+    servidor   /_stcore/health responde "ok": servidor no ar, script ainda não
+               (ou script pronto servindo outra versão dos dados)
+    dormindo   página de "waking up" do Streamlit Cloud, erro ou timeout; a
+               página inicial é acessada para disparar o despertar
+
+O tempo até ficar pronto de cada execução vai para logs/sondagens.jsonl.
+
+Uso:
+    python sondagem.py [--limite 600] [--versao CARIMBO]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+PROJECT_DIR = Path(__file__).parent
+URL_APP = os.environ.get('LUBRIMAX_URL_APP', 'https://lubrimax.streamlit.app')
+# No Streamlit Community Cloud o servidor do app responde atrás de /~/+
+URL_APP_INTERNO = os.environ.get('LUBRIMAX_URL_APP_INTERNO', URL_APP.rstrip('/') + '/~/+')
+SONDAGENS_PATH = PROJECT_DIR / 'logs' / 'sondagens.jsonl'
+
+SONDAS_SIMULTANEAS = 3
+TIMEOUT_SONDA = 15        # segundos por requisição (app dormindo não responde nunca)
+ESPERA_INICIAL = 1.0      # segundos entre sondas de uma mesma sonda, no mínimo
+ESPERA_MAXIMA = 20.0
+INTERVALO_DESPERTAR = 30  # acessos à página inicial para acordar o app
+LIMITE_PADRAO = 600
+
+ORDEM_ESTADOS = {'dormindo': 0, 'servidor': 1, 'pronto': 2}
+
+class Sondagem:
+    """Uma execução da sondagem: estado do app, linha do tempo e métricas"""
+
+    def __init__(self, url_app=URL_APP, url_interno=URL_APP_INTERNO, sondas=SONDAS_SIMULTANEAS,
+                 espera_inicial=ESPERA_INICIAL, espera_maxima=ESPERA_MAXIMA, timeout=TIMEOUT_SONDA,
+                 versao_esperada=None):
+        self.url_app = url_app.rstrip('/')
+        self.url_interno = url_interno.rstrip('/')
+        self.sondas = sondas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.timeout = timeout
+        self.versao_esperada = versao_esperada
+        self.versao_servida = None
+        self.estado = 'dormindo'
+        self.linha_do_tempo = []
+        self.requisicoes = 0
+        self.ultimo_despertar = None
+        self._trava = threading.Lock()
+        self._inicio = None
+
+    def _get(self, sessao, url):
+        with self._trava:
+            self.requisicoes += 1
+        return sessao.get(url, timeout=self.timeout)
+
+    def _despertar(self, sessao):
+        """Acessa a página inicial (dispara o despertar no Streamlit Cloud), no máximo a cada 30s"""
+        agora = time.monotonic()
+        with self._trava:
+            if self.ultimo_despertar is not None and agora - self.ultimo_despertar < INTERVALO_DESPERTAR:
+                return
+            self.ultimo_despertar = agora
+        try:
+            self._get(sessao, self.url_app)
+        except requests.RequestException:
+            pass
+
+    def sondar(self, sessao):
+        """Uma sonda (bloqueante, roda numa thread): devolve o estado observado"""
+        try:
+            resposta = self._get(sessao, f'{self.url_interno}/_stcore/script-health-check')
+            if resposta.status_code == 200:
+                if self.versao_esperada is None or self._versao_em_uso(sessao) == self.versao_esperada:
+                    return 'pronto'
+                return 'servidor'
+            resposta = self._get(sessao, f'{self.url_interno}/_stcore/health')
+            if resposta.status_code == 200 and resposta.text.strip() == 'ok':
+                return 'servidor'
+        except requests.RequestException:
+            pass
+        self._despertar(sessao)
+        return 'dormindo'
+
+    def _versao_em_uso(self, sessao):
+        """Versão dos dados que o app está servindo (None se não publicou)"""
+        resposta = self._get(sessao, f'{self.url_interno}/app/static/versao_dados.json')
+        if resposta.status_code != 200:
+            return None
+        try:
+            versao = resposta.json().get('versao')
+        except ValueError:
+            return None
+        with self._trava:
+            self.versao_servida = versao
+        return versao
+
+    def _registrar(self, estado):
+        """Guarda a mudança de estado; True se o app avançou"""
+        with self._trava:
+            if ORDEM_ESTADOS[estado] <= ORDEM_ESTADOS[self.estado]:
+                return False
+            self.estado = estado
+            segundos = round(time.monotonic() - self._inicio, 3)
+            self.linha_do_tempo.append({'estado': estado, 'segundos': segundos})
+        logging.info(f"   📶 App {estado} em {segundos:.1f}s")
+        return True
+
+    async def _sonda(self, numero, executor, pronto):
+        loop = asyncio.get_running_loop()
+        sessao = requests.Session()
+        # Sondas escalonadas: não saem todas no mesmo instante
+        await asyncio.sleep(numero * self.espera_inicial / self.sondas)
+        espera = self.espera_inicial
+        while not pronto.is_set():
+            estado = await loop.run_in_executor(executor, self.sondar, sessao)
+            if self._registrar(estado):
+                espera = self.espera_inicial
+            if estado == 'pronto':
+                pronto.set()
+                break
+            espera = min(self.espera_maxima, random.uniform(self.espera_inicial, espera * 3))
+            try:
+                await asyncio.wait_for(pronto.wait(), espera)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _executar(self, limite):
+        pronto = asyncio.Event()
+        # Executor próprio: ao ficar pronto não espera as sondas que ainda estão no ar
+        executor = ThreadPoolExecutor(max_workers=self.sondas, thread_name_prefix='sonda')
+        tarefas = [asyncio.create_task(self._sonda(i, executor, pronto)) for i in range(self.sondas)]
+        try:
+            await asyncio.wait_for(pronto.wait(), limite)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            executor.shutdown(wait=False)
+
+    def executar(self, limite=LIMITE_PADRAO):
+        """
+        Sonda até o app ficar pronto ou o limite (segundos) acabar
+
+        Returns:
+            dict: pronto, segundos até ficar pronto, linha do tempo dos estados
+                  e requisições feitas
+        """
+        self._inicio = time.monotonic()
+        inicio = datetime.now()
+        asyncio.run(self._executar(limite))
+        duracao = time.monotonic() - self._inicio
+        tempos = {e['estado']: e['segundos'] for e in self.linha_do_tempo}
+        return {
+            'inicio': inicio.isoformat(timespec='seconds'),
+            'url': self.url_app,
+            'pronto': self.estado == 'pronto',
+            'estado_final': self.estado,
+            'tempo_ate_servidor': tempos.get('servidor', tempos.get('pronto')),
+            'tempo_ate_pronto': tempos.get('pronto'),
+            'versao_esperada': self.versao_esperada,
+            'versao_servida': self.versao_servida,
+            'duracao': round(duracao, 3),
+            'requisicoes': self.requisicoes,
+            'linha_do_tempo': self.linha_do_tempo,
+        }
+
+def registrar_sondagem(resultado, caminho=SONDAGENS_PATH):
+    """Acrescenta o resultado da sondagem ao histórico (uma linha JSON por execução)"""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+
+def aguardar_app(limite=LIMITE_PADRAO, url_app=URL_APP, url_interno=URL_APP_INTERNO, registrar=True,
+                 versao_esperada=None):
+    """
+    Acorda o app e espera ele ficar pronto
+
+    Args:
+        versao_esperada: carimbo dos dados recém-publicados (após o deploy):
+                         o app só conta como pronto servindo essa versão
+
+    Returns:
+        dict: resultado da sondagem (Sondagem.executar); 'pronto' é True se o
+              app ficou pronto dentro do limite
+    """
+    logging.info(f"⏰ Acordando app: {url_app} (até {limite}s, {SONDAS_SIMULTANEAS} sondas"
+                 + (f", esperando a versão {versao_esperada})" if versao_esperada else ")"))
+    resultado = Sondagem(url_app, url_interno, versao_esperada=versao_esperada).executar(limite)
+    if resultado['pronto']:
+        logging.info(f"✅ App pronto em {resultado['tempo_ate_pronto']:.1f}s "
+                     f"({resultado['requisicoes']} requisições)")
+    else:
+        logging.warning(f"⚠️ App não ficou pronto em {limite}s (último estado: {resultado['estado_final']}"
+                        + (f", servindo a versão {resultado['versao_servida']})" if versao_esperada else ")"))
+    if registrar:
+        try:
+            registrar_sondagem(resultado)
+        except OSError as e:
+            logging.warning(f"[AVISO] Erro ao registrar a sondagem: {e}")
+    return resultado
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Acorda o app e espera ficar pronto")
+    parser.add_argument('--limite', type=int, default=LIMITE_PADRAO, help="Segundos até desistir")
+    parser.add_argument('--url', default=URL_APP)
+    parser.add_argument('--url-interno', default=None, help="Padrão: <url>/~/+ (Streamlit Community Cloud)")
+    parser.add_argument('--versao', default=None, help="Só conta como pronto servindo esta versão dos dados")
+    args = parser.parse_args()
+    resultado = aguardar_app(args.limite, args.url, args.url_interno or args.url.rstrip('/') + '/~/+',
+                             versao_esperada=args.versao)
+    sys.exit(0 if resultado['pronto'] else 1)
@@ -0,0 +1,138 @@
+"""
+Staging das extrações: um arquivo imutável por extração + manifesto
+
+Cada extração (cópia do relatório pela tela ou headless) grava o relatório da loja
+num arquivo novo, com data e hora no nome
+(staging/vendas_<loja>_<AAAAmmdd_HHMMSS_ffffff>.tsv), e acrescenta uma
+linha ao manifesto (staging/manifesto.jsonl) com a loja, o sha256, o
+número de linhas e se a extração foi incremental. Nenhum arquivo é
+reescrito: um crash no meio da gravação deixa só um .tmp órfão, e as
+extrações anteriores continuam intactas.
+
+A ingestão (atualizar_database.processar_staging) percorre o manifesto na
+ordem; o sha256 de cada arquivo gravado no banco vai para a tabela
+staging_ingerido na mesma transação das vendas, então arquivos já
+processados (ou extrações da loja com conteúdo idêntico) são pulados.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+STAGING_DIR = Path(os.environ.get('LUBRIMAX_STAGING_DIR', r'C:\Projetos\Lubrimax\staging'))
+MANIFESTO = 'manifesto.jsonl'
+
+_trava_manifesto = threading.Lock()
+
+def novo_caminho(loja, pasta=STAGING_DIR):
+    """Arquivo de staging ainda inexistente para uma nova extração da loja"""
+    carimbo = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    return Path(pasta) / f'vendas_{loja.lower()}_{carimbo}.tsv'
+
+def sha256_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for pedaco in iter(lambda: f.read(1024 * 1024), b''):
+            resumo.update(pedaco)
+    return resumo.hexdigest()
+
+def registrar(caminho, loja, origem, incremental=False, pasta=STAGING_DIR):
+    """
+    Acrescenta um arquivo de staging já gravado ao manifesto
+
+    Args:
+        origem: de onde veio o texto (ex.: 'tela')
+        incremental: o arquivo traz só as vendas desde a marca d'água
+
+    Returns:
+        dict: a entrada gravada no manifesto
+    """
+    caminho = Path(caminho)
+    with open(caminho, 'rb') as f:
+        linhas = sum(pedaco.count(b'\n') for pedaco in iter(lambda: f.read(1024 * 1024), b''))
+    entrada = {
+        'arquivo': caminho.name,
+        'loja': loja,
+        'origem': origem,
+        'incremental': bool(incremental),
+        'sha256': sha256_arquivo(caminho),
+        'linhas': linhas,
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    linha = json.dumps(entrada, ensure_ascii=False) + '\n'
+    with _trava_manifesto:
+        with open(Path(pasta) / MANIFESTO, 'a', encoding='utf-8') as f:
+            f.write(linha)
+            f.flush()
+            os.fsync(f.fileno())
+    logging.info(f"[OK] Staging {loja} registrado: {caminho.name} ({linhas} linhas, {origem})")
+    return entrada
+
+def gravar_texto(loja, texto, origem, incremental=False, pasta=STAGING_DIR):
+    """Grava o texto do relatório num arquivo novo de staging e registra no manifesto"""
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    caminho = novo_caminho(loja, pasta)
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    with open(temporario, 'w', encoding='utf-8', newline='') as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
+    return registrar(caminho, loja, origem, incremental, pasta)
+
+def ler_manifesto(pasta=STAGING_DIR):
+    """Entradas do manifesto na ordem em que foram gravadas"""
+    indice = Path(pasta) / MANIFESTO
+    if not indice.exists():
+        return []
+    entradas = []
+    with open(indice, encoding='utf-8') as f:
+        for numero, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            try:
+                entradas.append(json.loads(linha))
+            except json.JSONDecodeError:
+                # Última linha cortada por um crash durante o append
+                logging.warning(f"[AVISO] Linha {numero} do manifesto de staging ilegível, ignorada")
+    return entradas
+
+def pendentes(conn, loja=None, pasta=STAGING_DIR):
+    """
+    Entradas do manifesto ainda não gravadas no banco (uma por loja e sha256)
+
+    Returns:
+        list: entradas na ordem do manifesto, com 'caminho' completo
+    """
+    ingeridos = set(conn.execute('SELECT loja, sha256 FROM staging_ingerido'))
+    resultado = []
+    for entrada in ler_manifesto(pasta):
+        if loja and entrada['loja'] != loja:
+            continue
+        chave = (entrada['loja'], entrada['sha256'])
+        if chave in ingeridos:
+            continue
+        caminho = Path(pasta) / entrada['arquivo']
+        if not caminho.exists():
+            logging.warning(f"[AVISO] Arquivo de staging não encontrado: {caminho}")
+            continue
+        ingeridos.add(chave)
+        resultado.append({**entrada, 'caminho': caminho})
+    return resultado
+
+def marcar_ingerido(cursor, entrada, linhas):
+    """
+    Registra o arquivo como gravado no banco (sem commit, na transação da carga)
+
+    linhas: vendas gravadas. entrada['lidas'] e entrada['rejeitadas']
+    (opcionais): registros lidos do arquivo e os que não viraram venda
+    (data/número inválido, sem placa ou duplicados)
+    """
+    cursor.execute('''
+        INSERT OR REPLACE INTO staging_ingerido (loja, sha256, arquivo, linhas, lidas, rejeitadas, ingerido_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (entrada['loja'], entrada['sha256'], entrada['arquivo'], linhas,
+          entrada.get('lidas', 0), entrada.get('rejeitadas', 0),
+          datetime.now().isoformat(timespec='seconds')))
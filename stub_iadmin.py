@@ -0,0 +1,143 @@
+"""
+Servidor local que reproduz as páginas do iAdmin (fixtures/navegador)
+
+Usado para testar e medir a extração headless do download_relatorio.py sem
+acessar o portal. As rotas vêm de rotas.json:
+
+    [{"metodo": "GET", "caminho": "/Principal.aspx", "status": 200,
+      "content_type": "text/html", "arquivo": "get_sessao.html",
+      "exige_sessao": true, "define_sessao": false}, ...]
+
+- Rotas com exige_sessao sem o cookie de sessão redirecionam para o login.
+- O login (define_sessao) cria o cookie de sessão.
+- O corpo é enviado em Transfer-Encoding: chunked e comprimido com gzip
+  quando o cliente aceita; --latencia simula o tempo de resposta do portal.
+
+Uso:
+    python stub_iadmin.py [--porta 8765] [--latencia 0.2]
+"""
+
+import gzip
+import json
+import logging
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+PROJECT_DIR = Path(__file__).parent
+FIXTURES_DIR = PROJECT_DIR / "fixtures" / "navegador"
+COOKIE_SESSAO = 'ASP.NET_SessionId'
+TAMANHO_PEDACO = 16 * 1024
+
+class _Tratador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, como o portal
+
+    def log_message(self, formato, *args):
+        logging.debug(f"[STUB] {formato % args}")
+
+    def _sessao_ativa(self):
+        cookies = SimpleCookie(self.headers.get('Cookie', ''))
+        return COOKIE_SESSAO in cookies and cookies[COOKIE_SESSAO].value in self.server.sessoes
+
+    def _responder(self, metodo):
+        caminho = urlsplit(self.path).path
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho:
+            self.rfile.read(tamanho)
+
+        with self.server.trava:
+            self.server.contagem[f'{metodo} {caminho}'] = self.server.contagem.get(f'{metodo} {caminho}', 0) + 1
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+
+        rota = self.server.rotas.get((metodo, caminho))
+        if rota is None:
+            self._enviar(404, 'text/plain', b'rota nao gravada')
+            return
+        if rota.get('exige_sessao') and not self._sessao_ativa():
+            self.send_response(302)
+            self.send_header('Location', self.server.caminho_login)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        cabecalhos = {}
+        if rota.get('define_sessao'):
+            sessao = uuid.uuid4().hex
+            self.server.sessoes.add(sessao)
+            cabecalhos['Set-Cookie'] = f'{COOKIE_SESSAO}={sessao}; Path=/; HttpOnly'
+
+        corpo = (self.server.pasta / rota['arquivo']).read_bytes()
+        self._enviar(rota.get('status', 200), rota.get('content_type', 'text/html'), corpo, cabecalhos)
+
+    def _enviar(self, status, content_type, corpo, cabecalhos=None):
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            corpo = gzip.compress(corpo)
+            cabecalhos = dict(cabecalhos or {}, **{'Content-Encoding': 'gzip'})
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        for i in range(0, len(corpo), TAMANHO_PEDACO):
+            pedaco = corpo[i:i + TAMANHO_PEDACO]
+            self.wfile.write(f'{len(pedaco):X}\r\n'.encode() + pedaco + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_GET(self):
+        self._responder('GET')
+
+    def do_POST(self):
+        self._responder('POST')
+
+class StubIAdmin(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, porta=0, pasta=FIXTURES_DIR, latencia=0.0):
+        super().__init__(('127.0.0.1', porta), _Tratador)
+        self.pasta = Path(pasta)
+        rotas = json.loads((self.pasta / 'rotas.json').read_text(encoding='utf-8'))
+        self.rotas = {(r['metodo'], r['caminho']): r for r in rotas}
+        self.caminho_login = next(
+            (r['caminho'] for r in rotas if r.get('define_sessao')), '/'
+        )
+        self.latencia = latencia
+        self.sessoes = set()
+        self.contagem = {}
+        self.trava = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def iniciar(self):
+        """Sobe o servidor numa thread em segundo plano e devolve a própria instância"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Stub local do iAdmin (respostas gravadas)")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--pasta', default=str(FIXTURES_DIR))
+    parser.add_argument('--latencia', type=float, default=0.0, help="Segundos de espera por requisição")
+    args = parser.parse_args()
+
+    servidor = StubIAdmin(args.porta, args.pasta, args.latencia)
+    print(f"Stub do iAdmin em {servidor.url} (fixtures: {args.pasta})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
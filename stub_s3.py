@@ -0,0 +1,121 @@
+"""
+Servidor local compatível com o básico do S3 (no lugar do MinIO nos testes)
+
+Endereçamento por caminho (/<bucket>/<chave>), objetos em memória:
+- PUT grava e devolve o ETag (md5 do conteúdo, como o S3 faz sem multipart)
+- GET devolve o objeto; com If-None-Match igual ao ETag responde 304 sem corpo
+- HEAD e DELETE
+- Requisições sem assinatura AWS4-HMAC-SHA256 recebem 403, e corpo que não
+  confere com x-amz-content-sha256 recebe 400 (como o S3/MinIO)
+
+Uso:
+    python stub_s3.py [--porta 9000]
+"""
+
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+class _Tratador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        logging.debug(f"[STUB S3] {formato % args}")
+
+    def _responder(self, status, corpo=b'', cabecalhos=None, sem_corpo=False):
+        self.send_response(status)
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if not sem_corpo:
+            self.wfile.write(corpo)
+
+    def _tratar(self, metodo):
+        chave = unquote(urlsplit(self.path).path)
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b''
+        with self.server.trava:
+            self.server.contagem[metodo] = self.server.contagem.get(metodo, 0) + 1
+
+        if not self.headers.get('Authorization', '').startswith('AWS4-HMAC-SHA256 Credential='):
+            self._responder(403, b'<Error><Code>AccessDenied</Code></Error>', sem_corpo=metodo == 'HEAD')
+            return
+
+        if metodo == 'PUT':
+            if hashlib.sha256(corpo).hexdigest() != self.headers.get('x-amz-content-sha256'):
+                self._responder(400, b'<Error><Code>XAmzContentSHA256Mismatch</Code></Error>')
+                return
+            etag = f'"{hashlib.md5(corpo).hexdigest()}"'
+            with self.server.trava:
+                self.server.objetos[chave] = (corpo, etag)
+            self._responder(200, cabecalhos={'ETag': etag})
+            return
+
+        with self.server.trava:
+            objeto = self.server.objetos.get(chave)
+            if metodo == 'DELETE':
+                self.server.objetos.pop(chave, None)
+        if metodo == 'DELETE':
+            self._responder(204)
+            return
+        if objeto is None:
+            self._responder(404, b'<Error><Code>NoSuchKey</Code></Error>', sem_corpo=metodo == 'HEAD')
+            return
+        dados, etag = objeto
+        if self.headers.get('If-None-Match') == etag:
+            self._responder(304, cabecalhos={'ETag': etag}, sem_corpo=True)
+            return
+        self._responder(200, dados, {'ETag': etag, 'Content-Type': 'application/octet-stream'},
+                        sem_corpo=metodo == 'HEAD')
+
+    def do_GET(self):
+        self._tratar('GET')
+
+    def do_HEAD(self):
+        self._tratar('HEAD')
+
+    def do_PUT(self):
+        self._tratar('PUT')
+
+    def do_DELETE(self):
+        self._tratar('DELETE')
+
+class StubS3(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, porta=0):
+        super().__init__(('127.0.0.1', porta), _Tratador)
+        self.objetos = {}
+        self.contagem = {}
+        self.trava = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def iniciar(self):
+        """Sobe o servidor numa thread em segundo plano e devolve a própria instância"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Stub local do S3 (objetos em memória)")
+    parser.add_argument('--porta', type=int, default=9000)
+    args = parser.parse_args()
+
+    servidor = StubS3(args.porta)
+    print(f"Stub do S3 em {servidor.url}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
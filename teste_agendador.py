@@ -0,0 +1,116 @@
+"""
+Script de teste do agendador residente (agendador.py)
+
+Confere as agendas no formato do cron, a recuperação de execuções perdidas
+(vários horários viram uma execução só; a completa prevalece), o adiamento
+quando outra execução está em andamento e a trava de instância única entre
+processos. O relógio é simulado: nada de esperar horários de verdade.
+"""
+
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from agendador import Agenda, Agendador, TravaProcesso
+
+print("=" * 80)
+print("🧪 TESTE DO AGENDADOR RESIDENTE (relógio simulado)")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+class Relogio:
+    def __init__(self, agora):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+# 1. Agendas no formato do cron
+diaria = Agenda('diaria', '0 5 * * *')
+intradiaria = Agenda('intradiaria', '*/30 8-18 * * 1-6', intradiaria=True)
+sabado = datetime(2026, 10, 17, 18, 45)      # sábado
+conferir("Diária: próxima às 5h do dia seguinte",
+         diaria.proxima(datetime(2026, 10, 19, 5, 0)) == datetime(2026, 10, 20, 5, 0))
+conferir("Intradiária: a cada 30 min no expediente",
+         intradiaria.proxima(datetime(2026, 10, 19, 9, 10)) == datetime(2026, 10, 19, 9, 30))
+conferir("Intradiária: depois das 18h30 pula para o dia seguinte às 8h",
+         intradiaria.proxima(datetime(2026, 10, 19, 18, 30)) == datetime(2026, 10, 20, 8, 0))
+conferir("Intradiária: sábado à noite pula o domingo",
+         intradiaria.proxima(sabado) == datetime(2026, 10, 19, 8, 0), str(intradiaria.proxima(sabado)))
+conferir("Dia do mês e da semana restritos: basta um dos dois (como no cron)",
+         Agenda('x', '0 0 13 * 5').proxima(datetime(2026, 10, 1)) == datetime(2026, 10, 2))
+conferir("Virada de ano", Agenda('x', '0 0 1 1 *').proxima(datetime(2026, 10, 19)) == datetime(2027, 1, 1))
+try:
+    Agenda('x', '61 * * * *')
+    invalida = False
+except ValueError:
+    invalida = True
+conferir("Expressão fora da faixa recusada", invalida)
+
+with tempfile.TemporaryDirectory() as pasta:
+    estado = Path(pasta) / 'estado.json'
+    execucoes = []
+
+    def executar(intradiaria):
+        execucoes.append((relogio.agora, intradiaria))
+        return True
+
+    # 2. Agenda nova não recupera o passado; dispara no horário
+    relogio = Relogio(datetime(2026, 10, 19, 9, 10))
+    agendador = Agendador([diaria, intradiaria], executar, estado, relogio)
+    conferir("Nada a rodar logo na subida", agendador.passo() is None and not execucoes)
+    relogio.agora = datetime(2026, 10, 19, 9, 30)
+    agendador.passo()
+    conferir("Intradiária disparada às 9h30", execucoes == [(relogio.agora, True)], str(execucoes))
+    conferir("Mesmo horário não roda duas vezes", agendador.passo() is None and len(execucoes) == 1)
+
+    # 3. Computador desligado da noite até 9h10 do dia seguinte: uma execução só, completa
+    relogio.agora = datetime(2026, 10, 20, 9, 10)
+    agendador = Agendador([diaria, intradiaria], executar, estado, relogio)
+    agendador.passo()
+    conferir("Horários perdidos viram uma execução só, completa (a diária venceu)",
+             execucoes[1:] == [(relogio.agora, False)], str(execucoes))
+    conferir("Depois da recuperação nada fica pendente", agendador.passo() is None and len(execucoes) == 2)
+
+    # 4. Execução manual em andamento: adia sem perder o horário
+    relogio.agora = datetime(2026, 10, 20, 9, 31)
+    ocupado = Agendador([intradiaria], lambda intradiaria: None, estado, relogio)
+    conferir("Trava ocupada: execução adiada", ocupado.passo() is None)
+    conferir("Horário continua pendente", [a.nome for a in ocupado.vencidas(relogio.agora)] == ['intradiaria'])
+
+    # 5. Trava de instância única entre processos
+    trava = Path(pasta) / 'agendador.lock'
+    tentar = ("import sys; from agendador import TravaProcesso; "
+              "sys.exit(0 if TravaProcesso(sys.argv[1]).adquirir() else 1)")
+    with TravaProcesso(trava):
+        segunda = subprocess.run([sys.executable, '-c', tentar, str(trava)], cwd=Path(__file__).parent)
+        conferir("Segunda instância não pega a trava", segunda.returncode == 1)
+    terceira = subprocess.run([sys.executable, '-c', tentar, str(trava)], cwd=Path(__file__).parent)
+    conferir("Trava liberada ao sair", terceira.returncode == 0)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
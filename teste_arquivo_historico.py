@@ -0,0 +1,155 @@
+"""
+Script de teste do arquivo frio do histórico (arquivo_historico.py)
+
+Arquiva as vendas antigas de um banco temporário e confere a ida e volta:
+as vendas saem do banco, vão para a partição Parquet do mês (uma linha por
+placa vinculada) e voltam iguais pela busca. A busca do app com
+historico_completo=True passa pelo resumo_placa para ler só os meses da
+placa e junta o arquivo com as vendas recentes do banco.
+"""
+
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_arquivo_'))
+# Pasta do arquivo lida na importação (a busca do app usa a padrão)
+os.environ['LUBRIMAX_ARQUIVO_DIR'] = str(pasta / 'arquivo')
+
+import database
+from arquivo_historico import arquivar_vendas_antigas, buscar_arquivo, caminho_particao
+from database import _Dataset, buscar_por_placa, contar_vendas_arquivadas
+from migracoes import aplicar_migracoes
+
+logging.disable(logging.CRITICAL)
+
+print("=" * 80)
+print("🧪 TESTE DO ARQUIVO DO HISTÓRICO")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def dias_atras(dias):
+    return (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d 10:00:00')
+
+def gravar(banco, vendas):
+    """(id, loja, data, numero_nf, placa, km, km_suspeito, [(placa, km) vinculadas])"""
+    conn = sqlite3.connect(banco)
+    for id_, loja, data, numero, placa, km, suspeito, vinculos in vendas:
+        conn.execute('''
+            INSERT INTO vendas (id, loja, data_emissao, numero_nf, serie, nome_cliente, total_venda,
+                                nome_vendedor, identificacao, placa, km, km_suspeito, status)
+            VALUES (?, ?, ?, ?, '1', 'CLIENTE', 150.5, 'VENDEDOR', NULL, ?, ?, ?, 'FINALIZADA')
+        ''', (id_, loja, data, numero, placa, km, suspeito))
+        conn.executemany('INSERT INTO venda_placa (placa, venda_id, km, loja) VALUES (?, ?, ?, ?)',
+                         [(p, id_, k, loja) for p, k in vinculos])
+    conn.commit()
+    conn.close()
+
+def consultar(banco, sql, parametros=()):
+    conn = sqlite3.connect(banco)
+    linhas = conn.execute(sql, parametros).fetchall()
+    conn.close()
+    return linhas
+
+antiga = datetime.now() - timedelta(days=500)
+mes_antigo = antiga.strftime('%Y-%m')
+data_antiga = antiga.strftime('%Y-%m-%d 10:00:00')
+try:
+    banco = str(pasta / 'db.sqlite')
+    aplicar_migracoes(banco)
+    gravar(banco, [
+        # Venda antiga com duas placas (DEF5G67 não é a principal)
+        (1, 'ADJ', data_antiga, 101, 'ABC1234', 40000, 0, [('ABC1234', 40000), ('DEF5G67', 9000)]),
+        # Mesmo mês, leitura suspeita (não vira ultimo_km do resumo)
+        (2, 'LUBRIMAX', data_antiga, 102, 'ABC1234', 990000, 1, [('ABC1234', 990000)]),
+        # Recente: continua no banco
+        (3, 'ADJ', dias_atras(10), 103, 'ABC1234', 52000, 0, [('ABC1234', 52000)]),
+    ])
+
+    # 1. Arquivamento
+    arquivadas = arquivar_vendas_antigas(banco, pasta / 'arquivo', janela_dias=365)
+    particao = caminho_particao(antiga.year, antiga.month, pasta / 'arquivo')
+    conferir("Vendas fora da janela arquivadas", arquivadas == 2, str(arquivadas))
+    conferir("Vendas arquivadas saem do banco; a recente fica",
+             consultar(banco, 'SELECT id FROM vendas') == [(3,)], str(consultar(banco, 'SELECT id FROM vendas')))
+    conferir("Vínculos das vendas arquivadas saem junto",
+             consultar(banco, 'SELECT venda_id FROM venda_placa') == [(3,)])
+    conferir("Partição do mês gravada", particao.exists(), str(particao))
+    resumo = consultar(banco, 'SELECT placa, mes, vendas, ultimo_km FROM resumo_placa ORDER BY placa')
+    conferir("resumo_placa por placa e mês, último KM sem a leitura suspeita",
+             resumo == [('ABC1234', mes_antigo, 2, 40000), ('DEF5G67', mes_antigo, 1, 9000)], str(resumo))
+
+    # 2. Ida e volta pelo Parquet
+    volta = buscar_arquivo('ABC1234', [mes_antigo], pasta=pasta / 'arquivo')
+    conferir("Busca no arquivo devolve as vendas da placa", sorted(v['numero_nf'] for v in volta) == [101, 102])
+    venda = next((v for v in volta if v['numero_nf'] == 101), {})
+    esperado = {'loja': 'ADJ', 'data_emissao': data_antiga, 'serie': '1', 'nome_cliente': 'CLIENTE',
+                'total_venda': 150.5, 'nome_vendedor': 'VENDEDOR', 'identificacao': None,
+                'placa': 'ABC1234', 'km': 40000, 'km_suspeito': 0, 'status': 'FINALIZADA'}
+    conferir("Venda volta do arquivo com os mesmos valores",
+             {c: venda.get(c) for c in esperado} == esperado, str(venda))
+    secundaria = buscar_arquivo('DEF5G67', [mes_antigo], pasta=pasta / 'arquivo')
+    conferir("Placa que não é a principal também é achada no arquivo, com o KM dela",
+             [(v['numero_nf'], v['placa'], v['km'], v['km_suspeito']) for v in secundaria] == [(101, 'DEF5G67', 9000, 0)],
+             str(secundaria))
+    conferir("Filtro por loja no arquivo",
+             [v['numero_nf'] for v in buscar_arquivo('ABC1234', [mes_antigo], 'LUBRIMAX', pasta / 'arquivo')] == [102])
+
+    # 3. Rearquivar não duplica
+    gravar(banco, [(4, 'ADJ', data_antiga, 101, 'ABC1234', 40000, 0, [('ABC1234', 40000)])])
+    arquivar_vendas_antigas(banco, pasta / 'arquivo', janela_dias=365)
+    volta = buscar_arquivo('ABC1234', [mes_antigo], pasta=pasta / 'arquivo')
+    conferir("Venda arquivada de novo não duplica na partição",
+             sorted(v['numero_nf'] for v in volta) == [101, 102], str([v['numero_nf'] for v in volta]))
+    conferir("Nada mais para arquivar", arquivar_vendas_antigas(banco, pasta / 'arquivo', janela_dias=365) == 0)
+
+    # 4. Busca do app: resumo_placa -> arquivo (historico_completo=True)
+    database.DATASET = _Dataset(banco)
+    recentes = buscar_por_placa('abc1234')
+    conferir("Sem histórico completo, só as vendas do banco", [v['numero_nf'] for v in recentes] == [103])
+    completo = buscar_por_placa('ABC1234', historico_completo=True)
+    conferir("Histórico completo junta banco e arquivo, mais recente primeiro",
+             [v['numero_nf'] for v in completo] == [103, 101, 102] or
+             [v['numero_nf'] for v in completo] == [103, 102, 101], str([v['numero_nf'] for v in completo]))
+    conferir("Histórico completo por loja",
+             sorted(v['numero_nf'] for v in buscar_por_placa('ABC1234', 'ADJ', historico_completo=True)) == [101, 103])
+    conferir("Placa só no arquivo (não principal) achada pelo resumo_placa",
+             [v['numero_nf'] for v in buscar_por_placa('DEF5G67', historico_completo=True)] == [101]
+             and buscar_por_placa('DEF5G67') == [])
+    conferir("Contagem das vendas arquivadas da placa", contar_vendas_arquivadas('ABC1234') == 2)
+
+    # 5. Sem linha no resumo_placa o arquivo nem é aberto
+    shutil.rmtree(pasta / 'arquivo')
+    conferir("Placa sem resumo não lê o arquivo",
+             buscar_por_placa('XYZ9876', historico_completo=True) == [])
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
@@ -0,0 +1,175 @@
+"""
+Script de teste da carga do histórico em janelas mensais (backfill_historico.py)
+
+Roda o backfill contra uma fonte simulada (no lugar dos relatórios
+exportados) em bancos temporários e confere o checkpoint: a janela que
+falhou é refeita na execução seguinte, os meses fechados já concluídos são
+pulados, o mês em andamento é gravado mas nunca ganha checkpoint, e um
+checkpoint gravado antes do fim do mês não vale.
+"""
+
+import logging
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from backfill_historico import executar_backfill, ler_exportacao, proximo_mes
+from esquema_relatorio import aplicar_esquema
+
+logging.disable(logging.CRITICAL)
+
+print("=" * 80)
+print("🧪 TESTE DA CARGA DO HISTÓRICO (BACKFILL)")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+class FonteSimulada:
+    """Duas vendas por loja e mês; as janelas em `falhar` levantam erro"""
+
+    def __init__(self, falhar=()):
+        self.falhar = set(falhar)
+        self.chamadas = []
+        self._trava = threading.Lock()
+
+    def __call__(self, loja, mes, primeiro, ultimo):
+        with self._trava:
+            self.chamadas.append((loja, mes))
+        if (loja, mes) in self.falhar:
+            raise ConnectionError(f"relatório {loja} {mes} indisponível")
+        numero = int(mes.replace('-', '')) * 10
+        dia = primeiro.strftime('%d/%m/%Y')
+        relatorio = pd.DataFrame({
+            'EMISSÃO': [dia, dia],
+            'SÉRIE': ['1', '1'],
+            'NUMERO VENDA': [str(numero + 1), str(numero + 2)],
+            'TOTAL VENDA': ['100,00', '1.250,50'],
+            'OBSERVAÇÃO': ['PLACA: ABC1234 KM 10.000', 'PLACAS: DEF5G67  GHI8901'],
+            'IDENTIFICAÇÃO': [None, None],
+        }, dtype=object)
+        relatorio['LOJA'] = loja
+        return aplicar_esquema(relatorio)[0]
+
+def consultar(banco, sql):
+    conn = sqlite3.connect(banco)
+    linhas = conn.execute(sql).fetchall()
+    conn.close()
+    return linhas
+
+def backfill(fonte, **opcoes):
+    return executar_backfill(inicio, fim, lojas=['ADJ', 'ADV'], workers=2, caminho_db=str(banco), fonte=fonte,
+                             pasta_backup=pasta / 'backups', pasta_arquivo=pasta / 'arquivo', **opcoes)
+
+# Três meses fechados e o mês em andamento
+hoje = date.today()
+meses = []
+mes = date(hoje.year - 1 if hoje.month <= 3 else hoje.year, (hoje.month - 4) % 12 + 1, 1)
+while mes <= hoje:
+    meses.append(mes.strftime('%Y-%m'))
+    mes = proximo_mes(mes)
+inicio, fim, aberto = meses[0], meses[-1], meses[-1]
+fechados = meses[:-1]
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_backfill_'))
+try:
+    banco = pasta / 'db.sqlite'
+
+    # 1. Primeira execução: uma janela fechada falha no meio
+    fonte = FonteSimulada(falhar=[('ADV', fechados[1])])
+    resumo = backfill(fonte)
+    checkpoints = set(consultar(banco, 'SELECT loja, mes FROM backfill_janela'))
+    conferir("Todas as janelas lidas na primeira execução", len(fonte.chamadas) == 2 * len(meses),
+             str(fonte.chamadas))
+    conferir("Janela com erro entra nas falhas, as outras continuam",
+             resumo['falhas'] == [('ADV', fechados[1])] and resumo['concluidas'] == 2 * len(meses) - 1,
+             str(resumo))
+    conferir("Meses fechados concluídos ganham checkpoint",
+             checkpoints == {(loja, mes) for loja in ('ADJ', 'ADV') for mes in fechados} - {('ADV', fechados[1])},
+             str(sorted(checkpoints)))
+    conferir("Mês em andamento gravado, mas sem checkpoint",
+             not any(mes == aberto for _, mes in checkpoints)
+             and consultar(banco, f"SELECT COUNT(*) FROM vendas WHERE data_emissao LIKE '{aberto}%'")[0][0] == 4)
+    conferir("Janela com erro não grava vendas",
+             consultar(banco, f"SELECT COUNT(*) FROM vendas WHERE loja = 'ADV' "
+                              f"AND data_emissao LIKE '{fechados[1]}%'")[0][0] == 0)
+    vinculos = consultar(banco, 'SELECT COUNT(*) FROM venda_placa')[0][0]
+    conferir("Vínculos de todas as placas gravados", vinculos == 3 * (2 * len(meses) - 1), str(vinculos))
+
+    # 2. Nova execução: só a janela que falhou e o mês em andamento
+    fonte = FonteSimulada()
+    resumo = backfill(fonte)
+    checkpoints = set(consultar(banco, 'SELECT loja, mes FROM backfill_janela'))
+    conferir("Nova execução retoma do checkpoint (pula os meses fechados concluídos)",
+             sorted(fonte.chamadas) == sorted([('ADV', fechados[1]), ('ADJ', aberto), ('ADV', aberto)]),
+             str(sorted(fonte.chamadas)))
+    conferir("Resumo conta as janelas puladas",
+             resumo['puladas'] == 2 * len(fechados) - 1 and not resumo['falhas'], str(resumo))
+    conferir("Janela refeita ganha checkpoint; mês em andamento continua sem",
+             checkpoints == {(loja, mes) for loja in ('ADJ', 'ADV') for mes in fechados}, str(sorted(checkpoints)))
+    total = consultar(banco, 'SELECT COUNT(*) FROM vendas')[0][0]
+    conferir("Mês em andamento relido sem duplicar vendas (upsert)", total == 2 * 2 * len(meses), str(total))
+
+    # 3. Checkpoint gravado antes do fim do mês (versão antiga) não vale
+    conn = sqlite3.connect(banco)
+    conn.execute("UPDATE backfill_janela SET concluido_em = ? WHERE loja = 'ADJ' AND mes = ?",
+                 (f'{fechados[0]}-15T10:00:00', fechados[0]))
+    conn.commit()
+    conn.close()
+    fonte = FonteSimulada()
+    backfill(fonte)
+    conferir("Checkpoint de mês ainda aberto na época é ignorado",
+             ('ADJ', fechados[0]) in fonte.chamadas and ('ADV', fechados[0]) not in fonte.chamadas,
+             str(sorted(fonte.chamadas)))
+
+    # 4. --refazer lê tudo de novo
+    fonte = FonteSimulada()
+    resumo = backfill(fonte, refazer=True)
+    conferir("Refazer ignora os checkpoints", len(fonte.chamadas) == 2 * len(meses) and resumo['puladas'] == 0)
+    conferir("Backup feito na pasta informada", any((pasta / 'backups').iterdir()))
+
+    # 5. Fonte padrão: relatório exportado da loja no mês, só a janela
+    exportados = pasta / 'historico'
+    exportados.mkdir()
+    (exportados / 'adj_2025-01.tsv').write_text(
+        'EMISSÃO\tNUMERO VENDA\tOBSERVAÇÃO\n'
+        '31/12/2024\t1\tPLACA: ABC1234\n'
+        '02/01/2025\t2\tPLACA: ABC1234\n'
+        '01/02/2025\t3\tPLACA: ABC1234\n', encoding='utf-8')
+    df = ler_exportacao('ADJ', '2025-01', date(2025, 1, 1), date(2025, 1, 31), pasta=exportados)
+    conferir("Exportação lida só na janela do mês", df['numero_nf'].tolist() == [2], str(df['numero_nf'].tolist()))
+    try:
+        ler_exportacao('ADV', '2025-01', date(2025, 1, 1), date(2025, 1, 31), pasta=exportados)
+        conferir("Mês sem relatório exportado é falha da janela", False)
+    except FileNotFoundError:
+        conferir("Mês sem relatório exportado é falha da janela", True)
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
@@ -0,0 +1,118 @@
+"""
+Script de teste dos backups incrementais (backup_database.py)
+
+Cria snapshots de um banco de teste em sequência rápida (vários no mesmo
+segundo), restaura cada um num banco novo e confere que o conteúdo é igual
+ao do banco no momento do backup. Confere também a verificação de
+integridade, os blocos compartilhados e a retenção.
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from backup_database import (
+    aplicar_retencao, criar_backup, listar_backups, restaurar_backup, verificar_backup,
+)
+
+print("=" * 80)
+print("🧪 TESTE DOS BACKUPS INCREMENTAIS (criar, restaurar, comparar)")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def conteudo(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return list(conn.iterdump())
+    finally:
+        conn.close()
+
+def gravar(caminho, inicio, quantidade):
+    conn = sqlite3.connect(caminho)
+    conn.execute('CREATE TABLE IF NOT EXISTS vendas (id INTEGER PRIMARY KEY, placa TEXT, observacao TEXT)')
+    conn.executemany('INSERT INTO vendas VALUES (?, ?, ?)', (
+        (i, f'ABC{i % 10000:04d}', 'TROCA DE OLEO ' * 20) for i in range(inicio, inicio + quantidade)
+    ))
+    conn.commit()
+    conn.close()
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_backup_'))
+try:
+    banco = pasta / 'db.sqlite'
+    backups = pasta / 'backups'
+
+    # 1. Três estados do banco salvos em sequência (mesmo segundo)
+    estados = []
+    for rodada in range(3):
+        gravar(banco, rodada * 5000, 5000)
+        manifesto = criar_backup(banco, backups)
+        estados.append((manifesto['id'], conteudo(banco)))
+    ids = [id_snapshot for id_snapshot, _ in estados]
+    conferir("Backups seguidos têm ids distintos", len(set(ids)) == 3, str(ids))
+    conferir("Listagem na ordem de criação", [m['id'] for m in listar_backups(backups)] == ids,
+             str([m['id'] for m in listar_backups(backups)]))
+
+    # 2. Banco sem mudança não gera snapshot novo
+    repetido = criar_backup(banco, backups)
+    conferir("Banco sem mudança reaproveita o último backup",
+             repetido['id'] == ids[-1] and len(listar_backups(backups)) == 3)
+    conferir("Blocos iguais não são gravados de novo", repetido['execucao']['bytes_novos'] == 0)
+
+    # 3. Ida e volta: cada snapshot restaurado é igual ao banco daquele momento
+    for numero, (id_snapshot, esperado) in enumerate(estados, 1):
+        conferir(f"Snapshot {numero} íntegro", verificar_backup(id_snapshot, backups))
+        destino = pasta / f'restaurado_{numero}.sqlite'
+        restaurar_backup(id_snapshot, destino, backups)
+        conferir(f"Snapshot {numero} restaurado igual ao original", conteudo(destino) == esperado)
+
+    # 4. Restauração sobre o banco em uso (conexão aberta vê o conteúdo restaurado)
+    aberta = sqlite3.connect(banco)
+    restaurar_backup(ids[0], banco, backups)
+    linhas = aberta.execute('SELECT COUNT(*) FROM vendas').fetchone()[0]
+    aberta.close()
+    conferir("Conexão aberta vê o banco restaurado", linhas == 5000, f"({linhas} linhas)")
+
+    # 5. Bloco corrompido: verificação falha
+    objeto = next((backups / 'objetos').glob('*.gz'))
+    original = objeto.read_bytes()
+    objeto.write_bytes(b'corrompido')
+    conferir("Bloco corrompido reprovado na verificação",
+             not all(verificar_backup(i, backups) for i in ids))
+    objeto.write_bytes(original)
+
+    # 6. Retenção por tamanho: fica pelo menos o mais recente, e ele continua restaurável
+    removidos = aplicar_retencao(backups, dias=None, tamanho_maximo_mb=0)
+    restantes = [m['id'] for m in listar_backups(backups)]
+    conferir("Retenção remove os antigos e mantém o mais recente", removidos == 2 and restantes == ids[-1:],
+             str(restantes))
+    restaurar_backup(ids[-1], pasta / 'apos_retencao.sqlite', backups)
+    conferir("Mais recente restaurável após a retenção",
+             conteudo(pasta / 'apos_retencao.sqlite') == estados[-1][1])
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
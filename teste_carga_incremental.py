@@ -0,0 +1,139 @@
+"""
+Script de teste da carga incremental (carga_incremental.py)
+
+Confere a marca d'água por loja (última data e maior venda nessa data, sem
+misturar lojas), a data inicial da próxima exportação com a sobreposição de
+dias e o upsert pela chave da venda: venda existente é atualizada no lugar
+(mesmo id), venda nova entra e as outras ficam como estão.
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from carga_incremental import (
+    COLUNAS_VENDA, atualizar_marca_carga, inicio_incremental, ler_marca_carga, upsert_vendas
+)
+from migracoes import aplicar_migracoes
+
+print("=" * 80)
+print("🧪 TESTE DA CARGA INCREMENTAL")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def vendas(linhas):
+    """DataFrame no formato gravado: (loja, data, numero_nf, placa, total, status)"""
+    df = pd.DataFrame(linhas, columns=['loja', 'data_emissao', 'numero_nf', 'placa', 'total_venda', 'status'])
+    df['serie'] = '1'
+    for coluna in COLUNAS_VENDA:
+        if coluna not in df.columns:
+            df[coluna] = None
+    return df
+
+def gravar(caminho, funcao, df):
+    conn = sqlite3.connect(caminho)
+    resultado = funcao(conn.cursor(), df)
+    conn.commit()
+    conn.close()
+    return resultado
+
+def ler_vendas(caminho):
+    conn = sqlite3.connect(caminho)
+    linhas = conn.execute(
+        'SELECT id, loja, numero_nf, placa, total_venda, status FROM vendas ORDER BY id'
+    ).fetchall()
+    conn.close()
+    return linhas
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_carga_incremental_'))
+try:
+    banco = pasta / 'db.sqlite'
+
+    # 1. Sem banco ou sem marca: extração completa
+    conferir("Sem banco não há marca d'água", inicio_incremental('ADJ', banco) is None)
+    aplicar_migracoes(str(banco))
+    conferir("Loja nunca carregada não tem marca d'água", inicio_incremental('ADJ', banco) is None)
+
+    # 2. Marca d'água: última data da loja e maior venda nessa data
+    gravar(banco, atualizar_marca_carga, vendas([
+        ('ADJ', '2026-03-09 00:00:00', 900, 'ABC1234', 10.0, 'Emitida'),
+        ('ADJ', '2026-03-10 00:00:00', 501, 'ABC1234', 10.0, 'Emitida'),
+        ('ADJ', '2026-03-10 00:00:00', 502, 'DEF5678', 10.0, 'Emitida'),
+        ('ADV', '2026-03-05 00:00:00', 77, 'GHI9012', 10.0, 'Emitida'),
+    ]))
+    conferir("Marca da loja: última data e maior venda nessa data (não a maior de todas)",
+             ler_marca_carga('ADJ', banco) == ('2026-03-10 00:00:00', 502), str(ler_marca_carga('ADJ', banco)))
+    conferir("Cada loja com a sua marca", ler_marca_carga('ADV', banco) == ('2026-03-05 00:00:00', 77),
+             str(ler_marca_carga('ADV', banco)))
+    conferir("Próxima exportação começa DIAS_SOBREPOSICAO (3) dias antes da marca",
+             inicio_incremental('ADJ', banco) == datetime(2026, 3, 7), str(inicio_incremental('ADJ', banco)))
+    conferir("Sobreposição configurável", inicio_incremental('ADV', banco, dias_sobreposicao=0) == datetime(2026, 3, 5))
+
+    # 3. Nova carga atualiza a marca (ON CONFLICT), sem linha duplicada
+    gravar(banco, atualizar_marca_carga, vendas([
+        ('ADJ', '2026-03-12 00:00:00', 510, 'ABC1234', 10.0, 'Emitida'),
+    ]))
+    conn = sqlite3.connect(banco)
+    marcas = conn.execute('SELECT loja, ultima_data, ultimo_numero_nf FROM marca_carga ORDER BY loja').fetchall()
+    conn.close()
+    conferir("Marca atualizada no lugar; a outra loja não muda",
+             marcas == [('ADJ', '2026-03-12 00:00:00', 510), ('ADV', '2026-03-05 00:00:00', 77)], str(marcas))
+
+    # 4. Upsert: insere as novas
+    gravadas = gravar(banco, upsert_vendas, vendas([
+        ('ADJ', '2026-03-10 00:00:00', 501, 'ABC1234', 100.0, 'Emitida'),
+        ('ADJ', '2026-03-10 00:00:00', 502, 'DEF5678', 200.0, 'Emitida'),
+    ]))
+    antes = ler_vendas(banco)
+    conferir("Upsert grava as vendas novas", gravadas == 2 and len(antes) == 2, str(antes))
+
+    # 5. Mesma chave com status e total novos: atualiza, não duplica
+    gravar(banco, upsert_vendas, vendas([
+        ('ADJ', '2026-03-10 00:00:00', 501, 'ABC1234', 90.0, 'Cancelada'),
+        ('ADJ', '2026-03-11 00:00:00', 503, 'JKL3456', 300.0, 'Emitida'),
+    ]))
+    depois = ler_vendas(banco)
+    por_nf = {linha[2]: linha for linha in depois}
+    conferir("Venda existente atualizada no lugar (mesmo id)",
+             por_nf[501] == (antes[0][0], 'ADJ', 501, 'ABC1234', 90.0, 'Cancelada'), str(por_nf.get(501)))
+    conferir("Venda fora da carga fica como estava", por_nf[502] == antes[1], str(por_nf.get(502)))
+    conferir("Venda nova inserida", len(depois) == 3 and por_nf[503][3] == 'JKL3456', str(depois))
+
+    # 6. Mesmo número em outra loja ou data é outra venda (chave completa)
+    gravar(banco, upsert_vendas, vendas([
+        ('ADV', '2026-03-10 00:00:00', 501, 'MNO7890', 50.0, 'Emitida'),
+        ('ADJ', '2026-03-11 00:00:00', 501, 'PQR1234', 60.0, 'Emitida'),
+    ]))
+    conferir("Mesmo número em outra loja/data não sobrescreve",
+             len(ler_vendas(banco)) == 5 and ler_vendas(banco)[0] == por_nf[501], str(ler_vendas(banco)))
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
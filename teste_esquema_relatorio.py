@@ -0,0 +1,142 @@
+"""
+Script de teste do esquema do relatório de vendas (esquema_relatorio.py)
+
+Confere a conversão dos valores no padrão brasileiro ("1.234,56", "R$ 12,50"),
+das datas nos formatos do iAdmin (dia antes do mês) e a rejeição linha a
+linha: linha sem data ou sem número de venda válidos sai no rejeitado, valor
+inválido em coluna opcional vira vazio e é contado, e o resto da coluna é
+convertido normalmente.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from esquema_relatorio import aplicar_esquema, converter_data, converter_decimal_br, ler_relatorio_texto
+
+print("=" * 80)
+print("🧪 TESTE DO ESQUEMA DO RELATÓRIO")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def decimal(valor):
+    resultado = converter_decimal_br(pd.Series([valor], dtype=object))[0]
+    return None if pd.isna(resultado) else resultado
+
+def data(valor):
+    resultado = converter_data(pd.Series([valor], dtype=object))[0]
+    return None if pd.isna(resultado) else resultado.strftime('%Y-%m-%d %H:%M:%S')
+
+# 1. Valores no padrão brasileiro
+casos_decimal = [
+    ('1.234,56', 1234.56),
+    ('R$ 12,50', 12.5),
+    ('R$ 1.234.567,89', 1234567.89),
+    ('89,90', 89.9),
+    ('0,99', 0.99),
+    ('-1.000,00', -1000.0),
+    ('1.234', 1234.0),         # milhar sem casas decimais
+    ('12.5', 12.5),            # ponto decimal (não é milhar)
+    (150, 150.0),              # número que o Excel já entregou como número
+    (3.5, 3.5),
+    ('  45,00 ', 45.0),
+    ('', None),
+    (None, None),
+    ('abc', None),
+    ('12,34,56', None),
+]
+for valor, esperado in casos_decimal:
+    conferir(f"Decimal {valor!r} -> {esperado}", decimal(valor) == esperado, f"(obtido {decimal(valor)})")
+
+# 2. Datas nos formatos do iAdmin (dia/mês/ano)
+casos_data = [
+    ('02/03/2025', '2025-03-02 00:00:00'),            # 2 de março, não 3 de fevereiro
+    ('31/12/2024 23:59:59', '2024-12-31 23:59:59'),
+    ('02/01/2025 14:30', '2025-01-02 14:30:00'),
+    ('2025-01-02', '2025-01-02 00:00:00'),
+    ('2025-01-02 08:00:00', '2025-01-02 08:00:00'),
+    (pd.Timestamp('2025-03-04 10:00'), '2025-03-04 10:00:00'),   # célula de data do Excel
+    ('31/02/2025', None),
+    ('13/13/2025', None),
+    ('ontem', None),
+    ('', None),
+    (None, None),
+]
+for valor, esperado in casos_data:
+    conferir(f"Data {valor!r} -> {esperado}", data(valor) == esperado, f"(obtido {data(valor)})")
+
+# 3. Rejeição linha a linha (relatório lido como texto, dtype=object)
+relatorio = pd.DataFrame({
+    'EMISSÃO':      ['02/01/2025', '31/02/2025', '03/01/2025', '04/01/2025', '', '05/01/2025'],
+    'NUMERO VENDA': ['1001', '1002', 'abc', '1004,5', '1005', '1006'],
+    'TOTAL VENDA':  ['1.234,56', '10,00', '20,00', '30,00', '40,00', 'R$ dez'],
+    'CLIENTE':      ['CLIENTE A', 'CLIENTE B', 'CLIENTE C', 'CLIENTE D', 'CLIENTE E', '  '],
+}, dtype=object)
+convertido, rejeitado = aplicar_esquema(relatorio)
+conferir("Linhas com data, número inválidos ou data vazia são rejeitadas",
+         list(rejeitado.index) == [1, 2, 3, 4], str(list(rejeitado.index)))
+conferir("Rejeitado guarda os valores originais do relatório",
+         rejeitado.loc[1, 'EMISSÃO'] == '31/02/2025' and rejeitado.loc[3, 'NUMERO VENDA'] == '1004,5')
+conferir("Linhas válidas convertidas",
+         convertido['numero_nf'].tolist() == [1001, 1006]
+         and convertido['data_emissao'].tolist() == ['2025-01-02 00:00:00', '2025-01-05 00:00:00'],
+         str(convertido[['data_emissao', 'numero_nf']].values.tolist()))
+conferir("Valor inválido em coluna opcional vira vazio sem rejeitar a linha",
+         convertido['total_venda'][0] == 1234.56 and pd.isna(convertido['total_venda'][1]),
+         str(convertido['total_venda'].tolist()))
+conferir("Valores inválidos contados (não conta campo só com espaços)",
+         convertido.attrs['valores_invalidos'] == 4, str(convertido.attrs['valores_invalidos']))
+conferir("Coluna opcional ausente vira vazia", convertido['status'].isna().all())
+try:
+    aplicar_esquema(relatorio.drop(columns=['NUMERO VENDA']))
+    conferir("Coluna obrigatória ausente recusa o relatório", False)
+except ValueError:
+    conferir("Coluna obrigatória ausente recusa o relatório", True)
+
+# 4. Texto copiado do relatório (tab), com a loja preenchida
+pasta = Path(tempfile.mkdtemp(prefix='teste_esquema_'))
+try:
+    arquivo = pasta / 'relatorio.tsv'
+    arquivo.write_text(
+        'EMISSÃO\tSÉRIE\tNUMERO VENDA\tCLIENTE\tTOTAL VENDA\tVENDEDOR\tIDENTIFICAÇÃO\tSTATUS\tOBSERVAÇÃO\tEXTRA\n'
+        '02/01/2025\t1\t1001\tCLIENTE A\t1.234,56\tVENDEDOR 1\tABC1234\tFINALIZADA\tKM 220.878\tx\n'
+        '02/01/2025\t1\t\tCLIENTE B\t89,90\tVENDEDOR 2\t\tFINALIZADA\t\tx\n'
+        '03/01/2025\t2\t1003\tCLIENTE C\tR$ 12,50\tVENDEDOR 1\tDEF5G67\tCANCELADA\t\tx\n',
+        encoding='utf-8'
+    )
+    df, rejeitados = ler_relatorio_texto(arquivo, 'ADJ')
+    conferir("Texto do relatório: linha sem número rejeitada, as outras convertidas",
+             len(df) == 2 and len(rejeitados) == 1 and df['total_venda'].tolist() == [1234.56, 12.5],
+             str(df.values.tolist()))
+    conferir("Texto do relatório: loja preenchida e coluna fora do esquema ignorada",
+             (df['loja'] == 'ADJ').all() and 'EXTRA' not in df.columns and 'extra' not in df.columns)
+    conferir("Texto do relatório: série lida como texto", df['serie'].astype(str).tolist() == ['1', '2'])
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
@@ -0,0 +1,131 @@
+"""
+Script de teste do histórico de métricas da automação (metricas_pipeline.py)
+
+Grava num histórico temporário execuções completas e intradiárias
+intercaladas e confere que as tendências comparam cada modo só com ele
+mesmo: intradiárias rápidas não escondem a regressão da execução completa
+nem inventam uma quando as completas voltam a ser maioria.
+"""
+
+import logging
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import metricas_pipeline
+from pipeline import Pipeline
+
+logging.disable(logging.CRITICAL)
+
+print("=" * 80)
+print("🧪 TESTE DAS MÉTRICAS DA AUTOMAÇÃO")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+COMPLETA, INTRADIARIA = 'delta', 'delta intradiaria'
+inicio = datetime(2026, 9, 1, 5, 0)
+
+def registrar(historico, numero, modo, ingestao, total_vendas=1000):
+    """Execução com a ingestão levando `ingestao` segundos (tempos simulados)"""
+    pipeline = Pipeline('automacao_completa')
+    pipeline.adicionar('ingestao', lambda: None)
+    pipeline.executar()
+    etapa = pipeline.etapas['ingestao']
+    etapa.inicio, etapa.fim = 0.0, float(ingestao)
+    pipeline.execucao = inicio + timedelta(hours=numero)
+    pipeline.duracao = ingestao + 1.0
+    metricas_pipeline.registrar_execucao(pipeline, {'modo': modo, 'total_vendas': total_vendas}, historico)
+
+def series(regressoes):
+    return sorted(r['serie'] for r in regressoes)
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_metricas_'))
+try:
+    # 1. Completas (30s) e intradiárias (3s) estáveis, com a proporção mudando:
+    #    no começo quase só intradiárias, no fim quase só completas
+    historico = pasta / 'metricas.sqlite'
+    numero = 0
+    for modo in [INTRADIARIA] * 6 + [COMPLETA, INTRADIARIA] * 3 + [COMPLETA] * 6:
+        registrar(historico, numero, modo, 30 if modo == COMPLETA else 3)
+        numero += 1
+
+    conferir("Modos registrados", sorted(metricas_pipeline.modos(historico)) == [COMPLETA, INTRADIARIA])
+    completas = metricas_pipeline.historico(30, historico, COMPLETA)
+    conferir("Histórico filtrado pelo modo, do mais antigo para o mais recente",
+             len(completas) == 9 and all(e['modo'] == COMPLETA for e in completas)
+             and [e['inicio'] for e in completas] == sorted(e['inicio'] for e in completas))
+    conferir("Tempo das etapas no histórico", completas[0]['etapas'] == {'ingestao': 30.0}, str(completas[0]['etapas']))
+
+    misturadas = metricas_pipeline.regressoes(historico_execucoes=metricas_pipeline.historico(30, historico))
+    conferir("Misturando os modos apareceria uma regressão falsa",
+             'etapa ingestao' in series(misturadas), str(series(misturadas)))
+    conferir("Por modo, tempos estáveis não são regressão",
+             metricas_pipeline.regressoes(30, historico) == [], str(metricas_pipeline.regressoes(30, historico)))
+
+    # 2. Regressão real nas completas, escondida no meio das intradiárias
+    historico = pasta / 'metricas_regressao.sqlite'
+    numero = 0
+    for i in range(8):
+        registrar(historico, numero, COMPLETA, 30 if i < 4 else 75, total_vendas=1000 + i * 1000)
+        numero += 1
+        for _ in range(3):
+            registrar(historico, numero, INTRADIARIA, 3)
+            numero += 1
+
+    encontradas = metricas_pipeline.regressoes(30, historico, modo=COMPLETA)
+    ingestao = next((r for r in encontradas if r['serie'] == 'etapa ingestao'), None)
+    conferir("Regressão das completas encontrada no modo delas",
+             ingestao is not None and ingestao['p50_antes'] == 30 and ingestao['p50_depois'] == 75, str(encontradas))
+    conferir("Regressão marca a primeira execução lenta e o tamanho do histórico nela",
+             ingestao is not None and ingestao['total_vendas'] == 5000
+             and ingestao['desde'] == (inicio + timedelta(hours=16)).isoformat(timespec='seconds'), str(ingestao))
+    conferir("Intradiárias estáveis sem regressão",
+             metricas_pipeline.regressoes(30, historico, modo=INTRADIARIA) == [])
+    conferir("Sem modo, cada modo comparado separado (só a regressão das completas)",
+             series(metricas_pipeline.regressoes(30, historico)) == ['duracao', 'etapa ingestao'],
+             str(series(metricas_pipeline.regressoes(30, historico))))
+    ultimas = metricas_pipeline.historico(8, historico)
+    conferir("Últimas N execuções de todos os modos escondem a regressão das completas",
+             sum(e['modo'] == COMPLETA for e in ultimas) == 2
+             and metricas_pipeline.regressoes(historico_execucoes=ultimas) == [])
+    conferir("Últimas N por modo continuam vendo a regressão",
+             'etapa ingestao' in series(metricas_pipeline.regressoes(8, historico, modo=COMPLETA)))
+
+    # 3. Relatório: uma seção por modo
+    relatorio = metricas_pipeline.relatorio_desempenho(30, historico)
+    secao_completa = relatorio.split(f"Modo {COMPLETA}:")[-1].split(f"Modo {INTRADIARIA}:")[0]
+    secao_intradiaria = relatorio.split(f"Modo {INTRADIARIA}:")[-1].split(f"Modo {COMPLETA}:")[0]
+    conferir("Relatório com uma seção por modo",
+             f"Modo {COMPLETA}: últimas 8" in relatorio and f"Modo {INTRADIARIA}: últimas 24" in relatorio, relatorio)
+    conferir("Regressão só na seção das completas",
+             "Regressões" in secao_completa and "Nenhuma regressão" in secao_intradiaria)
+    conferir("Modo sem execuções",
+             "Nenhuma execução do modo 'completo'" in metricas_pipeline.relatorio_desempenho(30, historico, 'completo'))
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
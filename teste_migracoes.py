@@ -0,0 +1,150 @@
+"""
+Script de teste das migrações do banco (migracoes.py)
+
+Monta bancos em versões antigas do schema com vendas gravadas, leva até
+VERSAO_ATUAL e confere os dados migrados e os índices usados pelas buscas.
+Na reconstrução de vendas (migração 3), vendas alteradas, removidas e
+inseridas entre o backfill em lotes e a etapa atômica não podem se perder.
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import migracoes
+from database import _buscar_por_placa
+from migracoes import VERSAO_ATUAL, aplicar_migracoes
+
+print("=" * 80)
+print("🧪 TESTE DAS MIGRAÇÕES DO BANCO")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def migrar_ate(caminho, versao, lote=migracoes.TAMANHO_LOTE):
+    """Aplica só as migrações até a versão informada (banco de uma versão antiga)"""
+    todas = migracoes.MIGRACOES
+    migracoes.MIGRACOES = [m for m in todas if m[0] <= versao]
+    try:
+        return aplicar_migracoes(str(caminho), lote)
+    finally:
+        migracoes.MIGRACOES = todas
+
+def vendas(conn):
+    return conn.execute(
+        'SELECT id, loja, numero_nf, serie, placa, km, typeof(km), km_suspeito, status FROM vendas ORDER BY id'
+    ).fetchall()
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_migracoes_'))
+try:
+    # 1. Versão 2 (km em texto) -> atual, com escritas durante o backfill da migração 3
+    banco = pasta / 'v2.sqlite'
+    migrar_ate(banco, 2)
+    conn = sqlite3.connect(banco)
+    conn.executemany(
+        "INSERT INTO vendas (id, loja, data_emissao, numero_nf, serie, placa, km, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 'Emitida')",
+        [(1, 'ADJ', '2026-01-05', 10, '1', 'ABC1234', '1000'),
+         (2, 'ADJ', '2026-02-05', 11, '1', 'ABC1234', '2000'),
+         (3, 'LUBRIMAX', '2026-02-06', 12, None, 'DEF5G67', ''),
+         (4, 'LUBRIMAX', '2026-03-01', 13, '1', 'GHI8J90', '700'),
+         (5, 'ADJ', '2026-03-02', 14, '1', 'ABC1234', '3000')],
+    )
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(banco, isolation_level=None)
+    migracoes._m003_km_inteiro_backfill(conn, 2)
+    copiadas = conn.execute('SELECT COUNT(*) FROM vendas_v3').fetchone()[0]
+    # O app e a carga continuam gravando na tabela antiga antes da etapa atômica
+    conn.execute("UPDATE vendas SET status = 'Cancelada', km = '2100' WHERE id = 2")
+    conn.execute("UPDATE vendas SET km = '1500000' WHERE id = 5")
+    conn.execute('DELETE FROM vendas WHERE id = 4')
+    conn.execute("INSERT INTO vendas (id, loja, data_emissao, numero_nf, serie, placa, km, status) "
+                 "VALUES (6, 'ADJ', '2026-03-03', 15, '1', 'ABC1234', '3100', 'Emitida')")
+    conn.close()
+    conferir("Backfill copiou as vendas antes das escritas", copiadas == 5, f"({copiadas})")
+
+    conferir("Migração da versão 2 até a atual", migrar_ate(banco, VERSAO_ATUAL, lote=2) == VERSAO_ATUAL)
+    conn = sqlite3.connect(banco)
+    esperado = [
+        (1, 'ADJ', 10, '1', 'ABC1234', 1000, 'integer', 0, 'Emitida'),
+        (2, 'ADJ', 11, '1', 'ABC1234', 2100, 'integer', 0, 'Cancelada'),
+        (3, 'LUBRIMAX', 12, '', 'DEF5G67', None, 'null', 0, 'Emitida'),
+        (5, 'ADJ', 14, '1', 'ABC1234', 1500000, 'integer', 1, 'Emitida'),
+        (6, 'ADJ', 15, '1', 'ABC1234', 3100, 'integer', 0, 'Emitida'),
+    ]
+    conferir("Vendas migradas com as alterações, remoções e inserções da cópia", vendas(conn) == esperado,
+             str(vendas(conn)))
+    conferir("Nada da reconstrução sobrando (vendas_v3, triggers de cópia)",
+             not conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%v3%'").fetchall())
+    vinculos = conn.execute('SELECT placa, venda_id, km, loja FROM venda_placa ORDER BY venda_id').fetchall()
+    conferir("Vínculos placa/venda criados para todas as vendas",
+             vinculos == [(v[4], v[0], v[5], v[1]) for v in esperado], str(vinculos))
+    conferir("Carimbo da versão dos dados gravado", migracoes.versao_dados(conn) is not None)
+    conferir("Marca d'água por loja criada",
+             conn.execute('SELECT loja, ultima_data FROM marca_carga ORDER BY loja').fetchall()
+             == [('ADJ', '2026-03-03'), ('LUBRIMAX', '2026-02-06')])
+    conn.close()
+
+    # 2. Versão 10 -> atual: loja copiada para os vínculos placa/venda
+    banco = pasta / 'v10.sqlite'
+    migrar_ate(banco, 10)
+    conn = sqlite3.connect(banco)
+    conn.executemany(
+        "INSERT INTO vendas (id, loja, data_emissao, numero_nf, serie, placa, km) VALUES (?, ?, ?, ?, '1', ?, ?)",
+        [(1, 'ADJ', '2026-01-05', 10, 'ABC1234', 1000),
+         (2, 'LUBRIMAX', '2026-02-05', 20, 'ABC1234', 2000),
+         (3, 'ADJ', '2026-03-05', 30, 'DEF5G67', 500)],
+    )
+    conn.executemany("INSERT INTO venda_placa (placa, venda_id, km) VALUES (?, ?, ?)",
+                     [('ABC1234', 1, 1000), ('ABC1234', 2, 2000), ('DEF5G67', 3, 500), ('ABC1234', 3, None)])
+    conn.commit()
+    conn.close()
+
+    conferir("Migração até a versão atual", migrar_ate(banco, VERSAO_ATUAL, lote=2) == VERSAO_ATUAL)
+    conn = sqlite3.connect(banco)
+    conn.row_factory = sqlite3.Row
+    vinculos = conn.execute('SELECT placa, venda_id, loja FROM venda_placa ORDER BY venda_id, placa').fetchall()
+    conferir("Loja preenchida em todos os vínculos",
+             [tuple(v) for v in vinculos] == [('ABC1234', 1, 'ADJ'), ('ABC1234', 2, 'LUBRIMAX'),
+                                              ('ABC1234', 3, 'ADJ'), ('DEF5G67', 3, 'ADJ')],
+             str([tuple(v) for v in vinculos]))
+
+    plano = ' '.join(linha[3] for linha in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT v.id FROM venda_placa vp JOIN vendas v ON v.id = vp.venda_id "
+        "WHERE vp.placa = ? AND vp.loja = ?", ('ABC1234', 'ADJ')))
+    conferir("Busca por placa e loja usa o índice (loja, placa)", 'idx_venda_placa_loja' in plano, plano)
+    adj = _buscar_por_placa(conn, 'ABC1234', 'ADJ', False)
+    conferir("Busca por placa e loja traz só as vendas da loja",
+             sorted(venda['id'] for venda in adj) == [1, 3], str([dict(v) for v in adj]))
+    conferir("Busca sem loja traz todas as vendas da placa",
+             len(_buscar_por_placa(conn, 'ABC1234', None, False)) == 3)
+    conn.close()
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
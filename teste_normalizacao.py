@@ -0,0 +1,140 @@
+"""
+Script de teste da normalização das vendas extraídas (normalizacao.py)
+
+Confere a remoção de vendas repetidas (janelas sobrepostas e re-execuções):
+a chave é (loja, série, número, data de emissão) normalizada, fica a última
+ocorrência de cada chave e venda sem número nunca é descartada. E confere a
+marcação de KM suspeito por veículo: hodômetro que volta, salto maior que o
+plausível para o intervalo entre as visitas e leitura acima de KM_MAXIMO.
+"""
+
+import pandas as pd
+
+from normalizacao import KM_MAXIMO, converter_km, marcar_km_suspeito, remover_duplicatas
+
+print("=" * 80)
+print("🧪 TESTE DA NORMALIZAÇÃO DAS VENDAS")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def vendas(linhas):
+    """(loja, serie, numero_nf, data_emissao, status)"""
+    return pd.DataFrame(linhas, columns=['loja', 'serie', 'numero_nf', 'data_emissao', 'status'])
+
+# 1. Mantém a última ocorrência de cada chave
+df, removidas = remover_duplicatas(vendas([
+    ('ADJ', '1', 1001, '2025-01-02 00:00:00', 'Emitida'),
+    ('ADJ', '1', 1002, '2025-01-02 00:00:00', 'Emitida'),
+    ('ADJ', '1', 1001, '2025-01-02 00:00:00', 'Cancelada'),   # extração mais recente
+    ('ADJ', '1', 1001, '2025-01-02 00:00:00', 'Devolvida'),
+]))
+conferir("Duplicatas removidas e contadas", removidas == 2 and len(df) == 2, f"({removidas}, {len(df)})")
+conferir("Fica a última ocorrência da chave (status mais atual)",
+         df.loc[df['numero_nf'] == 1001, 'status'].tolist() == ['Devolvida'], str(df.values.tolist()))
+conferir("Ordem das vendas mantida", df['numero_nf'].tolist() == [1002, 1001], str(df['numero_nf'].tolist()))
+conferir("Índice refeito", list(df.index) == [0, 1])
+
+# 2. Cada parte da chave distingue vendas
+df, removidas = remover_duplicatas(vendas([
+    ('ADJ', '1', 1001, '2025-01-02 00:00:00', 'A'),
+    ('LUBRIMAX', '1', 1001, '2025-01-02 00:00:00', 'B'),   # outra loja
+    ('ADJ', '2', 1001, '2025-01-02 00:00:00', 'C'),        # outra série
+    ('ADJ', '1', 1001, '2025-01-03 00:00:00', 'D'),        # outra data
+    ('ADJ', '1', 1003, '2025-01-02 00:00:00', 'E'),        # outro número
+]))
+conferir("Mesmo número em outra loja, série ou data não é duplicata", removidas == 0 and len(df) == 5)
+
+# 3. Chave normalizada antes de comparar
+df, removidas = remover_duplicatas(vendas([
+    ('adj ', ' 1', '1001', ' 2025-01-02 00:00:00', 'A'),
+    ('ADJ', '1', 1001.0, '2025-01-02 00:00:00', 'B'),
+    ('ADJ', None, 1002, '2025-01-02 00:00:00', 'C'),
+    ('ADJ', '', 1002, '2025-01-02 00:00:00', 'D'),
+]))
+conferir("Loja/série com espaços ou minúsculas e número como texto são a mesma venda",
+         removidas == 2 and df['status'].tolist() == ['B', 'D'], str(df.values.tolist()))
+conferir("Chave normalizada no resultado",
+         df['loja'].tolist() == ['ADJ', 'ADJ'] and df['serie'].tolist() == ['1', ''])
+
+# 4. Venda sem número não tem identidade: nunca é descartada
+df, removidas = remover_duplicatas(vendas([
+    ('ADJ', '1', None, '2025-01-02 00:00:00', 'A'),
+    ('ADJ', '1', None, '2025-01-02 00:00:00', 'B'),
+    ('ADJ', '1', 'abc', '2025-01-02 00:00:00', 'C'),
+]))
+conferir("Vendas sem número mantidas", removidas == 0 and len(df) == 3)
+
+# 5. Vazio
+df, removidas = remover_duplicatas(vendas([]))
+conferir("DataFrame vazio", removidas == 0 and len(df) == 0)
+
+def suspeitos(linhas):
+    """(placa, data_emissao, km) -> km_suspeito de cada linha, na ordem dada"""
+    df = pd.DataFrame(linhas, columns=['placa', 'data_emissao', 'km'])
+    converter_km(df)
+    return marcar_km_suspeito(df)['km_suspeito'].tolist()
+
+# 6. KM como inteiro
+df = converter_km(pd.DataFrame({'km': ['220878', '15000', None, 'abc', 1207403]}))
+conferir("KM convertido para inteiro (vazio e lixo viram nulo)",
+         str(df['km'].dtype) == 'Int64' and df['km'].tolist()[:2] == [220878, 15000]
+         and df['km'].isna().tolist() == [False, False, True, True, False], str(df['km'].tolist()))
+
+# 7. Leituras plausíveis não são marcadas
+conferir("Hodômetro subindo normalmente",
+         suspeitos([('ABC1234', '2025-01-02', 10000), ('ABC1234', '2025-03-02', 15000),
+                    ('ABC1234', '2025-06-02', 22000)]) == [0, 0, 0])
+conferir("Mesmo KM em duas vendas do mesmo dia",
+         suspeitos([('ABC1234', '2025-01-02', 10000), ('ABC1234', '2025-01-02', 10000)]) == [0, 0])
+
+# 8. Hodômetro que voltou: marca a leitura menor, mesmo fora de ordem no relatório
+conferir("KM menor que a visita anterior é suspeito",
+         suspeitos([('ABC1234', '2025-01-02', 50000), ('ABC1234', '2025-02-02', 40000),
+                    ('ABC1234', '2025-03-02', 52000)]) == [0, 1, 0])
+conferir("Comparação pela data, não pela ordem das linhas",
+         suspeitos([('ABC1234', '2025-03-02', 52000), ('ABC1234', '2025-01-02', 50000)]) == [0, 0])
+
+# 9. Salto: tolera max(KM_SALTO_MINIMO, KM_POR_DIA_MAXIMO * dias)
+conferir("Salto de 60.000 km em 10 dias é suspeito",
+         suspeitos([('ABC1234', '2025-01-01', 10000), ('ABC1234', '2025-01-11', 70000)]) == [0, 1])
+conferir("Salto de 45.000 km em 1 dia está dentro do mínimo tolerado",
+         suspeitos([('ABC1234', '2025-01-01', 10000), ('ABC1234', '2025-01-02', 55000)]) == [0, 0])
+conferir("Salto de 100.000 km em 100 dias é plausível (1.500 km/dia)",
+         suspeitos([('ABC1234', '2025-01-01', 10000), ('ABC1234', '2025-04-11', 110000)]) == [0, 0])
+
+# 10. Leitura absurda: marcada e fora da sequência do veículo
+conferir("KM acima de KM_MAXIMO é suspeito e não contamina a próxima leitura",
+         suspeitos([('ABC1234', '2025-01-02', 200000), ('ABC1234', '2025-02-02', KM_MAXIMO + 207403),
+                    ('ABC1234', '2025-03-02', 205000)]) == [0, 1, 0])
+
+# 11. Cada veículo com a sua sequência; leituras vazias ignoradas
+conferir("Veículos diferentes não são comparados entre si",
+         suspeitos([('ABC1234', '2025-01-02', 90000), ('DEF5G67', '2025-01-03', 1000)]) == [0, 0])
+conferir("Leitura vazia ou sem placa não é marcada nem quebra a sequência",
+         suspeitos([('ABC1234', '2025-01-02', 50000), ('ABC1234', '2025-02-02', None),
+                    (None, '2025-02-03', 1), ('ABC1234', '2025-03-02', 40000)]) == [0, 0, 0, 1])
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
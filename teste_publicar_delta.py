@@ -0,0 +1,207 @@
+"""
+Script de teste da publicação por changesets (publicar_delta.py)
+
+Grava vendas num banco de teste pelo mesmo caminho da ingestão
+(substituir_vendas + inserir_vinculos_placa) e confere que a recarga
+completa de dados sem mudança mantém os ids e publica um changeset vazio,
+e que a recarga com mudanças só leva as vendas afetadas. Depois publica
+base + changesets numa pasta e confere, tabela a tabela (TABELAS), que o
+banco montado por carregar_dataset é igual linha a linha ao de origem.
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from carga_incremental import substituir_vendas
+from extracao_placa import extrair_placas_dataframe, inserir_vinculos_placa
+from migracoes import aplicar_migracoes, carimbar_versao_dados
+from normalizacao import converter_km, normalizar_chave_venda
+from publicar_delta import TABELAS, aplicar_changeset, calcular_changeset, carregar_dataset, publicar
+
+print("=" * 80)
+print("🧪 TESTE DA PUBLICAÇÃO POR CHANGESETS")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def relatorio(loja, vendas):
+    """DataFrame no formato que sai de processar_dados: (numero, data, total, observacao)"""
+    df = pd.DataFrame(vendas, columns=['numero_nf', 'data_emissao', 'total_venda', 'observacao'])
+    df['loja'] = loja
+    df['serie'] = '1'
+    df['nome_cliente'] = 'CLIENTE'
+    df['nome_vendedor'] = 'VENDEDOR'
+    df['identificacao'] = None
+    df['status'] = 'Emitida'
+    normalizar_chave_venda(df)
+    extrair_placas_dataframe(df)
+    converter_km(df)
+    df['km_suspeito'] = 0
+    return df
+
+def recarregar(caminho, df, loja):
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+    resultado = substituir_vendas(cursor, df, loja)
+    inserir_vinculos_placa(cursor, df)
+    conn.commit()
+    conn.close()
+    return resultado
+
+def linhas(caminho, tabela):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute(f'SELECT * FROM {tabela} ORDER BY {", ".join(TABELAS[tabela])}').fetchall()
+    finally:
+        conn.close()
+
+def conferir_tabelas(descricao, montado, origem):
+    for tabela in TABELAS:
+        conferir(f"{descricao}: {tabela} igual linha a linha", linhas(montado, tabela) == linhas(origem, tabela),
+                 f"({len(linhas(montado, tabela))} x {len(linhas(origem, tabela))} linhas)")
+
+def mudar_resumo(caminho, inserir=(), remover=()):
+    conn = sqlite3.connect(caminho)
+    conn.executemany('INSERT OR REPLACE INTO resumo_placa VALUES (?, ?, ?, ?, ?, ?)', inserir)
+    conn.executemany('DELETE FROM resumo_placa WHERE placa = ? AND mes = ?', remover)
+    carimbar_versao_dados(conn)
+    conn.commit()
+    conn.close()
+
+def ids_por_numero(caminho, loja):
+    conn = sqlite3.connect(caminho)
+    try:
+        return dict(conn.execute('SELECT numero_nf, id FROM vendas WHERE loja = ?', (loja,)).fetchall())
+    finally:
+        conn.close()
+
+ADJ = [
+    (101, '2026-10-01', 150.0, 'PLACA ABC1D23 KM 10000'),
+    (102, '2026-10-01', 80.0, 'PLACAS: DEF4G56 GHI7J89'),
+    (103, '2026-10-02', 99.9, 'PLACA JKL0M12 KM 52000'),
+]
+LUBRIMAX = [
+    (7, '2026-10-02', 300.0, 'PLACA NOP3Q45'),
+]
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_publicar_delta_'))
+try:
+    banco = pasta / 'db.sqlite'
+    publicado = pasta / 'publicado.sqlite'
+    aplicar_migracoes(str(banco))
+    recarregar(banco, relatorio('ADJ', ADJ), 'ADJ')
+    recarregar(banco, relatorio('LUBRIMAX', LUBRIMAX), 'LUBRIMAX')
+    shutil.copyfile(banco, publicado)
+    ids_antes = ids_por_numero(banco, 'ADJ')
+
+    # 1. Recarga completa sem mudança: mesmos ids, changeset vazio
+    gravadas, removidas = recarregar(banco, relatorio('ADJ', ADJ), 'ADJ')
+    conferir("Recarga sem mudança não remove vendas", removidas == 0, f"(removidas={removidas})")
+    conferir("Recarga sem mudança mantém os ids", ids_por_numero(banco, 'ADJ') == ids_antes)
+    changeset = calcular_changeset(banco, publicado)
+    conferir("Recarga sem mudança publica changeset vazio", changeset == {}, str(changeset))
+
+    # 2. Recarga com mudanças: só as vendas afetadas entram no changeset
+    alterado = [
+        (101, '2026-10-01', 175.0, 'PLACA ABC1D23 KM 10000'),   # total mudou
+        (102, '2026-10-01', 80.0, 'PLACAS: DEF4G56 GHI7J89'),   # igual
+        (104, '2026-10-03', 45.0, 'PLACA RST6U78 KM 3000'),     # nova (103 sumiu)
+    ]
+    recarregar(banco, relatorio('ADJ', alterado), 'ADJ')
+    ids_depois = ids_por_numero(banco, 'ADJ')
+    conferir("Vendas que continuam mantêm o id",
+             ids_depois[101] == ids_antes[101] and ids_depois[102] == ids_antes[102])
+    conferir("Venda que sumiu do relatório é removida", 103 not in ids_depois)
+    changeset = calcular_changeset(banco, publicado)
+    vendas = changeset.get('vendas', {})
+    coluna_id = vendas.get('colunas', []).index('id') if vendas else 0
+    conferir("Changeset de vendas: alterada + nova",
+             sorted(linha[coluna_id] for linha in vendas.get('upsert', [])) == sorted([ids_antes[101], ids_depois[104]]),
+             str(vendas.get('upsert')))
+    conferir("Changeset de vendas: só a removida", vendas.get('delete') == [[ids_antes[103]]], str(vendas.get('delete')))
+    vinculos = changeset.get('venda_placa', {})
+    conferir("Changeset de vínculos: só o da venda nova e o da removida",
+             [linha[:2] for linha in vinculos.get('upsert', [])] == [['RST6U78', ids_depois[104]]]
+             and vinculos.get('delete') == [['JKL0M12', ids_antes[103]]], str(vinculos))
+
+    # 3. Recarga de uma loja não mexe nas outras
+    conn = sqlite3.connect(banco)
+    lubrimax = conn.execute("SELECT COUNT(*) FROM vendas WHERE loja = 'LUBRIMAX'").fetchone()[0]
+    conn.close()
+    conferir("Vendas da outra loja intactas", lubrimax == 1)
+
+    # 4. Venda que perdeu a placa perde o vínculo
+    sem_placa = [(numero, data, total, 'SEM OBSERVAÇÃO' if numero == 102 else obs)
+                 for numero, data, total, obs in alterado]
+    recarregar(banco, relatorio('ADJ', sem_placa), 'ADJ')
+    conn = sqlite3.connect(banco)
+    vinculos_102 = conn.execute('SELECT COUNT(*) FROM venda_placa WHERE venda_id = ?', (ids_antes[102],)).fetchone()[0]
+    conn.close()
+    conferir("Vínculos da venda sem placa removidos", vinculos_102 == 0)
+
+    # 5. aplicar_changeset sobre o último estado publicado reproduz o banco atual
+    mudar_resumo(banco, inserir=[('ABC1D23', '2025-03', 2, '2025-03-01', '2025-03-20', 9000)])
+    changeset = calcular_changeset(banco, publicado)
+    conferir("Changeset cobre todas as tabelas alteradas", set(changeset) == set(TABELAS), str(set(changeset)))
+    conn = sqlite3.connect(publicado)
+    aplicar_changeset(conn, changeset)
+    conn.commit()
+    conn.close()
+    conferir_tabelas("aplicar_changeset", publicado, banco)
+
+    # 6. Publicação em pasta: base, dois changesets e montagem no app
+    saida = pasta / 'publicado'
+    estado = pasta / 'estado.sqlite'
+    conferir("Primeira publicação é base", publicar(banco, saida, estado)['tipo'] == 'base')
+    conferir("Nada mudou: nada publicado", publicar(banco, saida, estado)['tipo'] is None)
+    app_base = pasta / 'app_base' / 'db.sqlite'
+    conferir("App monta o banco a partir da base", carregar_dataset(app_base, saida) == 0)
+    conferir_tabelas("Base", app_base, banco)
+
+    recarregar(banco, relatorio('ADJ', ADJ), 'ADJ')
+    mudar_resumo(banco, inserir=[('ABC1D23', '2025-03', 3, '2025-03-01', '2025-03-28', 9500),
+                                 ('NOP3Q45', '2025-04', 1, '2025-04-02', '2025-04-02', None)])
+    primeiro = publicar(banco, saida, estado)
+    conferir("Segunda publicação é changeset", primeiro['tipo'] == 'delta' and primeiro['linhas'] > 0, str(primeiro))
+    conferir("App com a base aplica só o changeset novo", carregar_dataset(app_base, saida) == 1)
+    conferir_tabelas("Base + 1 changeset", app_base, banco)
+
+    recarregar(banco, relatorio('ADJ', alterado), 'ADJ')
+    mudar_resumo(banco, remover=[('NOP3Q45', '2025-04')])
+    conferir("Terceira publicação é changeset", publicar(banco, saida, estado)['tipo'] == 'delta')
+    conferir("App já atualizado aplica só o pendente", carregar_dataset(app_base, saida) == 1)
+    conferir_tabelas("Base + 2 changesets (incremental)", app_base, banco)
+    app_novo = pasta / 'app_novo' / 'db.sqlite'
+    conferir("App novo aplica base + 2 changesets", carregar_dataset(app_novo, saida) == 2)
+    conferir_tabelas("Base + 2 changesets (do zero)", app_novo, banco)
+    conferir("Sem publicação nova, nada a aplicar", carregar_dataset(app_novo, saida) == 0)
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
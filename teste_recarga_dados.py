@@ -0,0 +1,185 @@
+"""
+Script de teste da recarga a quente do banco no app (database._Dataset)
+
+Confere que uma carga no lugar (carimbo novo na tabela meta) e a troca do
+arquivo (os.replace, como fazem publicar_delta e snapshots_dataset) abrem
+uma geração nova para as consultas seguintes, enquanto uma consulta já em
+andamento na geração antiga termina inteira com os dados antigos. Banco
+novo ilegível ou com migração pendente não substitui o atual. A checagem de
+prontidão não grava nada; a versão servida é publicada pela recarga, a cada
+geração nova.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+import database
+from database import VERSAO_SERVIDA_PATH, _Dataset, _identidade_arquivo
+from migracoes import aplicar_migracoes, carimbar_versao_dados
+
+print("=" * 80)
+print("🧪 TESTE DA RECARGA A QUENTE DO BANCO")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def novo_banco(caminho, vendas):
+    aplicar_migracoes(str(caminho))
+    gravar(caminho, vendas)
+
+def gravar(caminho, vendas):
+    conn = sqlite3.connect(caminho)
+    conn.executemany("INSERT INTO vendas (loja, data_emissao, placa) VALUES ('ADJ', '2026-10-01', ?)",
+                     [(placa,) for placa in vendas])
+    carimbar_versao_dados(conn)
+    conn.commit()
+    conn.close()
+
+def trocar_placa_no_lugar(caminho, de, para, carimbar):
+    """UPDATE do mesmo tamanho com o mtime restaurado: só o carimbo pode acusar a carga"""
+    antes = os.stat(caminho)
+    conn = sqlite3.connect(caminho)
+    conn.execute('UPDATE vendas SET placa = ? WHERE placa = ?', (para, de))
+    if carimbar:
+        carimbar_versao_dados(conn)
+    conn.commit()
+    conn.close()
+    os.utime(caminho, ns=(antes.st_atime_ns, antes.st_mtime_ns))
+    return _identidade_arquivo(caminho) == (antes.st_ino, antes.st_mtime_ns, antes.st_size)
+
+def placas(conn):
+    return [linha[0] for linha in conn.execute('SELECT placa FROM vendas ORDER BY id')]
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_recarga_'))
+try:
+    banco = pasta / 'db.sqlite'
+    novo_banco(banco, ['AAA1111'])
+    dataset = _Dataset(str(banco))
+    primeira = dataset.geracao()
+    conferir("Primeira consulta vê o banco", dataset.consultar(('placas',), placas) == ['AAA1111'])
+
+    # 1. Nada mudou: mesma geração
+    conferir("Sem mudança não troca de geração", not dataset.verificar() and dataset.geracao() is primeira)
+
+    # 2. Escrita no lugar sem carimbo novo: mesma geração, cache mantido
+    mesma = trocar_placa_no_lugar(banco, 'AAA1111', 'AAA2222', carimbar=False)
+    conferir("Escrita sem carimbo novo não troca de geração",
+             mesma and not dataset.verificar() and dataset.geracao() is primeira)
+    conferir("Geração mantém o resultado em cache", dataset.consultar(('placas',), placas) == ['AAA1111'])
+
+    # 3. Carga no lugar com carimbo novo (mesmo arquivo): geração nova com os dados novos
+    mesma = trocar_placa_no_lugar(banco, 'AAA2222', 'BBB2222', carimbar=True)
+    conferir("Carimbo novo no mesmo arquivo troca de geração",
+             mesma and dataset.verificar() and dataset.geracao() is not primeira)
+    conferir("Consulta na geração nova vê os dados novos", dataset.consultar(('placas',), placas) == ['BBB2222'])
+    conferir("Geração antiga fechada", primeira.fechada)
+
+    # 4. Carga que muda o arquivo: geração nova
+    segunda = dataset.geracao()
+    gravar(banco, ['CCC3333'])
+    conferir("Arquivo alterado troca de geração", dataset.verificar() and dataset.geracao() is not segunda)
+    conferir("Consulta vê a venda nova", dataset.consultar(('placas',), placas) == ['BBB2222', 'CCC3333'])
+
+    # 5. Arquivo substituído durante uma consulta em andamento
+    antiga = dataset.geracao()
+    iniciou, continuar = threading.Event(), threading.Event()
+    resultado_antigo = {}
+
+    def consulta_longa(conn):
+        antes = placas(conn)
+        iniciou.set()
+        continuar.wait(5)
+        return antes, placas(conn)
+
+    leitor = threading.Thread(target=lambda: resultado_antigo.update(
+        valor=dataset.consultar(('longa',), consulta_longa)))
+    leitor.start()
+    iniciou.wait(5)
+
+    substituto = pasta / 'db_novo.sqlite'
+    novo_banco(substituto, ['ZZZ9999'])
+    os.replace(substituto, banco)
+    troca = threading.Thread(target=dataset.verificar)
+    troca.start()
+    troca.join(0.5)
+    conferir("Troca não espera a consulta em andamento para as novas",
+             dataset.atual is not antiga and dataset.consultar(('placas',), placas) == ['ZZZ9999'],
+             str(dataset.consultar(('placas',), placas)))
+    conferir("Geração antiga não é fechada no meio da consulta", not antiga.fechada)
+
+    continuar.set()
+    leitor.join(5)
+    troca.join(5)
+    esperado = ['BBB2222', 'CCC3333']
+    conferir("Consulta em andamento termina inteira na versão antiga",
+             resultado_antigo.get('valor') == (esperado, esperado), str(resultado_antigo))
+    conferir("Geração antiga fechada depois da consulta", antiga.fechada and not troca.is_alive())
+
+    # 6. Arquivo novo ilegível ou com migração pendente: segue na versão atual
+    atual = dataset.geracao()
+    (pasta / 'lixo.sqlite').write_bytes(b'isto nao e um banco sqlite' * 200)
+    os.replace(pasta / 'lixo.sqlite', banco)
+    conferir("Arquivo ilegível mantém a geração atual",
+             not dataset.verificar() and dataset.consultar(('placas',), placas) == ['ZZZ9999'])
+    antigo = pasta / 'db_v9.sqlite'
+    conn = sqlite3.connect(antigo)
+    conn.execute('CREATE TABLE vendas (id INTEGER PRIMARY KEY, placa TEXT)')
+    conn.execute('PRAGMA user_version = 9')
+    conn.close()
+    os.replace(antigo, banco)
+    conferir("Banco com migração pendente mantém a geração atual",
+             not dataset.verificar() and dataset.geracao() is atual)
+
+    # 7. Prontidão sem efeito colateral (o script do app roda a cada visita)
+    servido = pasta / 'servido.sqlite'
+    novo_banco(servido, ['DDD4444'])
+    antes = _identidade_arquivo(VERSAO_SERVIDA_PATH)
+    original = database.DATASET
+    database.DATASET = _Dataset(str(servido))
+    try:
+        pronto = database.conferir_prontidao()
+    finally:
+        database.DATASET = original
+    conferir("Prontidão devolve a versão sem gravar a versão servida",
+             pronto['versao'] is not None and _identidade_arquivo(VERSAO_SERVIDA_PATH) == antes, str(pronto))
+
+    # 8. Recarga avisa a cada geração nova (é ali que a versão servida é publicada)
+    vigiado = _Dataset(str(servido))
+    trocas = []
+    vigiado.iniciar_vigia(intervalo=3600, depois_troca=lambda: trocas.append(vigiado.atual.versao))
+    conferir("Geração aberta na subida do vigia é avisada", trocas == [vigiado.atual.versao], str(trocas))
+    vigiado.verificar()
+    conferir("Sem versão nova, nenhum aviso", len(trocas) == 1)
+    gravar(servido, ['EEE5555'])
+    conferir("Versão nova avisada depois da troca",
+             vigiado.verificar() and len(trocas) == 2 and trocas[1] == vigiado.atual.versao != trocas[0], str(trocas))
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
@@ -0,0 +1,142 @@
+"""
+Replay offline do scraper: login + extração pela tela contra o stub local
+
+Sobe o stub_iadmin.py com as páginas gravadas em fixtures/navegador (login
+do portal, página de aplicativos com o ícone do iAdmin e um aplicativo que
+avança um passo a cada clique e copia o relatório exportado) e roda o fluxo
+do download_relatorio.py num Chrome headless: login, troca de aba, busca
+da imagem iAdmin.png, cliques, cópia do relatório e gravação no staging.
+
+Confere o relatório extraído, o reaproveitamento da sessão entre as lojas e
+as execuções e compara os tempos com fixtures/navegador/tempos_referencia.json
+(falha se a execução ficar mais lenta que a referência + TOLERANCIA). Sem
+referência, ou com --gravar-referencia, os tempos medidos viram a referência.
+
+Uso:
+    python teste_replay_scraper.py [--execucoes 3] [--latencia 0.05] [--gravar-referencia]
+
+No Linux sem tela (CI), rodar com xvfb-run: o pyautogui exige um DISPLAY ao
+ser importado. LUBRIMAX_CHROMEDRIVER aponta para o chromedriver (vazio =
+Selenium Manager).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from stub_iadmin import PROJECT_DIR, StubIAdmin
+
+FIXTURES_NAVEGADOR = PROJECT_DIR / "fixtures" / "navegador"
+REFERENCIA = FIXTURES_NAVEGADOR / "tempos_referencia.json"
+TOLERANCIA = 0.25   # até 25% mais lento que a referência
+FOLGA = 1.0         # segundos a mais aceitos (ruído do CI em execuções curtas)
+
+parser = argparse.ArgumentParser(description="Replay offline do scraper (stub local + Chrome headless)")
+parser.add_argument('--execucoes', type=int, default=3)
+parser.add_argument('--latencia', type=float, default=0.05, help="Segundos de espera por requisição no stub")
+parser.add_argument('--gravar-referencia', action='store_true')
+args = parser.parse_args()
+
+print("=" * 80)
+print("🧪 REPLAY OFFLINE DO SCRAPER (stub local + Chrome headless)")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+pasta = Path(tempfile.mkdtemp(prefix='replay_scraper_'))
+stub = StubIAdmin(pasta=FIXTURES_NAVEGADOR, latencia=args.latencia).iniciar()
+
+# Configuração lida na importação dos módulos: portal, sessões, staging e
+# rastros apontam para o stub e para a pasta temporária
+os.environ['LUBRIMAX_IADMIN_URL'] = stub.url
+os.environ['LUBRIMAX_SESSOES_DIR'] = str(pasta / 'sessoes')
+os.environ['LUBRIMAX_STAGING_DIR'] = str(pasta / 'staging')
+os.environ['LUBRIMAX_TRACES_DIR'] = str(pasta / 'traces')
+# Credenciais de teste (o stub aceita qualquer uma; o .env real não é lido
+# porque load_dotenv não sobrescreve variáveis já definidas)
+for nome in ('LUBRIMAX_PORTAL_USUARIO', 'LUBRIMAX_PORTAL_SENHA',
+             'LUBRIMAX_IADMIN_USUARIO', 'LUBRIMAX_IADMIN_SENHA'):
+    os.environ[nome] = 'teste'
+os.chdir(pasta)   # o log do scraper é criado na pasta atual fora do Windows
+
+import download_relatorio
+from normalizacao import LOJAS
+
+relatorio = (PROJECT_DIR / "fixtures" / "navegador" / "relatorio.tsv").read_text(encoding='utf-8')
+tempos = []
+try:
+    for numero in range(1, args.execucoes + 1):
+        ja_medidas = len(download_relatorio.RASTREADOR.etapas)
+        inicio = time.monotonic()
+        arquivos = download_relatorio.extrair_lojas(LOJAS, headless=True, perfil=False)
+        tempos.append(time.monotonic() - inicio)
+        etapas = download_relatorio.RASTREADOR.etapas[ja_medidas:]
+        print(f"   Execução {numero}: {tempos[-1]:.2f}s em {len(etapas)} etapas")
+
+        conferir(f"Execução {numero}: todas as lojas extraídas", sorted(arquivos) == sorted(LOJAS), str(arquivos))
+        conferir(
+            f"Execução {numero}: relatório idêntico ao exportado",
+            all(Path(caminho).read_text(encoding='utf-8') == relatorio for caminho in arquivos.values()),
+        )
+        conferir(f"Execução {numero}: nenhuma etapa com erro",
+                 all(e['status'] == 'ok' for e in etapas),
+                 str([e['nome'] for e in etapas if e['status'] != 'ok']))
+
+    logins = stub.contagem.get('POST /', 0)
+    conferir("Login no portal feito uma única vez (sessão reaproveitada)", logins == 1, f"(logins={logins})")
+finally:
+    stub.parar()
+    os.chdir(PROJECT_DIR)
+    shutil.rmtree(pasta, ignore_errors=True)
+
+# Tempos: a 1ª execução inclui o login; as seguintes reaproveitam a sessão
+if tempos:
+    medidos = {
+        'com_login': round(tempos[0], 3),
+        'sessao_reaproveitada': round(statistics.median(tempos[1:]), 3) if len(tempos) > 1 else None,
+    }
+    print()
+    print(f"⏱️  Com login: {medidos['com_login']:.2f}s"
+          + (f" | sessão reaproveitada: {medidos['sessao_reaproveitada']:.2f}s"
+             if medidos['sessao_reaproveitada'] is not None else ''))
+
+    if args.gravar_referencia or not REFERENCIA.exists():
+        REFERENCIA.write_text(json.dumps(medidos, indent=2) + '\n', encoding='utf-8')
+        print(f"📝 Referência gravada em {REFERENCIA}")
+    else:
+        referencia = json.loads(REFERENCIA.read_text(encoding='utf-8'))
+        for chave, valor in medidos.items():
+            if valor is None or referencia.get(chave) is None:
+                continue
+            limite = referencia[chave] * (1 + TOLERANCIA) + FOLGA
+            conferir(f"Tempo {chave} dentro da referência ({valor:.2f}s <= {limite:.2f}s)",
+                     valor <= limite, f"(referência {referencia[chave]:.2f}s)")
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
@@ -1,28 +1,33 @@
 """
-Script de teste para validar a estrutura do Excel e do banco de dados
+Script de teste para validar o staging das extrações e o banco de dados
 """
 
 import os
 import sqlite3
 import pandas as pd
 
-def teste_excel():
-    """Testa se o arquivo Excel existe e mostra sua estrutura"""
+def teste_staging():
+    """Testa se o staging tem extrações registradas no manifesto"""
     print("\n" + "="*50)
-    print("📊 TESTE 1: Arquivo Excel")
+    print("📊 TESTE 1: Staging das extrações")
     print("="*50)
     
-    caminho = r'C:\Projetos\Lubrimax\Vendas_Lubrimax.xlsx'
+    import staging
     
-    if not os.path.exists(caminho):
-        print("❌ Arquivo Excel NÃO encontrado!")
-        print(f"   Esperado em: {caminho}")
+    entradas = staging.ler_manifesto()
+    if not entradas:
+        print("❌ Nenhuma extração no manifesto de staging!")
+        print(f"   Esperado em: {staging.STAGING_DIR / staging.MANIFESTO}")
         return False
     
-    print(f"✅ Arquivo encontrado: {caminho}")
+    print(f"✅ {len(entradas)} extrações no manifesto")
     
     try:
-        df = pd.read_excel(caminho, engine='openpyxl')
+        ultima = entradas[-1]
+        caminho = staging.STAGING_DIR / ultima['arquivo']
+        print(f"✅ Última extração: {ultima['arquivo']} ({ultima['loja']}, {ultima['criado_em']})")
+        
+        df = pd.read_csv(caminho, sep='\t', dtype=object, encoding='utf-8')
         print(f"✅ Total de linhas: {len(df)}")
         print(f"✅ Total de colunas: {len(df.columns)}")
         print(f"\n📋 Colunas encontradas:")
@@ -32,18 +37,15 @@ def teste_excel():
         print(f"\n📊 Primeiras 3 linhas:")
         print(df.head(3).to_string())
         
-        # Verificar se tem placa
-        if 'placa' in df.columns.str.lower() or 'PLACA' in df.columns:
-            col_placa = [c for c in df.columns if 'placa' in c.lower()][0]
-            placas_validas = df[df[col_placa].notna() & (df[col_placa] != '')]
-            print(f"\n✅ Registros com placa: {len(placas_validas)}")
+        if staging.sha256_arquivo(caminho) == ultima['sha256']:
+            print("\n✅ Arquivo íntegro (sha256 confere com o manifesto)")
         else:
-            print(f"\n⚠️ Coluna 'placa' não encontrada!")
+            print("\n⚠️ sha256 diferente do manifesto!")
         
         return True
         
     except Exception as e:
-        print(f"❌ Erro ao ler Excel: {e}")
+        print(f"❌ Erro ao ler staging: {e}")
         return False
 
 def teste_banco():
@@ -187,7 +189,7 @@ def main():
     
     resultados = []
     
-    resultados.append(("Excel", teste_excel()))
+    resultados.append(("Staging", teste_staging()))
     resultados.append(("Banco", teste_banco()))
     resultados.append(("App", teste_app()))
     resultados.append(("Git", teste_git()))
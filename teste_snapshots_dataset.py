@@ -0,0 +1,196 @@
+"""
+Script de teste dos snapshots do banco (snapshots_dataset.py)
+
+Publica um banco de teste no stub_s3.py (no lugar do MinIO) e numa pasta
+local e confere: nome pelo hash, manifesto, GET condicional sem download
+quando nada mudou, download só com hash novo, recusa de snapshot corrompido
+(banco local intacto), troca atômica e retenção dos snapshots antigos. Por
+fim, as partições do histórico arquivado (data/arquivo) publicadas junto:
+só as que mudaram são enviadas e baixadas, e o arquivo do app fica igual ao
+da origem.
+"""
+
+import gzip
+import json
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from migracoes import aplicar_migracoes, carimbar_versao_dados
+from snapshots_dataset import (
+    MANIFESTO, ArmazenamentoLocal, ArmazenamentoS3, atualizar_dataset, publicar_snapshot,
+)
+from stub_s3 import StubS3
+
+print("=" * 80)
+print("🧪 TESTE DOS SNAPSHOTS DO BANCO (stub S3 + pasta local)")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+def nova_venda(caminho, id_venda, placa):
+    conn = sqlite3.connect(caminho)
+    conn.execute("INSERT INTO vendas (id, loja, data_emissao, placa, km) VALUES (?, 'ADJ', '2026-01-01', ?, 1000)",
+                 (id_venda, placa))
+    conn.execute("INSERT INTO venda_placa (placa, venda_id, km) VALUES (?, ?, 1000)", (placa, id_venda))
+    carimbar_versao_dados(conn)
+    conn.commit()
+    conn.close()
+
+def particao(pasta, ano, mes, conteudo):
+    caminho = Path(pasta) / f'ano={ano:04d}' / f'mes={mes:02d}' / 'vendas.parquet'
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_bytes(conteudo)
+
+def conteudo_arquivo(pasta):
+    return {c.relative_to(pasta).as_posix(): c.read_bytes() for c in Path(pasta).glob('ano=*/mes=*/vendas.parquet')}
+
+def vendas(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM vendas').fetchone()[0]
+    finally:
+        conn.close()
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_snapshots_'))
+stub = StubS3().iniciar()
+try:
+    armazenamentos = [
+        ('S3', ArmazenamentoS3('dados', 'lubrimax', endpoint=stub.url, chave_acesso='teste', segredo='teste')),
+        ('local', ArmazenamentoLocal(pasta / 'local')),
+    ]
+    for nome, armazenamento in armazenamentos:
+        origem = pasta / f'origem_{nome}.sqlite'
+        aplicar_migracoes(str(origem))
+        nova_venda(origem, 1, 'ABC1234')
+        destino = pasta / f'app_{nome}' / 'db.sqlite'
+        estado = pasta / f'app_{nome}' / 'estado.json'
+        arquivo_origem = pasta / f'arquivo_origem_{nome}'
+        arquivo_app = pasta / f'arquivo_app_{nome}'
+
+        # 1. Publicação: snapshot nomeado pelo hash + manifesto
+        manifesto = publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)
+        conferir(f"[{nome}] Snapshot nomeado pelo sha256",
+                 manifesto['arquivo'] == f"snapshots/{manifesto['sha256']}.sqlite.gz"
+                 and armazenamento.existe(manifesto['arquivo']))
+        conferir(f"[{nome}] Manifesto com contagem de linhas", manifesto['linhas']['vendas'] == 1, str(manifesto['linhas']))
+        conferir(f"[{nome}] Banco sem mudança não publica de novo",
+                 publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)['publicado_em'] == manifesto['publicado_em'])
+
+        # 2. Primeiro download e GET condicional sem mudança
+        conferir(f"[{nome}] Primeiro download troca o banco", atualizar_dataset(destino, armazenamento, estado, arquivo_app))
+        conferir(f"[{nome}] Banco baixado igual ao publicado", vendas(destino) == 1)
+        if nome == 'S3':
+            gets = stub.contagem.get('GET', 0)
+        conferir(f"[{nome}] Manifesto igual não baixa nada", not atualizar_dataset(destino, armazenamento, estado, arquivo_app))
+        if nome == 'S3':
+            conferir("[S3] Só o GET condicional do manifesto (304)", stub.contagem.get('GET', 0) == gets + 1,
+                     str(stub.contagem))
+
+        # 3. Versão nova: só então baixa
+        nova_venda(origem, 2, 'XYZ9876')
+        novo = publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)
+        conferir(f"[{nome}] Hash novo no manifesto", novo['sha256'] != manifesto['sha256'])
+        conferir(f"[{nome}] Versão nova baixada", atualizar_dataset(destino, armazenamento, estado, arquivo_app) and vendas(destino) == 2)
+
+        # 4. Snapshot corrompido: recusado e o banco local continua o mesmo
+        nova_venda(origem, 3, 'DEF4567')
+        corrompido = publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)
+        armazenamento.gravar(corrompido['arquivo'], gzip.compress(b'nao e o banco'))
+        try:
+            atualizar_dataset(destino, armazenamento, estado, arquivo_app)
+            recusado = False
+        except ValueError:
+            recusado = True
+        conferir(f"[{nome}] Snapshot com hash errado recusado", recusado)
+        conferir(f"[{nome}] Banco local intacto após a recusa", vendas(destino) == 2)
+        conferir(f"[{nome}] Nenhum arquivo temporário sobrando",
+                 sorted(p.name for p in destino.parent.iterdir()) == ['db.sqlite', 'estado.json'],
+                 str(sorted(p.name for p in destino.parent.iterdir())))
+
+        # 5. Retenção: só os snapshots mais recentes ficam no armazenamento
+        for i in range(4, 10):
+            nova_venda(origem, i, f'RET{i:04d}')
+            ultimo = publicar_snapshot(origem, armazenamento, manter=3, pasta_arquivo=arquivo_origem)
+        conferir(f"[{nome}] Retenção dos snapshots",
+                 len(ultimo['anteriores']) == 2 and not armazenamento.existe(novo['arquivo']),
+                 str(ultimo['anteriores']))
+        dados, _ = armazenamento.ler(MANIFESTO)
+        conferir(f"[{nome}] Manifesto legível", json.loads(dados)['sha256'] == ultimo['sha256'])
+
+        # 6. Histórico arquivado: partições endereçadas por conteúdo no manifesto
+        atualizar_dataset(destino, armazenamento, estado, arquivo_app)
+        particao(arquivo_origem, 2024, 1, b'janeiro')
+        particao(arquivo_origem, 2024, 2, b'fevereiro')
+        com_arquivo = publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)
+        conferir(f"[{nome}] Arquivo novo publica manifesto novo com o mesmo banco",
+                 com_arquivo['sha256'] == ultimo['sha256'] and sorted(com_arquivo['particoes']) == [
+                     'ano=2024/mes=01/vendas.parquet', 'ano=2024/mes=02/vendas.parquet'],
+                 str(com_arquivo.get('particoes')))
+        conferir(f"[{nome}] Snapshot atual não entra nos anteriores", ultimo['arquivo'] not in com_arquivo['anteriores'])
+        conferir(f"[{nome}] App baixa as partições sem trocar o banco",
+                 atualizar_dataset(destino, armazenamento, estado, arquivo_app)
+                 and conteudo_arquivo(arquivo_app) == conteudo_arquivo(arquivo_origem),
+                 str(conteudo_arquivo(arquivo_app)))
+        janeiro = com_arquivo['particoes']['ano=2024/mes=01/vendas.parquet']['arquivo']
+
+        particao(arquivo_origem, 2024, 2, b'fevereiro com mais vendas')
+        particao(arquivo_origem, 2024, 3, b'marco')
+        (arquivo_origem / 'ano=2024' / 'mes=01' / 'vendas.parquet').unlink()
+        trocado = publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)
+        conferir(f"[{nome}] Partição substituída fica uma publicação a mais",
+                 janeiro in trocado['particoes_substituidas'] and armazenamento.existe(janeiro))
+        baixar = armazenamento.baixar
+        baixadas = []
+        armazenamento.baixar = lambda chave, destino_: (baixadas.append(chave), baixar(chave, destino_))
+        atualizar_dataset(destino, armazenamento, estado, arquivo_app)
+        armazenamento.baixar = baixar
+        conferir(f"[{nome}] Só as partições que mudaram são baixadas",
+                 sorted(baixadas) == sorted(trocado['particoes'][p]['arquivo'] for p in
+                                            ['ano=2024/mes=02/vendas.parquet', 'ano=2024/mes=03/vendas.parquet']),
+                 str(baixadas))
+        conferir(f"[{nome}] Arquivo do app igual ao da origem (mês removido sai)",
+                 conteudo_arquivo(arquivo_app) == conteudo_arquivo(arquivo_origem), str(conteudo_arquivo(arquivo_app)))
+        particao(arquivo_origem, 2024, 4, b'abril')
+        publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)
+        conferir(f"[{nome}] Partição substituída removida na publicação seguinte", not armazenamento.existe(janeiro))
+
+        # 7. Partição corrompida no armazenamento: recusada, a local continua a mesma
+        abril = publicar_snapshot(origem, armazenamento, pasta_arquivo=arquivo_origem)['particoes'][
+            'ano=2024/mes=04/vendas.parquet']['arquivo']
+        armazenamento.gravar(abril, b'outra coisa')
+        try:
+            atualizar_dataset(destino, armazenamento, estado, arquivo_app)
+            recusada = False
+        except ValueError:
+            recusada = True
+        conferir(f"[{nome}] Partição com hash errado recusada", recusada
+                 and not (arquivo_app / 'ano=2024' / 'mes=04' / 'vendas.parquet').exists())
+finally:
+    stub.parar()
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
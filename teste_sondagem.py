@@ -0,0 +1,175 @@
+"""
+Script de teste da sondagem do app (sondagem.py)
+
+Sobe um servidor local que imita o Streamlit Cloud: dorme até a página
+inicial ser acessada, leva ACORDAR segundos para subir o servidor
+(/_stcore/health) e mais SCRIPT segundos até o script rodar inteiro
+(/_stcore/script-health-check). Confere que a sondagem acorda o app, para
+logo que ele fica pronto, não passa do limite de sondas simultâneas e
+registra o tempo até ficar pronto. Depois de um deploy, só aceita como
+pronto o app que serve a versão dos dados recém-publicada.
+"""
+
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from sondagem import Sondagem, registrar_sondagem
+
+ACORDAR = 1.0
+SCRIPT = 0.8
+SONDAS = 3
+
+print("=" * 80)
+print("🧪 TESTE DA SONDAGEM DO APP (servidor local imitando o Streamlit Cloud)")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+class _Tratador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, corpo):
+        corpo = corpo.encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        servidor = self.server
+        with servidor.trava:
+            servidor.requisicoes.append((time.monotonic(), self.path))
+            servidor.em_andamento += 1
+            servidor.max_em_andamento = max(servidor.max_em_andamento, servidor.em_andamento)
+        try:
+            time.sleep(0.02)
+            acordado = servidor.despertado_em is not None
+            decorrido = time.monotonic() - servidor.despertado_em if acordado else 0
+            if self.path == '/':
+                if not acordado:
+                    servidor.despertado_em = time.monotonic()
+                if decorrido < ACORDAR:
+                    self._responder(200, '<html>Please wait... your app is waking up</html>')
+                else:
+                    self._responder(200, '<html>app</html>')
+            elif self.path == '/~/+/_stcore/health':
+                if acordado and decorrido >= ACORDAR:
+                    self._responder(200, 'ok')
+                else:
+                    self._responder(503, 'unavailable')
+            elif self.path == '/~/+/app/static/versao_dados.json':
+                self._responder(200, json.dumps({'versao': servidor.versao}))
+            elif self.path == '/~/+/_stcore/script-health-check':
+                if acordado and decorrido >= ACORDAR + SCRIPT:
+                    servidor.pronto_em = servidor.pronto_em or time.monotonic()
+                    self._responder(200, 'ok')
+                else:
+                    self._responder(503, 'script ainda não rodou')
+            else:
+                self._responder(404, 'not found')
+        finally:
+            with servidor.trava:
+                servidor.em_andamento -= 1
+
+servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Tratador)
+servidor.daemon_threads = True
+servidor.trava = threading.Lock()
+servidor.requisicoes = []
+servidor.em_andamento = 0
+servidor.max_em_andamento = 0
+servidor.despertado_em = None
+servidor.pronto_em = None
+servidor.versao = 'v1'
+threading.Thread(target=servidor.serve_forever, daemon=True).start()
+url = f'http://127.0.0.1:{servidor.server_address[1]}'
+
+try:
+    # 1. App dormindo: acorda, passa por "servidor" e para quando fica pronto
+    sondagem = Sondagem(url, url + '/~/+', sondas=SONDAS, espera_inicial=0.1, espera_maxima=0.5, timeout=2)
+    resultado = sondagem.executar(limite=10)
+    fim = time.monotonic()
+    print(f"   Pronto em {resultado['tempo_ate_pronto']}s com {resultado['requisicoes']} requisições")
+
+    conferir("App ficou pronto", resultado['pronto'], str(resultado))
+    conferir("Página inicial acessada para acordar o app", servidor.despertado_em is not None)
+    conferir("Linha do tempo dormindo -> servidor -> pronto",
+             [e['estado'] for e in resultado['linha_do_tempo']] == ['servidor', 'pronto'],
+             str(resultado['linha_do_tempo']))
+    atraso = fim - servidor.pronto_em
+    conferir(f"Sondagem parou logo que o app ficou pronto ({atraso:.2f}s depois)", atraso < 0.5)
+    conferir(f"No máximo {SONDAS} sondas simultâneas", servidor.max_em_andamento <= SONDAS,
+             f"(máximo {servidor.max_em_andamento})")
+    conferir("Tempo até pronto perto do mínimo possível",
+             resultado['tempo_ate_pronto'] < ACORDAR + SCRIPT + 1.0, f"({resultado['tempo_ate_pronto']}s)")
+
+    time.sleep(0.5)
+    depois = [r for r in servidor.requisicoes if r[0] > fim + 0.1]
+    conferir("Nenhuma sonda nova depois de pronto", not depois, str(depois))
+
+    # 2. App já pronto: uma rodada de sondas basta
+    resultado = Sondagem(url, url + '/~/+', sondas=SONDAS, espera_inicial=0.1, timeout=2).executar(limite=5)
+    conferir("App já acordado: pronto na primeira sonda",
+             resultado['pronto'] and resultado['requisicoes'] <= SONDAS, str(resultado))
+
+    # 3. Limite: app que nunca responde
+    inicio = time.monotonic()
+    resultado = Sondagem('http://127.0.0.1:9', 'http://127.0.0.1:9', sondas=2,
+                         espera_inicial=0.1, espera_maxima=0.3, timeout=0.5).executar(limite=1.5)
+    conferir("Sem resposta: desiste no limite", not resultado['pronto'] and time.monotonic() - inicio < 2.5,
+             f"({time.monotonic() - inicio:.2f}s)")
+
+    # 4. Histórico de tempos por execução
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = Path(pasta) / 'sondagens.jsonl'
+        registrar_sondagem({'pronto': True, 'tempo_ate_pronto': 1.2}, caminho)
+        registrar_sondagem(resultado, caminho)
+        linhas = [json.loads(l) for l in caminho.read_text(encoding='utf-8').splitlines()]
+        conferir("Uma linha por execução no histórico", len(linhas) == 2 and linhas[0]['tempo_ate_pronto'] == 1.2)
+
+    # 5. Após o deploy: a instância antiga (v1) responde pronta, mas não serve a versão publicada
+    troca = threading.Timer(0.6, lambda: setattr(servidor, 'versao', 'v2'))
+    troca.start()
+    resultado = Sondagem(url, url + '/~/+', sondas=SONDAS, espera_inicial=0.1, espera_maxima=0.3,
+                         timeout=2, versao_esperada='v2').executar(limite=5)
+    conferir("Instância antiga não conta como pronta: espera a versão publicada",
+             resultado['pronto'] and resultado['versao_servida'] == 'v2' and resultado['tempo_ate_pronto'] >= 0.6,
+             str(resultado))
+    resultado = Sondagem(url, url + '/~/+', sondas=SONDAS, espera_inicial=0.1, espera_maxima=0.3,
+                         timeout=2, versao_esperada='v3').executar(limite=1)
+    conferir("Versão publicada nunca servida: não fica pronto",
+             not resultado['pronto'] and resultado['estado_final'] == 'servidor'
+             and resultado['versao_servida'] == 'v2', str(resultado))
+finally:
+    servidor.shutdown()
+    servidor.server_close()
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)
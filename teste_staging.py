@@ -0,0 +1,114 @@
+"""
+Script de teste do staging das extrações (staging.py)
+
+Grava extrações numa pasta de staging temporária e confere o que a ingestão
+recebe: cada extração vira um arquivo novo no manifesto, e um arquivo com o
+mesmo conteúdo de um já gravado no banco (mesma loja e sha256) é pulado,
+tanto dentro do mesmo manifesto quanto numa nova extração depois da carga.
+O mesmo conteúdo em outra loja não é pulado.
+"""
+
+import logging
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import staging
+from migracoes import aplicar_migracoes
+
+logging.disable(logging.CRITICAL)
+
+print("=" * 80)
+print("🧪 TESTE DO STAGING DAS EXTRAÇÕES")
+print("=" * 80)
+print()
+
+sucessos = 0
+falhas = 0
+
+def conferir(descricao, ok, detalhe=''):
+    global sucessos, falhas
+    if ok:
+        sucessos += 1
+        print(f"✅ {descricao}")
+    else:
+        falhas += 1
+        print(f"❌ {descricao} {detalhe}")
+
+RELATORIO = 'EMISSÃO\tNUMERO VENDA\tOBSERVAÇÃO\n02/01/2025\t1001\tPLACA: ABC1234\n'
+RELATORIO_NOVO = RELATORIO + '03/01/2025\t1002\tPLACA: DEF5G67\n'
+
+def ingerir(conn, entradas):
+    """Marca as entradas como gravadas no banco, como faz a ingestão"""
+    for entrada in entradas:
+        staging.marcar_ingerido(conn.cursor(), entrada, 1)
+    conn.commit()
+
+pasta = Path(tempfile.mkdtemp(prefix='teste_staging_'))
+try:
+    banco = pasta / 'db.sqlite'
+    aplicar_migracoes(str(banco))
+    conn = sqlite3.connect(banco)
+
+    # 1. Extrações gravadas em arquivos novos, registradas no manifesto
+    primeira = staging.gravar_texto('ADJ', RELATORIO, 'tela', pasta=pasta)
+    repetida = staging.gravar_texto('ADJ', RELATORIO, 'tela', pasta=pasta)
+    outra_loja = staging.gravar_texto('LUBRIMAX', RELATORIO, 'tela', pasta=pasta)
+    conferir("Cada extração num arquivo próprio",
+             len({primeira['arquivo'], repetida['arquivo'], outra_loja['arquivo']}) == 3
+             and all((pasta / e['arquivo']).exists() for e in (primeira, repetida, outra_loja)))
+    conferir("Manifesto com loja, sha256 e linhas",
+             [(e['loja'], e['linhas']) for e in staging.ler_manifesto(pasta)] == [('ADJ', 2), ('ADJ', 2), ('LUBRIMAX', 2)]
+             and primeira['sha256'] == repetida['sha256'] == staging.sha256_arquivo(pasta / primeira['arquivo']))
+
+    # 2. Conteúdo idêntico da mesma loja no manifesto: só o primeiro vai para a ingestão
+    pendentes = staging.pendentes(conn, pasta=pasta)
+    conferir("Extração repetida da loja pulada; mesma cópia de outra loja não",
+             [e['arquivo'] for e in pendentes] == [primeira['arquivo'], outra_loja['arquivo']],
+             str([e['arquivo'] for e in pendentes]))
+    conferir("Entradas pendentes com o caminho completo", pendentes[0]['caminho'] == pasta / primeira['arquivo'])
+    conferir("Filtro por loja", [e['loja'] for e in staging.pendentes(conn, 'LUBRIMAX', pasta)] == ['LUBRIMAX'])
+
+    # 3. Depois da carga, nada pendente
+    ingerir(conn, pendentes)
+    conferir("Arquivos gravados no banco não voltam", staging.pendentes(conn, pasta=pasta) == [])
+
+    # 4. Nova extração idêntica (re-ingestão do mesmo relatório): pulada pelo (loja, sha256)
+    reextraida = staging.gravar_texto('ADJ', RELATORIO, 'tela', pasta=pasta)
+    conferir("Arquivo idêntico a um já ingerido é pulado",
+             staging.pendentes(conn, pasta=pasta) == [], str(staging.pendentes(conn, pasta=pasta)))
+    conferir("Arquivo pulado continua no staging (nada é apagado)", (pasta / reextraida['arquivo']).exists())
+
+    # 5. Conteúdo novo da loja entra
+    nova = staging.gravar_texto('ADJ', RELATORIO_NOVO, 'tela', pasta=pasta)
+    pendentes = staging.pendentes(conn, pasta=pasta)
+    conferir("Extração com vendas novas vai para a ingestão", [e['arquivo'] for e in pendentes] == [nova['arquivo']])
+    ingerir(conn, pendentes)
+    ingeridos = conn.execute('SELECT loja, sha256 FROM staging_ingerido ORDER BY loja, arquivo').fetchall()
+    conferir("Um registro por loja e sha256 em staging_ingerido", len(ingeridos) == 3 and len(set(ingeridos)) == 3,
+             str(ingeridos))
+
+    # 6. Manifesto com arquivo sumido ou última linha cortada por um crash
+    sumida = staging.gravar_texto('LUBRIMAX', RELATORIO_NOVO, 'tela', pasta=pasta)
+    (pasta / sumida['arquivo']).unlink()
+    with open(pasta / staging.MANIFESTO, 'a', encoding='utf-8') as f:
+        f.write('{"arquivo": "vendas_adj_cortado')
+    conferir("Arquivo ausente e linha cortada do manifesto ignorados",
+             staging.pendentes(conn, pasta=pasta) == [] and len(staging.ler_manifesto(pasta)) == 6)
+    conn.close()
+finally:
+    shutil.rmtree(pasta, ignore_errors=True)
+
+print()
+print("=" * 80)
+print(f"📊 RESULTADO: {sucessos}/{sucessos + falhas} testes passaram")
+print(f"✅ Sucessos: {sucessos}")
+print(f"❌ Falhas: {falhas}")
+print("=" * 80)
+
+if falhas == 0:
+    print("\n🎉 TODOS OS TESTES PASSARAM! 🎉\n")
+else:
+    print(f"\n⚠️  {falhas} teste(s) falharam. Verifique os casos acima.\n")
+raise SystemExit(1 if falhas else 0)